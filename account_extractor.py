@@ -0,0 +1,122 @@
+"""
+Ranked account number extraction.
+
+The account patterns of a set are compiled once and run in priority order.
+A pattern that starts with a literal word ('account', 'ending', ...) is only
+run on texts that contain the word; otherwise one substring search skips it.
+"""
+
+import re
+from typing import List, NamedTuple, Optional, Sequence
+
+from config import ACCOUNT_PATTERNS, TEXT_ACCOUNT_PATTERNS, CARD_NUMBER_PATTERNS
+
+
+_NON_ALPHANUMERIC = re.compile(r'[^A-Z0-9]')
+_DIGIT_RUNS = re.compile(r'\d+')
+_LITERAL_PREFIX = re.compile(r'[A-Za-z0-9#]+')
+
+
+class AccountCandidate(NamedTuple):
+    """An account number found in a text."""
+    value: str
+    priority: int
+    position: int
+    pattern: str
+
+
+def _literal_prefix(pattern: str) -> str:
+    """Return the lowercased literal text every match of a pattern starts with, or ''."""
+    match = _LITERAL_PREFIX.match(pattern)
+    if not match:
+        return ''
+    literal = match.group()
+    # A quantifier after the last character makes that character optional or repeated
+    if pattern[match.end():match.end() + 1] in ('?', '*', '{'):
+        literal = literal[:-1]
+    return literal.lower()
+
+
+def luhn_valid(number: str) -> bool:
+    """Check a card number with the Luhn checksum."""
+    digits = [int(d) for d in number if d.isdigit()]
+    checksum = 0
+    for i, digit in enumerate(reversed(digits)):
+        if i % 2 == 1:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        checksum += digit
+    return bool(digits) and checksum % 10 == 0
+
+
+class AccountExtractor:
+    """Extracts ranked account number candidates with precompiled patterns."""
+
+    def __init__(self, patterns: Sequence[str], digits_only: bool = False,
+                 card_patterns: Sequence[str] = CARD_NUMBER_PATTERNS):
+        self.patterns = list(patterns)
+        self.digits_only = digits_only
+        self._card_priorities = {i for i, pattern in enumerate(self.patterns) if pattern in card_patterns}
+        self._regexes = [re.compile(pattern, re.IGNORECASE) for pattern in self.patterns]
+        self._prefixes = [_literal_prefix(pattern) for pattern in self.patterns]
+
+    def _is_valid(self, value: str, priority: int) -> bool:
+        """Reject candidates that cannot be account numbers."""
+        clean_account = value.replace('-', '').replace(' ', '').replace('*', '')
+        if self.digits_only and (len(clean_account) < 3 or not clean_account.isdigit()):
+            return False
+        if clean_account.isdigit() and len(clean_account) > 1 and len(set(clean_account)) == 1:
+            return False  # All same digit
+        if priority in self._card_priorities and not luhn_valid(clean_account):
+            return False
+        return True
+
+    def extract(self, text: str) -> List[AccountCandidate]:
+        """Return the valid candidates in the text ranked by pattern priority, then position."""
+        candidates = {}
+        lowered = text.lower()
+        for i, (regex, prefix) in enumerate(zip(self._regexes, self._prefixes)):
+            if prefix and prefix not in lowered:
+                continue
+            for match in regex.finditer(text):
+                value = match.group(1)
+                # Patterns run in priority order, so the first valid match of a value ranks it
+                if value not in candidates and self._is_valid(value, i):
+                    candidates[value] = AccountCandidate(value, i, match.start(), self.patterns[i])
+        return sorted(candidates.values(), key=lambda c: (c.priority, c.position))
+
+    def best(self, text: str) -> Optional[str]:
+        """Return the highest ranked account number in the text, if any."""
+        candidates = self.extract(text)
+        return candidates[0].value if candidates else None
+
+
+def normalize_account(account_info: str) -> str:
+    """Uppercase account information and strip everything except letters and digits."""
+    return _NON_ALPHANUMERIC.sub('', account_info.upper())
+
+
+def last_characters(account_info: str, num_digits: int = 5) -> str:
+    """Return the last N letters/digits of account information."""
+    clean_account = normalize_account(account_info)
+    if len(clean_account) <= num_digits:
+        return clean_account
+    return clean_account[-num_digits:]
+
+
+def account_digit_suffix(account_info: Optional[str]) -> Optional[str]:
+    """Return the last 4-5 digits of the longest digit run in account information."""
+    if not account_info:
+        return None
+    digits = _DIGIT_RUNS.findall(str(account_info))
+    if not digits:
+        return None
+    longest_digits = max(digits, key=len)
+    if len(longest_digits) < 4:
+        return None
+    return longest_digits[-5:] if len(longest_digits) >= 5 else longest_digits[-4:]
+
+
+FILENAME_EXTRACTOR = AccountExtractor(ACCOUNT_PATTERNS)
+TEXT_EXTRACTOR = AccountExtractor(TEXT_ACCOUNT_PATTERNS, digits_only=True)
@@ -0,0 +1,149 @@
+"""
+Local cache of downloaded file contents, addressed by their md5.
+
+Drive reports an md5Checksum for every PDF, so a file whose classification
+is invalidated can be read again from disk instead of downloaded. Blobs are
+written atomically and checked against their md5 before they are stored.
+When the cache grows past its size budget, the least recently used blobs
+are removed; a blob's modification time records its last use, so the order
+survives restarts.
+"""
+
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Union
+
+from config import BLOB_CACHE_MAX_MB
+
+
+Blob = Union[bytes, mmap.mmap]
+
+
+class BlobCache:
+    """Size-bounded, least-recently-used store of file contents keyed by md5."""
+
+    def __init__(self, directory: str = 'blob_cache', max_bytes: int = BLOB_CACHE_MAX_MB * 1024 * 1024,
+                 use_mmap: bool = True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.use_mmap = use_mmap
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._sizes: 'OrderedDict[str, int]' = OrderedDict()
+        self._total = 0
+        self._load()
+
+    def __contains__(self, md5: Optional[str]) -> bool:
+        with self._lock:
+            return md5 in self._sizes
+
+    def _path(self, md5: str) -> str:
+        return os.path.join(self.directory, md5[:2], md5)
+
+    def _load(self):
+        """Find the stored blobs, least recently used first."""
+        os.makedirs(self.directory, exist_ok=True)
+        blobs = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.tmp'):
+                    continue  # Left behind by an interrupted write
+                stat = os.stat(os.path.join(root, name))
+                blobs.append((stat.st_mtime, name, stat.st_size))
+        for _, md5, size in sorted(blobs):
+            self._sizes[md5] = size
+            self._total += size
+
+    def get(self, md5: Optional[str]) -> Optional[Blob]:
+        """
+        Return the stored content, or None. With use_mmap the content is a
+        read-only memory map, which the caller closes when done with it.
+        """
+        if not md5:
+            return None
+        path = self._path(md5)
+        with self._lock:
+            if md5 not in self._sizes:
+                self.misses += 1
+                return None
+            self._sizes.move_to_end(md5)
+            self.hits += 1
+
+        try:
+            os.utime(path)
+            with open(path, 'rb') as f:
+                if self.use_mmap and self._sizes.get(md5):
+                    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                return f.read()
+        except (OSError, ValueError):
+            # Removed by another process sharing the directory
+            with self._lock:
+                self._forget(md5)
+            return None
+
+    def put(self, md5: Optional[str], content: bytes) -> bool:
+        """Store content under its md5. Content that does not match the md5 is not stored."""
+        if not md5 or len(content) > self.max_bytes or hashlib.md5(content).hexdigest() != md5:
+            return False
+
+        path = self._path(md5)
+        with self._lock:
+            if md5 in self._sizes:
+                return True
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+        with self._lock:
+            if md5 not in self._sizes:
+                self._sizes[md5] = len(content)
+                self._total += len(content)
+            self._evict()
+        return True
+
+    def _forget(self, md5: str):
+        self._total -= self._sizes.pop(md5, 0)
+
+    def _evict(self):
+        """Remove least recently used blobs until the cache fits its budget."""
+        while self._total > self.max_bytes and self._sizes:
+            md5 = next(iter(self._sizes))
+            self._forget(md5)
+            try:
+                os.remove(self._path(md5))
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove every stored blob."""
+        with self._lock:
+            for md5 in list(self._sizes):
+                self._forget(md5)
+                try:
+                    os.remove(self._path(md5))
+                except OSError:
+                    pass
+
+    def get_stats(self) -> Dict:
+        """Return the number and total size of the stored blobs and this run's hits and misses."""
+        with self._lock:
+            return {
+                'blobs': len(self._sizes),
+                'total_bytes': self._total,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
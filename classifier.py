@@ -0,0 +1,64 @@
+"""
+Statement classification rules, without Drive or PDF access.
+
+A file is classified from its name first; the PDF text is only consulted for
+what the name leaves unresolved. The same rules serve live organizing and
+--reclassify, which re-applies them to stored text after a pattern change.
+"""
+
+from typing import Callable, Optional, Tuple
+
+from config import COMPANY_PATTERNS, STATEMENT_PATTERNS
+from account_extractor import FILENAME_EXTRACTOR, TEXT_EXTRACTOR
+
+
+# (company, statement_type, account_info)
+Classification = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+def find_company(text_lower: str) -> Optional[str]:
+    """Return the first company whose patterns occur in lowercased text."""
+    for company_name, patterns in COMPANY_PATTERNS.items():
+        if any(pattern in text_lower for pattern in patterns):
+            return company_name
+    return None
+
+
+def find_statement_type(text_lower: str) -> Optional[str]:
+    """Return the first statement type whose patterns occur in lowercased text."""
+    for stmt_type, patterns in STATEMENT_PATTERNS.items():
+        if any(pattern in text_lower for pattern in patterns):
+            return stmt_type
+    return None
+
+
+def classify_name(file_name: str) -> Classification:
+    """Classify a file from its name alone."""
+    file_lower = file_name.lower()
+    return find_company(file_lower), find_statement_type(file_lower), FILENAME_EXTRACTOR.best(file_name)
+
+
+def classify(file_name: str, load_text: Optional[Callable[[], Optional[str]]] = None) -> Classification:
+    """
+    Classify a file from its name and, if the name leaves anything unresolved,
+    from the text returned by load_text, which is only called in that case.
+    """
+    company, statement_type, account_info = classify_name(file_name)
+    if company and statement_type and account_info:
+        return company, statement_type, account_info
+
+    pdf_text = load_text() if load_text else None
+    if not pdf_text:
+        return company, statement_type, account_info
+
+    if not account_info:
+        account_info = FILENAME_EXTRACTOR.best(pdf_text)
+
+    if not company or not statement_type:
+        pdf_lower = pdf_text.lower()
+        company = company or find_company(pdf_lower)
+        statement_type = statement_type or find_statement_type(pdf_lower)
+        if not account_info:
+            account_info = TEXT_EXTRACTOR.best(pdf_text)
+
+    return company, statement_type, account_info
@@ -0,0 +1,320 @@
+"""
+Long-lived classification service (--serve).
+
+Tools that classify single statements can connect to a running service
+instead of starting main.py per file. The service loads the classification
+cache, the text store and the PDF backend once and answers over a Unix
+socket or a localhost TCP port.
+
+Requests are not authenticated, so the service only listens on loopback
+addresses, its Unix socket is only accessible to its owner, and files are
+only read by path below a root directory given when it starts.
+
+The protocol is JSON lines: one request object per line, one response per
+line, in request order. Clients may send any number of requests without
+waiting for the answers; they are classified by a bounded pool of worker
+threads, and a connection stops being read while MAX_PENDING of its
+requests are unanswered.
+
+Requests: {"id": ..., "path": "2024/a.pdf"} (relative to the root, or an
+absolute path below it) or {"id": ..., "name": "a.pdf", "pdf": "<base64>"};
+"name" defaults to the file name of the path. {"op": "ping"} and
+{"op": "stats"} check on the service. Responses carry company,
+statement_type, account_info, md5, source ('cache', 'name' or 'pdf') and
+timings in milliseconds, and error if the request failed or the PDF could
+not be parsed.
+"""
+
+import base64
+import binascii
+import hashlib
+import ipaddress
+import json
+import mmap
+import os
+import queue
+import socket
+import socketserver
+import stat
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple, Union
+
+from classifier import classify
+from file_mapping import FileMapping
+from local_source import read_mapped
+from pdf_backends import DEFAULT_BACKEND, PDFTextExtractor
+from text_store import TextStore
+
+
+# Unanswered requests per connection before the service stops reading from it
+MAX_PENDING = 64
+
+DEFAULT_HOST = '127.0.0.1'
+
+
+def is_loopback(host: str) -> bool:
+    """Check whether a host name or IP address stays on this machine."""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """
+    A port or host:port becomes a TCP address (host defaults to localhost);
+    anything else is a socket path. Raises ValueError for non-loopback hosts.
+    """
+    host, _, port = address.rpartition(':')
+    if port.isdigit() and os.sep not in address:
+        host = host or DEFAULT_HOST
+        if not is_loopback(host):
+            raise ValueError(f"Refusing to serve on {host}: only loopback addresses are allowed")
+        return host, int(port)
+    return address
+
+
+def _milliseconds(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+class ClassificationService:
+    """Classifies statements with warm caches, on a bounded pool of worker threads."""
+
+    def __init__(self, file_mapping: FileMapping, text_store: Optional[TextStore] = None,
+                 pdf_extractor: Optional[PDFTextExtractor] = None, workers: int = 4,
+                 path_root: Optional[str] = None):
+        self.file_mapping = file_mapping
+        # Path requests are refused unless a root is given
+        self.path_root = os.path.realpath(path_root) if path_root else None
+        self.text_store = text_store
+        self.pdf_extractor = pdf_extractor or PDFTextExtractor(DEFAULT_BACKEND)
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='classify')
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'errors': 0, 'cache': 0, 'name': 0, 'pdf': 0}
+        self.started = time.time()
+        # Build the md5 index now rather than on the first request
+        file_mapping.cached_md5s()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def submit(self, line: bytes) -> Future:
+        """Queue one request line for a worker; the future's result is the response object."""
+        return self.executor.submit(self.handle, line, time.perf_counter())
+
+    def handle(self, line: bytes, received: Optional[float] = None) -> Dict:
+        """Answer one request line. Errors are returned in the response, never raised."""
+        started = time.perf_counter()
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('a request is a JSON object')
+        except ValueError as error:
+            self._count('errors')
+            return {'error': f'invalid request: {error}'}
+
+        response = {'id': request.get('id')}
+        op = request.get('op', 'classify')
+        if op == 'ping':
+            response['ok'] = True
+            return response
+        if op == 'stats':
+            with self._lock:
+                response.update(self.stats)
+            response.update(workers=self.workers, uptime_seconds=round(time.time() - self.started, 1))
+            return response
+        if op != 'classify':
+            self._count('errors')
+            response['error'] = f"unknown op '{op}'"
+            return response
+
+        self._count('requests')
+        try:
+            response.update(self.classify_request(request))
+        except Exception as error:
+            self._count('errors')
+            response['error'] = str(error)
+        timings = response.setdefault('timings', {})
+        if received is not None:
+            timings['queue_ms'] = _milliseconds(started - received)
+        timings['total_ms'] = _milliseconds(time.perf_counter() - (received or started))
+        return response
+
+    def _read(self, request: Dict) -> Tuple[str, Union[bytes, mmap.mmap]]:
+        """Return the file name and content of a request."""
+        if 'pdf' in request:
+            try:
+                content = base64.b64decode(request['pdf'], validate=True)
+            except (binascii.Error, TypeError) as error:
+                raise ValueError(f'pdf is not valid base64: {error}')
+            return request.get('name') or '', content
+        if 'path' in request:
+            path = request['path']
+            if not self.path_root:
+                raise ValueError('path requests are disabled; send the pdf instead')
+            real_path = os.path.realpath(os.path.join(self.path_root, path))
+            if os.path.commonpath([real_path, self.path_root]) != self.path_root:
+                raise ValueError('path is outside the served directory')
+            return request.get('name') or os.path.basename(path), read_mapped(real_path)
+        raise ValueError('a request needs a path or pdf')
+
+    def classify_request(self, request: Dict) -> Dict:
+        """Classify one statement from the cache by content, from its name, or from its PDF text."""
+        timings = {}
+        started = time.perf_counter()
+        name, content = self._read(request)
+        try:
+            md5 = hashlib.md5(content).hexdigest()
+            timings['read_ms'] = _milliseconds(time.perf_counter() - started)
+
+            cached = self.file_mapping.get_classification_by_md5(md5)
+            if cached:
+                self._count('cache')
+                return dict(zip(('company', 'statement_type', 'account_info'), cached),
+                            md5=md5, source='cache', timings=timings)
+
+            extracted = {}
+
+            def load_text() -> Optional[str]:
+                extract_started = time.perf_counter()
+                text = self.text_store.get(md5) if self.text_store else None
+                if text is None:
+                    try:
+                        text = self.pdf_extractor.extract_text(content)
+                    except Exception as error:
+                        extracted['error'] = f"corrupt_pdf: {error}"
+                    else:
+                        if self.text_store and self.pdf_extractor.version:
+                            self.text_store.put(md5, self.pdf_extractor.version, text)
+                extracted['seconds'] = time.perf_counter() - extract_started
+                timings['extract_ms'] = _milliseconds(extracted['seconds'])
+                return text
+
+            classify_started = time.perf_counter()
+            company, statement_type, account_info = classify(name, load_text)
+            # Pattern matching alone; text extraction is reported as extract_ms
+            classify_seconds = time.perf_counter() - classify_started - extracted.get('seconds', 0)
+            timings['classify_ms'] = _milliseconds(classify_seconds)
+            source = 'pdf' if extracted else 'name'
+            self._count(source)
+            response = {'company': company, 'statement_type': statement_type, 'account_info': account_info,
+                        'md5': md5, 'source': source, 'timings': timings}
+            if 'error' in extracted:
+                # The name may still have classified the file in part
+                self._count('errors')
+                response['error'] = extracted['error']
+            return response
+        finally:
+            if isinstance(content, mmap.mmap):
+                content.close()
+
+
+class _ConnectionHandler(socketserver.StreamRequestHandler):
+    """Reads pipelined requests of one connection and writes their responses in order."""
+
+    def handle(self):
+        service: ClassificationService = self.server.service
+        pending: queue.Queue = queue.Queue(maxsize=MAX_PENDING)
+        writer = threading.Thread(target=self._write_responses, args=(pending,), daemon=True)
+        writer.start()
+        try:
+            for line in self.rfile:
+                if line.strip():
+                    # Blocks while MAX_PENDING requests of this connection are unanswered
+                    pending.put(service.submit(line))
+        except (ConnectionError, ValueError):
+            pass  # Client went away, or the service is shutting down
+        finally:
+            pending.put(None)
+            writer.join()
+
+    def _write_responses(self, pending: queue.Queue):
+        broken = False
+        while True:
+            future = pending.get()
+            if future is None:
+                return
+            response = future.result()
+            if broken:
+                continue  # Drain the queue so the reader is never blocked
+            try:
+                self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+                self.wfile.flush()
+            except (ConnectionError, ValueError):
+                broken = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _remove_stale_socket(path: str):
+    """
+    Remove a socket file left behind by a service that did not shut down
+    cleanly. Raises ValueError if the path is not a socket or a service is
+    still listening on it.
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError(f"Refusing to replace {path}: it is not a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(path)
+            return
+    raise ValueError(f"A service is already listening on {path}")
+
+
+def create_server(address: Union[str, Tuple[str, int]], service: ClassificationService) -> socketserver.BaseServer:
+    """
+    Bind a server for the service to a socket path or a loopback (host, port)
+    address. Raises ValueError if the address cannot be served on.
+    """
+    if isinstance(address, tuple):
+        if not is_loopback(address[0]):
+            raise ValueError(f"Refusing to serve on {address[0]}: only loopback addresses are allowed")
+        server = _TCPServer(address, _ConnectionHandler)
+    else:
+        _remove_stale_socket(address)
+        # Owner-only from the moment the socket file is created
+        umask = os.umask(0o177)
+        try:
+            server = _UnixServer(address, _ConnectionHandler)
+        finally:
+            os.umask(umask)
+    server.service = service
+    return server
+
+
+def server_address_text(server: socketserver.BaseServer) -> str:
+    """Where clients connect to, for messages."""
+    address = server.server_address
+    return f'{address[0]}:{address[1]}' if isinstance(address, tuple) else address
+
+
+def shutdown_server(server: socketserver.BaseServer):
+    """Stop serving, finish the requests in progress and remove a Unix socket file."""
+    server.shutdown()
+    server.server_close()
+    server.service.close()
+    if isinstance(server.server_address, str) and os.path.exists(server.server_address):
+        os.unlink(server.server_address)
@@ -0,0 +1,169 @@
+"""
+Adaptive limits on concurrent Drive requests (--adaptive-concurrency).
+
+Each kind of request (media downloads, metadata calls, mutations) has its own
+limit on requests in flight, adjusted additive-increase/multiplicative-decrease:
+every healthy response raises the limit by 1/limit, so it grows by about one
+per round of requests, and a rate-limit response (429, or 403 rateLimitExceeded)
+or a p95 latency well above the best seen halves it. Requests that started
+before a decrease cannot cause another one, so a burst of errors from one
+round counts once.
+
+The worker pools are sized to the maximum the limits may reach, so the
+limits, not the number of workers, decide how many requests run.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from config import ADAPTIVE_CONCURRENCY
+
+
+REQUEST_KINDS = ('media', 'metadata', 'mutation')
+
+RATE_LIMIT_REASONS = (b'rateLimitExceeded', b'userRateLimitExceeded')
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Check whether a Drive API error asks the client to slow down."""
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    if status == 429:
+        return True
+    content = getattr(error, 'content', None) or b''
+    return status == 403 and any(reason in content for reason in RATE_LIMIT_REASONS)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether a Drive API error is worth retrying: rate limits and server errors."""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    return is_rate_limited(error) or (isinstance(status, int) and status >= 500)
+
+
+def adaptive_maximum(workers: int, max_workers: Optional[int] = None) -> int:
+    """Most requests of one kind in flight: --max-workers, or a multiple of --workers."""
+    return max_workers or workers * ADAPTIVE_CONCURRENCY['max_workers_factor']
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class AdaptiveLimit:
+    """AIMD limit on the requests of one kind in flight across all threads."""
+
+    def __init__(self, kind: str, initial: float, maximum: int, minimum: int = 1,
+                 decrease: float = ADAPTIVE_CONCURRENCY['decrease'],
+                 latency_factor: float = ADAPTIVE_CONCURRENCY['latency_factor'],
+                 window: int = ADAPTIVE_CONCURRENCY['window'], clock=time.monotonic):
+        self.kind = kind
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.window = window
+        self._clock = clock
+        self._started_at = clock()
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._latencies: List[float] = []
+        self.baseline_p95: Optional[float] = None
+        self._last_decrease = float('-inf')
+        self.backoffs: Dict[str, int] = {}
+        # (seconds since start, limit, reason) whenever the whole-number limit changes
+        self.timeline: List[Tuple[float, int, str]] = [(0.0, int(self.limit), 'start')]
+
+    def acquire(self) -> float:
+        """Wait for a free slot. Returns the start time to pass to release()."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return self._clock()
+
+    def release(self, started: float, outcome: str = 'ok'):
+        """Free a slot and adjust the limit: outcome is 'ok', 'rate_limited' or 'error'."""
+        with self._condition:
+            self.in_flight -= 1
+            if outcome == 'rate_limited':
+                self._decrease(started, 'rate limited')
+            elif outcome == 'ok':
+                if self._latency_rising(self._clock() - started):
+                    self._decrease(started, 'p95 latency')
+                else:
+                    self._set(min(self.maximum, self.limit + 1 / self.limit), 'increase')
+            self._condition.notify_all()
+
+    def _latency_rising(self, latency: float) -> bool:
+        """Record a latency; at the end of each window, compare its p95 with the best window so far."""
+        self._latencies.append(latency)
+        if len(self._latencies) < self.window:
+            return False
+        p95 = percentile(self._latencies, 0.95)
+        self._latencies = []
+        if self.baseline_p95 is None or p95 < self.baseline_p95:
+            self.baseline_p95 = p95
+        return p95 > self.baseline_p95 * self.latency_factor
+
+    def _decrease(self, started: float, reason: str):
+        if started <= self._last_decrease:
+            return  # Already backed off for this round of requests
+        self._last_decrease = self._clock()
+        self._latencies = []
+        self.backoffs[reason] = self.backoffs.get(reason, 0) + 1
+        self._set(max(self.minimum, self.limit * self.decrease), reason)
+
+    def _set(self, limit: float, reason: str):
+        changed = int(limit) != int(self.limit)
+        self.limit = limit
+        if changed:
+            self.timeline.append((self._clock() - self._started_at, int(limit), reason))
+
+
+class ConcurrencyController:
+    """Separate adaptive limits for media downloads, metadata calls and mutations."""
+
+    def __init__(self, maximum: int, initial: Optional[int] = None,
+                 retries: int = ADAPTIVE_CONCURRENCY['retries'], clock=time.monotonic):
+        initial = initial or ADAPTIVE_CONCURRENCY['initial']
+        self.maximum = maximum
+        self.retries = retries
+        self.limits = {kind: AdaptiveLimit(kind, initial, maximum, clock=clock) for kind in REQUEST_KINDS}
+
+    @contextmanager
+    def slot(self, kind: str):
+        """Hold a slot of the kind's limit for one request, reporting how it went."""
+        limit = self.limits[kind]
+        started = limit.acquire()
+        try:
+            yield
+        except Exception as error:
+            limit.release(started, 'rate_limited' if is_rate_limited(error) else 'error')
+            raise
+        limit.release(started)
+
+    def should_retry(self, error: Exception, attempt: int) -> bool:
+        """Rate-limited requests are retried, after a backoff, up to the retry limit."""
+        return attempt < self.retries and is_rate_limited(error)
+
+    def retry_delay(self, attempt: int) -> float:
+        """Seconds to wait before retry number attempt + 1."""
+        return ADAPTIVE_CONCURRENCY['retry_delay'] * 2 ** attempt
+
+    def report(self, points: int = 12) -> List[str]:
+        """One line per request kind: the limits chosen over the run and why they went down."""
+        lines = []
+        for kind, limit in self.limits.items():
+            timeline = limit.timeline if len(limit.timeline) <= points else limit.timeline[:1] + limit.timeline[-(points - 1):]
+            history = ' → '.join(f"{value}@{seconds:.0f}s" + (f" ({reason})" if reason not in ('start', 'increase') else '')
+                                 for seconds, value, reason in timeline)
+            backoffs = ', '.join(f"{count} {reason}" for reason, count in sorted(limit.backoffs.items())) or 'no backoffs'
+            lines.append(f"{kind}: {history}; peak {limit.peak_in_flight} in flight, {backoffs}")
+        return lines
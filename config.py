@@ -275,3 +275,99 @@ DEFAULT_FOLDERS = {
 GOOGLE_DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
 CREDENTIALS_FILE = 'credentials.json'
 TOKEN_FILE = 'token.json'
+
+# Drive API requests per second shared by all jobs of a --jobs-manifest run
+DRIVE_REQUESTS_PER_SECOND = 10
+
+# Account number patterns, in priority order. Each pattern has one capturing group holding the account.
+# Patterns applied to file names (and to PDF text when the file name has no account)
+ACCOUNT_PATTERNS = [
+    r'account[:\s_]*([A-Z0-9\-]+)',  # Account: 1234-5678 or account_1234-5678
+    r'#([A-Z0-9\-]+)',              # #1234-5678
+    r'ending[:\s]*([0-9]{4})',      # ending 1234
+    r'last[:\s]*([0-9]{4})',        # last 1234
+    r'([0-9]{4}[-*][0-9]{4}[-*][0-9]{4}[-*][0-9]{4})',  # Credit card format
+    r'checking[:\s]*([A-Z0-9\-]+)', # Checking: 1234-5678
+    r'savings[:\s]*([A-Z0-9\-]+)',  # Savings: 1234-5678
+    r'brokerage[:\s]*([A-Z0-9\-]+)', # Brokerage: 1234-5678
+]
+
+# Patterns applied to PDF text - digits only
+TEXT_ACCOUNT_PATTERNS = [
+    # Full account numbers with clear delimiters
+    r'account\s*(?:number|#|no\.?)[:\s]*([0-9]{4,20})',  # account number: 12345678
+    r'account[:\s]+([0-9]{4,20})',  # account: 12345678
+    r'acct\.?\s*(?:number|#|no\.?)[:\s]*([0-9]{4,20})',  # acct number: 12345678
+    r'acct[:\s]+([0-9]{4,20})',  # acct: 12345678
+    
+    # Ending patterns - most common in statements
+    r'ending\s+in[:\s]*([0-9]{3,8})',  # ending in 12345
+    r'ending[:\s]+([0-9]{3,8})',  # ending: 12345
+    r'account\s+ending[:\s]+([0-9]{3,8})',  # account ending: 12345
+    
+    # Card patterns with masking
+    r'(?:x{4,}|\*{4,})[^0-9]*([0-9]{4,5})',  # xxxx1234 or ****12345
+    r'card\s+ending[:\s]*([0-9]{4,5})',  # card ending: 1234
+    
+    # Hyphenated patterns (common format)
+    r'([0-9]{4}-[0-9]{4,8})',  # 1234-56789
+    r'([0-9]{6,8}-[0-9]{2,4})',  # 123456-78
+    
+    # Direct number patterns (be more selective)
+    r'\b([0-9]{8,16})\b',  # 8-16 digit standalone numbers
+]
+
+# Patterns that match full card numbers and must pass the Luhn check
+CARD_NUMBER_PATTERNS = [
+    r'([0-9]{4}[-*][0-9]{4}[-*][0-9]{4}[-*][0-9]{4})',
+]
+
+# Seconds before a file that failed is tried again, by failure reason. The delay
+# doubles with every further failure of the same file version, up to the maximum.
+NEGATIVE_CACHE_RETRY_DELAYS = {
+    'download_failed': 15 * 60,
+    'corrupt_pdf': 12 * 60 * 60,
+    'unclassified': 12 * 60 * 60,
+}
+NEGATIVE_CACHE_MAX_DELAY = 30 * 24 * 60 * 60
+
+# Renames of a batch that Drive answers with 429 or a 5xx error are sent again,
+# up to this many times, after BATCH_RETRY_DELAY seconds, doubled each time
+BATCH_RETRIES = 3
+BATCH_RETRY_DELAY = 1.0
+
+# Local cache of downloaded PDFs, keyed by md5 (--blob-cache-dir)
+BLOB_CACHE_MAX_MB = 2048
+
+# --adaptive-concurrency: requests in flight per kind start at 'initial' and grow
+# by about one per round of healthy responses, up to --max-workers. A rate-limit
+# response, or a window of responses whose p95 latency exceeds latency_factor
+# times the best window's, multiplies the limit by 'decrease'. Rate-limited
+# requests are retried up to 'retries' times, waiting retry_delay seconds, doubled each time.
+ADAPTIVE_CONCURRENCY = {
+    'initial': 2,
+    'decrease': 0.5,
+    'latency_factor': 2.0,
+    'window': 20,
+    'retries': 3,
+    'retry_delay': 1.0,
+    # Without --max-workers, the limits may grow to this multiple of --workers
+    'max_workers_factor': 4,
+}
+
+# Costs assumed by --estimate until previous runs have measured them (run_metrics.json)
+ESTIMATE_DEFAULT_COSTS = {
+    'metadata_seconds': 0.3,  # Per list/get request
+    'mutation_seconds': 0.6,  # Per copy/create request
+    'download_bytes_per_second': 2 * 1024 * 1024,
+    'extract_seconds': 0.25,  # Per PDF parsed
+}
+
+
+def classification_fingerprint() -> str:
+    """Short hash of the classification patterns; it changes whenever they are edited."""
+    import hashlib
+    import json
+    
+    patterns = [COMPANY_PATTERNS, STATEMENT_PATTERNS, ACCOUNT_PATTERNS, TEXT_ACCOUNT_PATTERNS, CARD_NUMBER_PATTERNS]
+    return hashlib.sha1(json.dumps(patterns, sort_keys=True).encode()).hexdigest()[:16]
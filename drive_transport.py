@@ -0,0 +1,100 @@
+"""
+Thread-safe Google Drive transport.
+
+httplib2-based API clients must not be shared between threads, so every
+worker thread gets its own authorized HTTP client and Drive service, each
+keeping its own keep-alive connection. All clients share one credential
+object whose token refreshes are serialized.
+"""
+
+import threading
+from typing import Callable, List, Optional
+
+
+class SharedCredentials:
+    """Wraps google.auth credentials so concurrent requests trigger at most one refresh."""
+
+    def __init__(self, credentials, on_refresh: Optional[Callable] = None):
+        self._credentials = credentials
+        self._on_refresh = on_refresh
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.refresh_count = 0
+
+    def _refresh(self, request):
+        self._credentials.refresh(request)
+        self.refresh_count += 1
+        if self._on_refresh:
+            self._on_refresh(self._credentials)
+
+    def before_request(self, request, method, url, headers):
+        """Refresh an expired token if needed, then add the authorization header."""
+        with self._lock:
+            if not self._credentials.valid:
+                self._refresh(request)
+            self._credentials.apply(headers)
+            self._local.token = self._credentials.token
+
+    def refresh(self, request):
+        """Refresh after a 401 unless another thread already replaced the token this thread used."""
+        used_token = getattr(self._local, 'token', None)
+        with self._lock:
+            if self._credentials.valid and self._credentials.token != used_token:
+                return
+            self._refresh(request)
+
+    def __getattr__(self, name):
+        return getattr(self._credentials, name)
+
+
+class DriveTransport:
+    """Hands each thread its own authorized HTTP client and Drive service."""
+
+    def __init__(self, credentials, timeout: int = 60, on_refresh: Optional[Callable] = None):
+        self.credentials = SharedCredentials(credentials, on_refresh)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._clients: List = []
+        self._discovery_document = None
+
+    def http(self):
+        """Return this thread's authorized HTTP client, creating it on first use."""
+        client = getattr(self._local, 'http', None)
+        if client is None:
+            import httplib2
+            from google_auth_httplib2 import AuthorizedHttp
+
+            client = AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=self.timeout))
+            self._local.http = client
+            with self._lock:
+                self._clients.append(client)
+        return client
+
+    def service(self):
+        """Return this thread's Drive v3 service, creating it on first use."""
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            from googleapiclient.discovery import build_from_document
+            from googleapiclient.discovery_cache import get_static_doc
+
+            with self._lock:
+                if self._discovery_document is None:
+                    self._discovery_document = get_static_doc('drive', 'v3')
+            service = build_from_document(self._discovery_document, http=self.http())
+            self._local.service = service
+        return service
+
+    @property
+    def client_count(self) -> int:
+        """Number of per-thread clients created so far."""
+        return len(self._clients)
+
+    def close(self):
+        """Close the keep-alive connections of every client."""
+        with self._lock:
+            for client in self._clients:
+                for connection in client.connections.values():
+                    connection.close()
+                client.connections.clear()
+            self._clients = []
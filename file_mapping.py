@@ -2,19 +2,33 @@
 File mapping system for caching PDF classification results.
 """
 
+import csv
 import json
 import os
 import hashlib
-from typing import Dict, Optional, Tuple
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from datetime import datetime
 
+from config import classification_fingerprint
+
+
+# Fields written by export_mapping and read by import_manual_mapping
+EXPORT_FIELDS = ['file_name', 'company', 'statement_type', 'account_info', 'last_updated']
+
 
 class FileMapping:
     """Manages local file mapping cache for PDF classifications."""
     
-    def __init__(self, cache_file: str = 'file_mapping_cache.json'):
+    def __init__(self, cache_file: str = 'file_mapping_cache.json', fingerprint: Optional[str] = None):
         self.cache_file = cache_file
+        # Entries classified under other patterns are stale; see stale_entries()
+        self.fingerprint = fingerprint or classification_fingerprint()
         self.cache = self._load_cache()
+        self._name_index: Optional[Dict[str, List[str]]] = None
+        self._md5_index: Optional[Dict[str, str]] = None
+        # One mapping may be shared by concurrent workers and jobs
+        self._lock = threading.RLock()
     
     def _load_cache(self) -> Dict:
         """Load existing cache from file."""
@@ -29,7 +43,7 @@ class FileMapping:
     def _save_cache(self):
         """Save cache to file."""
         try:
-            with open(self.cache_file, 'w') as f:
+            with self._lock, open(self.cache_file, 'w') as f:
                 json.dump(self.cache, f, indent=2)
         except IOError:
             pass  # Fail silently if can't save
@@ -43,8 +57,8 @@ class FileMapping:
         """Get cached classification for a file."""
         key = self._get_file_key(file_id, file_name, file_size)
         
-        if key in self.cache:
-            cached = self.cache[key]
+        cached = self.cache.get(key)
+        if cached is not None:
             return (
                 cached.get('company'),
                 cached.get('statement_type'),
@@ -55,9 +69,29 @@ class FileMapping:
     
     def set_classification(self, file_id: str, file_name: str, company: Optional[str], 
                           statement_type: Optional[str], account_info: Optional[str],
-                          file_size: Optional[str] = None):
-        """Cache classification result for a file."""
+                          file_size: Optional[str] = None, file_md5: Optional[str] = None):
+        """Cache classification result for a file. The md5 lets --reclassify find its stored text."""
+        with self._lock:
+            self._set_entry(file_id, file_name, company, statement_type, account_info, file_size, file_md5)
+            self._save_cache()
+    
+    def set_classifications(self, entries: Iterable[Tuple]):
+        """
+        Cache several classifications and save once. Each entry has the arguments of
+        set_classification: (file_id, file_name, company, statement_type, account_info, file_size, file_md5).
+        """
+        with self._lock:
+            for entry in entries:
+                self._set_entry(*entry)
+            self._save_cache()
+    
+    def _set_entry(self, file_id: str, file_name: str, company: Optional[str], statement_type: Optional[str],
+                   account_info: Optional[str], file_size: Optional[str] = None, file_md5: Optional[str] = None):
         key = self._get_file_key(file_id, file_name, file_size)
+        if self._name_index is not None and key not in self.cache:
+            self._name_index.setdefault(file_name, []).append(key)
+        if self._md5_index is not None and file_md5 and company and statement_type:
+            self._md5_index[file_md5] = key
         
         self.cache[key] = {
             'file_id': file_id,
@@ -66,16 +100,76 @@ class FileMapping:
             'company': company,
             'statement_type': statement_type,
             'account_info': account_info,
+            'md5': file_md5,
+            'fingerprint': self.fingerprint,
             'last_updated': datetime.now().isoformat(),
             'classification_version': '1.0'  # For future compatibility
         }
-        
-        self._save_cache()
+    
+    def _get_md5_index(self) -> Dict[str, str]:
+        """
+        Map content md5s to the most recently classified cache key. Built on first use.
+        Unclassified entries are left out, as another copy of the file may be classifiable by its name.
+        """
+        with self._lock:
+            if self._md5_index is None:
+                md5_index = {}
+                for key, cached in sorted(self.cache.items(), key=lambda item: item[1].get('last_updated') or ''):
+                    if cached.get('md5') and cached.get('company') and cached.get('statement_type'):
+                        md5_index[cached['md5']] = key
+                self._md5_index = md5_index
+            return self._md5_index
+    
+    def cached_md5s(self) -> Set[str]:
+        """Content md5s that have a cached (successful) classification."""
+        return set(self._get_md5_index())
+    
+    def get_classification_by_md5(self, file_md5: Optional[str]) -> Optional[Tuple[str, str, str]]:
+        """Get the cached classification of any file with this content, whatever its ID or name."""
+        key = self._get_md5_index().get(file_md5) if file_md5 else None
+        if key is None:
+            return None
+        cached = self.cache[key]
+        return cached.get('company'), cached.get('statement_type'), cached.get('account_info')
+    
+    def stale_entries(self) -> List[Tuple[str, Dict]]:
+        """Return (key, entry) for entries classified under other patterns, leaving manual overrides alone."""
+        with self._lock:
+            return [(key, entry) for key, entry in self.cache.items()
+                    if entry.get('fingerprint') != self.fingerprint and not entry.get('manual_override')]
+    
+    def update_classifications(self, updates: Dict[str, Tuple[Optional[str], Optional[str], Optional[str]]]):
+        """Replace the classification of several entries, by key, and save once."""
+        now = datetime.now().isoformat()
+        with self._lock:
+            for key, (company, statement_type, account_info) in updates.items():
+                if key in self.cache:
+                    self.cache[key].update({
+                        'company': company,
+                        'statement_type': statement_type,
+                        'account_info': account_info,
+                        'fingerprint': self.fingerprint,
+                        'last_updated': now
+                    })
+            self._save_cache()
     
     def clear_cache(self):
         """Clear all cached data."""
-        self.cache = {}
-        self._save_cache()
+        with self._lock:
+            self.cache = {}
+            self._name_index = None
+            self._md5_index = None
+            self._save_cache()
+    
+    def _get_name_index(self) -> Dict[str, List[str]]:
+        """Map file names to cache keys, in cache order. Built on first use."""
+        with self._lock:
+            if self._name_index is None:
+                name_index = {}
+                for key, cached in self.cache.items():
+                    name_index.setdefault(cached.get('file_name'), []).append(key)
+                self._name_index = name_index
+            return self._name_index
     
     def get_cache_stats(self) -> Dict:
         """Get statistics about the cache."""
@@ -83,31 +177,49 @@ class FileMapping:
         classified_files = sum(1 for item in self.cache.values() 
                              if item.get('company') and item.get('statement_type'))
         unclassified_files = total_files - classified_files
+        stale_files = sum(1 for item in self.cache.values()
+                          if item.get('fingerprint') != self.fingerprint and not item.get('manual_override'))
         
         return {
             'total_cached_files': total_files,
             'classified_files': classified_files,
             'unclassified_files': unclassified_files,
+            'stale_files': stale_files,
             'cache_file_size': os.path.getsize(self.cache_file) if os.path.exists(self.cache_file) else 0
         }
     
+    def _export_rows(self) -> Iterator[Dict]:
+        """Yield one export row per cached file."""
+        for data in self.cache.values():
+            yield {field: data.get(field) for field in EXPORT_FIELDS}
+    
     def export_mapping(self, export_file: str = 'file_mapping_export.json'):
-        """Export mapping in a readable format."""
+        """
+        Export mapping in a readable format, chosen by file extension.
+        .jsonl and .csv exports are streamed row by row in cache order;
+        .json exports are sorted by company, then by file name.
+        """
+        extension = os.path.splitext(export_file)[1].lower()
+        
+        if extension == '.jsonl':
+            with open(export_file, 'w') as f:
+                for row in self._export_rows():
+                    f.write(json.dumps(row) + '\n')
+            return export_file
+        
+        if extension == '.csv':
+            with open(export_file, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS)
+                writer.writeheader()
+                writer.writerows(self._export_rows())
+            return export_file
+        
         export_data = {
             'export_date': datetime.now().isoformat(),
             'total_files': len(self.cache),
-            'files': []
+            'files': list(self._export_rows())
         }
         
-        for key, data in self.cache.items():
-            export_data['files'].append({
-                'file_name': data.get('file_name'),
-                'company': data.get('company'),
-                'statement_type': data.get('statement_type'),
-                'account_info': data.get('account_info'),
-                'last_updated': data.get('last_updated')
-            })
-        
         # Sort by company, then by file name
         export_data['files'].sort(key=lambda x: (x.get('company') or '', x.get('file_name') or ''))
         
@@ -116,28 +228,43 @@ class FileMapping:
         
         return export_file
     
+    def _read_manual_mappings(self, mapping_file: str) -> Iterator[Dict]:
+        """Yield manual mappings from a .json, .jsonl or .csv file."""
+        extension = os.path.splitext(mapping_file)[1].lower()
+        
+        with open(mapping_file, 'r', newline='' if extension == '.csv' else None) as f:
+            if extension == '.jsonl':
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            elif extension == '.csv':
+                for row in csv.DictReader(f):
+                    # Empty CSV cells mean no value
+                    yield {field: value or None for field, value in row.items()}
+            else:
+                yield from json.load(f).get('files', [])
+    
     def import_manual_mapping(self, mapping_file: str):
         """Import manual mappings from a file."""
         try:
-            with open(mapping_file, 'r') as f:
-                manual_mappings = json.load(f)
-            
-            for mapping in manual_mappings.get('files', []):
-                # Find existing cache entry by file name
-                for key, cached in self.cache.items():
-                    if cached.get('file_name') == mapping.get('file_name'):
+            with self._lock:
+                name_index = self._get_name_index()
+                
+                for mapping in self._read_manual_mappings(mapping_file):
+                    # Find existing cache entry by file name
+                    keys = name_index.get(mapping.get('file_name'))
+                    if keys:
                         # Update with manual classification
-                        cached.update({
+                        self.cache[keys[0]].update({
                             'company': mapping.get('company'),
                             'statement_type': mapping.get('statement_type'),
                             'account_info': mapping.get('account_info'),
                             'last_updated': datetime.now().isoformat(),
                             'manual_override': True
                         })
-                        break
-            
-            self._save_cache()
+                
+                self._save_cache()
             return True
             
-        except (json.JSONDecodeError, IOError, KeyError):
+        except (json.JSONDecodeError, csv.Error, IOError, KeyError, AttributeError):
             return False
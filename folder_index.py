@@ -0,0 +1,94 @@
+"""
+Per-folder index of existing files used for duplicate detection.
+"""
+
+import os
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional
+
+
+# Common date patterns stripped from file names before similarity checks
+_ISO_DATE_PATTERN = re.compile(r'[-_]\d{4}[-_]\d{2}[-_]\d{2}')
+_COMPACT_DATE_PATTERN = re.compile(r'[-_]\d{8}')
+
+
+def normalize_base_name(file_name: str) -> str:
+    """Strip the extension and date suffixes from a file name and lowercase it."""
+    base_name = os.path.splitext(file_name)[0]
+    base_name = _ISO_DATE_PATTERN.sub('', base_name)
+    base_name = _COMPACT_DATE_PATTERN.sub('', base_name)
+    return base_name.lower()
+
+
+class FolderContentsIndex:
+    """Index of the files in one destination folder by name, MD5 and normalized base name."""
+
+    def __init__(self, files: Iterable[Dict] = ()):
+        self._lock = threading.Lock()
+        self.by_id: Dict[str, Dict] = {}
+        self.by_name: Dict[str, List[Dict]] = {}
+        self.by_md5: Dict[str, List[Dict]] = {}
+        self.by_base_name: Dict[str, List[Dict]] = {}
+        self._sorted_base_names: List[str] = []
+
+        for file in files:
+            self.add(file)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def add(self, file: Dict):
+        """Add a file (id, name and optionally size/md5Checksum) to the index."""
+        with self._lock:
+            if file['id'] in self.by_id:
+                return
+
+            self.by_id[file['id']] = file
+            self.by_name.setdefault(file['name'], []).append(file)
+
+            if file.get('md5Checksum'):
+                self.by_md5.setdefault(file['md5Checksum'], []).append(file)
+
+            base_name = normalize_base_name(file['name'])
+            if base_name not in self.by_base_name:
+                self.by_base_name[base_name] = []
+                insort(self._sorted_base_names, base_name)
+            self.by_base_name[base_name].append(file)
+
+    def find_by_name(self, file_name: str) -> List[Dict]:
+        """Return files with exactly this name."""
+        return list(self.by_name.get(file_name, []))
+
+    def find_by_md5(self, md5: str) -> List[Dict]:
+        """Return files with this MD5 checksum."""
+        return list(self.by_md5.get(md5, []))
+
+    def has_name(self, file_name: str) -> bool:
+        """Check whether a file with this exact name exists."""
+        return file_name in self.by_name
+
+    def find_similar(self, file_name: str, exclude_id: Optional[str] = None) -> List[Dict]:
+        """
+        Return files whose normalized base name equals, is a prefix of, or
+        starts with the normalized base name of file_name.
+        """
+        base_name = normalize_base_name(file_name)
+        matches = []
+
+        with self._lock:
+            # Other names that start with this base name (including equal names)
+            position = bisect_left(self._sorted_base_names, base_name)
+            while position < len(self._sorted_base_names):
+                other = self._sorted_base_names[position]
+                if not other.startswith(base_name):
+                    break
+                matches.extend(self.by_base_name[other])
+                position += 1
+
+            # Other names that are proper prefixes of this base name
+            for length in range(len(base_name)):
+                matches.extend(self.by_base_name.get(base_name[:length], []))
+
+        return [file for file in matches if file['id'] != exclude_id]
@@ -0,0 +1,222 @@
+"""
+Assignment of classified statements to existing destination folders.
+
+Folders are scored as before: 10 points for a company pattern in the folder
+name, 50 for the account digits or 23 for their last three digits, and 5
+for a statement type pattern. The best folder scoring 10 or more wins. A
+weak match falls back to a folder whose name contains the company name.
+
+FolderMatcher computes each folder's pattern hits once, indexes the digit
+substrings of the folder names, and scores only the folders that share a
+feature with the statement. Results are cached per distinct (company,
+statement type, account digits), which most statements share with others.
+"""
+
+import re
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from account_extractor import account_digit_suffix
+
+
+# Folder name patterns per company, in priority order
+COMPANY_FOLDER_PATTERNS = {
+    'american express': ['amex', 'american express', 'blue'],
+    'chase': ['chase', 'freedom'],
+    'citi': ['citi', 'best buy', 'american airlines', 'double cash'],
+    'schwab': ['schwab', 'charles schwab'],
+    'capital one': ['capital one', 'quicksilver', 'savor'],
+    'synchrony': ['synchrony', 'amazon store'],
+    'sofi': ['sofi'],
+    't-mobile': ['t-mobile', 'tmobile'],
+    'paypal': ['paypal'],
+    'wise': ['wise'],
+    'wells fargo': ['wells'],
+    'bank of america': ['bank of america', 'bofa'],
+    'apple': ['apple'],
+    'td bank': ['td bank', 'td'],
+    'at&t': ['at&t', 'att'],
+    'swan bitcoin': ['swan'],
+    'okcoin': ['okcoin', 'ok coin'],
+}
+
+# Folder name patterns per statement type, in priority order
+TYPE_FOLDER_PATTERNS = {
+    'bank statement': ['checking', 'savings', 'money', 'bank'],
+    'credit card statement': ['credit', 'card'],
+    'investment statement': ['brokerage', 'ira', 'broker', 'investment'],
+    'loan statement': ['loan'],
+    'utility statement': ['bill', 'utility'],
+    'monthly statement': ['statement', 'checking', 'savings', 'money']  # Monthly can be bank statements
+}
+
+COMPANY_SCORE = 10
+ACCOUNT_SCORE = 50
+PARTIAL_ACCOUNT_SCORE = 23  # 20 + length of the three-digit suffix
+TYPE_SCORE = 5
+MATCH_THRESHOLD = 10
+FALLBACK_THRESHOLD = 15
+
+_DIGIT_RUNS = re.compile(r'\d+')
+
+
+class FolderMatch(NamedTuple):
+    """
+    Result of matching a statement. rule is 'score', 'company_fallback' or
+    'final_fallback'; for 'low_confidence' the best folder scored too low to
+    be used and folder_id is None.
+    """
+    folder_id: Optional[str]
+    folder_name: Optional[str]
+    score: int
+    reasons: Tuple[str, ...]
+    rule: str
+
+
+def _first_pattern(name: str, patterns: List[str]) -> Optional[str]:
+    """Return the first pattern that occurs in a lowercased folder name."""
+    for pattern in patterns:
+        if pattern in name:
+            return pattern
+    return None
+
+
+class FolderMatcher:
+    """Scores statements against the folders of one destination folder."""
+
+    def __init__(self, folders: Iterable[Dict] = ()):
+        self._lock = threading.Lock()
+        self.folders: List[Dict] = []
+        self._names: List[str] = []
+        self._company_hits: Dict[str, Dict[int, str]] = {}
+        self._type_hits: Dict[str, Dict[int, str]] = {}
+        self._digit_index: Dict[str, Set[int]] = {}
+        self._company_name_hits: Dict[str, List[int]] = {}
+        self._base: Dict[Tuple, Tuple] = {}
+        self._results: Dict[Tuple, Optional[FolderMatch]] = {}
+        for folder in folders:
+            self._add(folder)
+
+    def __len__(self) -> int:
+        return len(self.folders)
+
+    def _add(self, folder: Dict):
+        position = len(self.folders)
+        name = folder['name'].lower()
+        self.folders.append(folder)
+        self._names.append(name)
+
+        for hits, patterns_by_key in ((self._company_hits, COMPANY_FOLDER_PATTERNS),
+                                      (self._type_hits, TYPE_FOLDER_PATTERNS)):
+            for key, patterns in patterns_by_key.items():
+                pattern = _first_pattern(name, patterns)
+                if pattern:
+                    hits.setdefault(key, {})[position] = pattern
+
+        # Account digits are 3-5 digits long, so index every such substring of each digit run
+        for run in _DIGIT_RUNS.findall(name):
+            for length in range(3, 6):
+                for start in range(len(run) - length + 1):
+                    self._digit_index.setdefault(run[start:start + length], set()).add(position)
+
+        for company, positions in self._company_name_hits.items():
+            if company in name:
+                positions.append(position)
+
+    def has_folder(self, folder_id: str) -> bool:
+        """Check whether a folder is among the matched folders."""
+        return any(folder['id'] == folder_id for folder in self.folders)
+
+    def add_folder(self, folder: Dict):
+        """Add a folder created during the run."""
+        with self._lock:
+            self._add(folder)
+            self._base.clear()
+            self._results.clear()
+
+    def _folders_named_after(self, company: str) -> List[int]:
+        """Positions of folders whose name contains the company name, in listing order."""
+        positions = self._company_name_hits.get(company)
+        if positions is None:
+            positions = [position for position, name in enumerate(self._names) if company in name]
+            self._company_name_hits[company] = positions
+        return positions
+
+    def _base_scores(self, company: Optional[str], statement_type: Optional[str]):
+        """
+        Company and type points per folder, with the folders ordered best first
+        (ties in listing order). Shared by every statement of the same company and type.
+        """
+        key = (company, statement_type)
+        if key not in self._base:
+            scores: Dict[int, int] = {}
+            reasons: Dict[int, List[str]] = {}
+            for hits, points, label in ((self._company_hits.get(company, {}), COMPANY_SCORE, 'company'),
+                                        (self._type_hits.get(statement_type, {}), TYPE_SCORE, 'type')):
+                for position, pattern in hits.items():
+                    scores[position] = scores.get(position, 0) + points
+                    reasons.setdefault(position, []).append(f'{label}:{pattern}')
+            ranking = sorted(scores, key=lambda position: (-scores[position], position))
+            self._base[key] = (scores, reasons, ranking)
+        return self._base[key]
+
+    def _score(self, company: Optional[str], statement_type: Optional[str],
+               account_digits: Optional[str]) -> Optional[FolderMatch]:
+        company_lower = company.lower() if company else None
+        scores, reasons, ranking = self._base_scores(company_lower, statement_type)
+
+        # Account points go between the company and type reasons, as they always have
+        boosted: Dict[int, Tuple[int, str]] = {}
+        if account_digits:
+            exact = self._digit_index.get(account_digits, set())
+            for position in exact:
+                boosted[position] = (ACCOUNT_SCORE, f'account:{account_digits}')
+            partial = account_digits[-3:]
+            for position in self._digit_index.get(partial, set()) - exact:
+                boosted[position] = (PARTIAL_ACCOUNT_SCORE, f'partial_account:{partial}')
+
+        candidates = [(-(scores.get(position, 0) + points), position) for position, (points, _) in boosted.items()]
+        unboosted = next((position for position in ranking if position not in boosted), None)
+        if unboosted is not None:
+            candidates.append((-scores[unboosted], unboosted))
+
+        if candidates:
+            # Highest score wins; ties go to the folder listed first
+            best_score, best = min(candidates)
+            best_score = -best_score
+            best_reasons = list(reasons.get(best, []))
+            if best in boosted:
+                company_reasons = [reason for reason in best_reasons if reason.startswith('company:')]
+                best_reasons = company_reasons + [boosted[best][1]] + best_reasons[len(company_reasons):]
+
+            if best_score < FALLBACK_THRESHOLD and company_lower:
+                named = self._folders_named_after(company_lower)
+                if named:
+                    return self._match(named[0], 0, (), 'company_fallback')
+            if best_score >= MATCH_THRESHOLD:
+                return self._match(best, best_score, tuple(best_reasons), 'score')
+            return FolderMatch(None, None, best_score, tuple(best_reasons), 'low_confidence')
+
+        if company_lower:
+            named = self._folders_named_after(company_lower)
+            if named:
+                return self._match(named[0], 0, (), 'final_fallback')
+        return None
+
+    def _match(self, position: int, score: int, reasons: Tuple[str, ...], rule: str) -> FolderMatch:
+        folder = self.folders[position]
+        return FolderMatch(folder['id'], folder['name'], score, reasons, rule)
+
+    def match(self, company: Optional[str], statement_type: Optional[str],
+              account_info: Optional[str]) -> Optional[FolderMatch]:
+        """Find the folder for a statement, or None if no folder matches at all."""
+        key = (company, statement_type, account_digit_suffix(account_info))
+        with self._lock:
+            if key not in self._results:
+                self._results[key] = self._score(*key)
+            return self._results[key]
+
+    def assign(self, classifications: Iterable[Tuple[Optional[str], Optional[str], Optional[str]]]
+               ) -> List[Optional[FolderMatch]]:
+        """Match many (company, statement_type, account_info) classifications at once, in order."""
+        return [self.match(*classification) for classification in classifications]
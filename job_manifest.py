@@ -0,0 +1,117 @@
+"""
+Job manifests: several source/destination folder pairs organized in one run.
+
+A manifest is a JSON file:
+
+    {
+        "requests_per_second": 10,
+        "jobs": [
+            {"name": "personal", "source_folder_id": "...", "dest_folder_id": "..."},
+            {"name": "business", "source_folder_name": "Business Statements",
+             "dest_folder_name": "Business by Account",
+             "credentials_file": "business_credentials.json", "workers": 2}
+        ]
+    }
+"""
+
+import json
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from config import CREDENTIALS_FILE, TOKEN_FILE, DEFAULT_FOLDERS
+from scheduling import parse_order
+
+
+DUPLICATE_HANDLING_CHOICES = ['smart', 'skip', 'rename', 'force']
+
+JOB_FIELDS = {
+    'name', 'source_folder_id', 'dest_folder_id', 'source_folder_name', 'dest_folder_name',
+    'credentials_file', 'token_file', 'dry_run', 'duplicate_handling', 'workers', 'order',
+}
+
+
+class OrganizeJob(NamedTuple):
+    """One source folder to organize into one destination folder."""
+    name: str
+    source_folder_id: Optional[str]
+    dest_folder_id: Optional[str]
+    source_folder_name: str
+    dest_folder_name: str
+    credentials_file: str
+    token_file: str
+    dry_run: bool
+    duplicate_handling: str
+    workers: int
+    order: Tuple[str, ...]
+
+
+def _parse_order(order, owner: str) -> List[str]:
+    """Parse an order setting of the manifest, a comma-separated string of orderings."""
+    if not isinstance(order, str):
+        raise ValueError(f"{owner}: order must be a comma-separated string, e.g. \"cached,newest\"")
+    return parse_order(order)
+
+
+def parse_job(entry: Dict, position: int, dry_run: bool = False, workers: int = 1,
+              order: Sequence[str] = ()) -> OrganizeJob:
+    """Validate a manifest entry and fill in defaults."""
+    unknown = set(entry) - JOB_FIELDS
+    if unknown:
+        raise ValueError(f"Job {position}: unknown fields {', '.join(sorted(unknown))}")
+
+    name = entry.get('name') or f'job-{position}'
+    credentials_file = entry.get('credentials_file', CREDENTIALS_FILE)
+    token_file = entry.get('token_file')
+    if not token_file:
+        # Jobs with their own credentials must not overwrite each other's token
+        token_file = TOKEN_FILE if credentials_file == CREDENTIALS_FILE else f'token_{name}.json'
+
+    duplicate_handling = entry.get('duplicate_handling', 'smart')
+    if duplicate_handling not in DUPLICATE_HANDLING_CHOICES:
+        raise ValueError(f"Job {name}: duplicate_handling must be one of {', '.join(DUPLICATE_HANDLING_CHOICES)}")
+
+    job_workers = entry.get('workers', workers)
+    if not isinstance(job_workers, int) or job_workers < 1:
+        raise ValueError(f"Job {name}: workers must be a positive integer")
+
+    job_order = _parse_order(entry['order'], f"Job {name}") if 'order' in entry else order
+
+    return OrganizeJob(
+        name=name,
+        source_folder_id=entry.get('source_folder_id'),
+        dest_folder_id=entry.get('dest_folder_id'),
+        source_folder_name=entry.get('source_folder_name', DEFAULT_FOLDERS['monthly_statements']),
+        dest_folder_name=entry.get('dest_folder_name', DEFAULT_FOLDERS['statements_by_account']),
+        credentials_file=credentials_file,
+        token_file=token_file,
+        dry_run=bool(entry.get('dry_run', dry_run)),
+        duplicate_handling=duplicate_handling,
+        workers=job_workers,
+        order=tuple(job_order),
+    )
+
+
+def load_job_manifest(path: str, dry_run: bool = False, workers: int = 1,
+                      order: Sequence[str] = ()) -> Tuple[Dict, List[OrganizeJob]]:
+    """
+    Load a manifest into (settings, jobs).
+    dry_run, workers and order are the defaults for jobs that do not set them.
+    """
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+
+    entries = manifest.get('jobs') if isinstance(manifest, dict) else None
+    if not entries:
+        raise ValueError(f"Manifest {path} has no jobs")
+
+    if 'order' in manifest:
+        order = _parse_order(manifest['order'], f"Manifest {path}")
+    jobs = [parse_job(entry, position, dry_run, manifest.get('workers', workers), order)
+            for position, entry in enumerate(entries, 1)]
+
+    names = [job.name for job in jobs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Manifest {path} has duplicate job names: {', '.join(duplicates)}")
+
+    settings = {key: value for key, value in manifest.items() if key != 'jobs'}
+    return settings, jobs
@@ -0,0 +1,218 @@
+"""
+Statement sources on local disk, for bulk classification without Drive.
+
+A source lists statement files as DriveFile records and reads their
+content. LocalDirectorySource serves a local directory such as a Google
+Takeout export or a scanner inbox. It walks the tree with os.scandir and
+reads files through mmap.
+
+classify_local_files identifies each file by the md5 of its content, so a
+file that was moved, renamed or already classified from Drive keeps its
+cached classification. Files are read through the source, hashed, classified
+and parsed in worker processes, so PDF parsing runs on every core instead of
+under one GIL. Sources are therefore pickled to the workers.
+"""
+
+import csv
+import hashlib
+import mmap
+import os
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, FrozenSet, Iterator, NamedTuple, Optional, Sequence
+
+from classifier import classify
+from drive_file import DriveFile
+from file_mapping import FileMapping
+from pdf_backends import DEFAULT_BACKEND, PDFTextExtractor
+from text_store import TextStore
+
+
+MANIFEST_FIELDS = ['path', 'file_name', 'size', 'md5', 'company', 'statement_type', 'account_info', 'source', 'error']
+
+# Results are written to the cache in batches, so an interrupted run keeps most of its work
+SAVE_EVERY = 500
+
+
+class StatementSource(ABC):
+    """Where statements come from: a listing of files and a way to read each one."""
+
+    @abstractmethod
+    def list_files(self) -> Iterator[DriveFile]:
+        """List the statement files of the source."""
+
+    @abstractmethod
+    def read(self, file: DriveFile):
+        """Return the file's content (bytes or a memory map; close maps after use), or None."""
+
+
+class LocalDirectorySource(StatementSource):
+    """
+    Files below a local directory. Record IDs are the paths, parents the
+    containing directory, and modified times are in Drive's format.
+    """
+
+    def __init__(self, root: str, extensions: Sequence[str] = ('.pdf',)):
+        self.root = root
+        self.extensions = tuple(extension.lower() for extension in extensions)
+
+    def list_files(self) -> Iterator[DriveFile]:
+        pending = [self.root]
+        while pending:
+            directory = pending.pop()
+            try:
+                with os.scandir(directory) as entries:
+                    entries = sorted(entries, key=lambda entry: entry.name)
+            except OSError:
+                continue  # Unreadable directory
+            subdirectories = []
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                elif entry.is_file() and entry.name.lower().endswith(self.extensions):
+                    stat = entry.stat()
+                    modified = datetime.fromtimestamp(stat.st_mtime, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+                    yield DriveFile(entry.path, entry.name, 'application/pdf', str(stat.st_size),
+                                    modified_time=modified, parents=(directory,))
+            # Depth first, in name order
+            pending.extend(reversed(subdirectories))
+
+    def read(self, file: DriveFile):
+        return read_mapped(file.id)
+
+
+def read_mapped(path: str):
+    """Memory-map a file for reading; empty files, which cannot be mapped, are returned as b''."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class LocalResult(NamedTuple):
+    """Classification of one local file. source is 'cache', 'name' or 'pdf'."""
+    path: str
+    file_name: str
+    size: str
+    md5: Optional[str]
+    company: Optional[str]
+    statement_type: Optional[str]
+    account_info: Optional[str]
+    source: Optional[str]
+    text: Optional[str] = None
+    extractor: Optional[str] = None
+    error: Optional[str] = None
+
+
+# Per worker process, set by _init_worker
+_source: Optional[StatementSource] = None
+_extractor: Optional[PDFTextExtractor] = None
+_cached_md5s: FrozenSet[str] = frozenset()
+
+
+def _init_worker(source: StatementSource, backend: str, cached_md5s: FrozenSet[str]):
+    global _source, _extractor, _cached_md5s
+    _source = source
+    _extractor = PDFTextExtractor(backend)
+    _cached_md5s = cached_md5s
+
+
+def classify_local_file(file: DriveFile, source: Optional[StatementSource] = None) -> LocalResult:
+    """
+    Read, hash and classify one file of a source (by default the worker's);
+    the PDF is parsed only if neither the cache nor the name settles it.
+    """
+    source = source or _source
+    extractor = _extractor or PDFTextExtractor(DEFAULT_BACKEND)
+    try:
+        content = source.read(file)
+    except OSError as error:
+        content, read_error = None, str(error)
+    else:
+        read_error = 'unreadable'
+    if content is None:
+        return LocalResult(file.id, file.name, file.size, None, None, None, None, None, error=read_error)
+
+    try:
+        md5 = hashlib.md5(content).hexdigest()
+        if md5 in _cached_md5s:
+            return LocalResult(file.id, file.name, file.size, md5, None, None, None, 'cache')
+
+        extracted = {}
+
+        def load_text() -> Optional[str]:
+            try:
+                extracted['text'] = extractor.extract_text(content)
+            except Exception as error:
+                extracted['error'] = f"corrupt_pdf: {error}"
+                return None
+            return extracted['text']
+
+        company, statement_type, account_info = classify(file.name, load_text)
+        classified_by = 'pdf' if extracted else 'name'
+        return LocalResult(file.id, file.name, file.size, md5, company, statement_type, account_info, classified_by,
+                           extracted.get('text'), extractor.version if 'text' in extracted else None,
+                           extracted.get('error'))
+    finally:
+        if isinstance(content, mmap.mmap):
+            content.close()
+
+
+def classify_local_files(source: StatementSource, file_mapping: FileMapping,
+                         text_store: Optional[TextStore] = None, manifest_path: Optional[str] = None,
+                         processes: Optional[int] = None, backend: str = DEFAULT_BACKEND,
+                         on_result: Optional[Callable[[LocalResult], None]] = None) -> Dict:
+    """
+    Classify every file of a local source in worker processes. Results go to the
+    classification cache, keyed by content md5, or with manifest_path to a CSV
+    manifest instead. Extracted text is kept in the text store for --reclassify.
+    Returns counts of the files by outcome.
+    """
+    started = time.perf_counter()
+    stats = {'files': 0, 'classified': 0, 'unclassified': 0, 'cache': 0, 'name': 0, 'pdf': 0, 'errors': 0}
+    pending = []
+    manifest = open(manifest_path, 'w', newline='') if manifest_path else None
+    writer = csv.DictWriter(manifest, fieldnames=MANIFEST_FIELDS) if manifest else None
+    if writer:
+        writer.writeheader()
+
+    def flush():
+        if pending and not manifest:
+            file_mapping.set_classifications(pending)
+        pending.clear()
+
+    try:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(source, backend, frozenset(file_mapping.cached_md5s()))) as executor:
+            # Results come back in listing order, a chunk of files per round trip
+            for result in executor.map(classify_local_file, source.list_files(), chunksize=16):
+                if result.source == 'cache':
+                    company, statement_type, account_info = file_mapping.get_classification_by_md5(result.md5)
+                    result = result._replace(company=company, statement_type=statement_type, account_info=account_info)
+                elif result.md5 and not manifest:
+                    pending.append((f"md5:{result.md5}", result.file_name, result.company, result.statement_type,
+                                    result.account_info, result.size, result.md5))
+                if result.text is not None and text_store:
+                    text_store.put(result.md5, result.extractor, result.text)
+
+                stats['files'] += 1
+                stats['classified' if result.company and result.statement_type else 'unclassified'] += 1
+                if result.source:
+                    stats[result.source] += 1
+                if result.error:
+                    stats['errors'] += 1
+                if writer:
+                    writer.writerow({field: getattr(result, field) for field in MANIFEST_FIELDS})
+                if on_result:
+                    on_result(result)
+                if len(pending) >= SAVE_EVERY:
+                    flush()
+        flush()
+    finally:
+        if manifest:
+            manifest.close()
+
+    stats['seconds'] = time.perf_counter() - started
+    return stats
@@ -7,34 +7,53 @@ into a structured "Statements by Account" folder based on company names and stat
 """
 
 import os
-import re
 import json
 import logging
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, Iterator, List, Mapping, Sequence, Tuple, Optional
 from pathlib import Path
 import tempfile
+import signal
+import time
 import concurrent.futures
+import itertools
 import threading
 from functools import partial
+from contextlib import nullcontext
 from datetime import datetime
 
 import click
-from rich.console import Console
-from rich.table import Table
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, MofNCompleteColumn, TimeElapsedColumn
 from dotenv import load_dotenv
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+# Rich, the Google client libraries and PyPDF2 are imported where they are
+# first needed so that local-only commands start without loading them
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload
 
-import PyPDF2
 import io
+import mmap
 
 from file_mapping import FileMapping
+from drive_file import DriveFile, FOLDER_MIME_TYPE, LISTING_FIELDS
+from folder_index import FolderContentsIndex
+from account_extractor import AccountCandidate, FILENAME_EXTRACTOR, TEXT_EXTRACTOR, last_characters
+from drive_transport import DriveTransport
+from rate_limit import RateLimiter
+from job_manifest import OrganizeJob, load_job_manifest
+from work_leases import LeaseStore, default_worker_id
+from scheduling import ORDERINGS, parse_order, schedule_files
+from watcher import DriveWatcher
+from negative_cache import NegativeCache
+from single_flight import SingleFlight
+from folder_matcher import FolderMatcher
+from profiling import PROFILE_MODES, Profiler, SpanTracer
+from blob_cache import BlobCache
+from text_store import TextStore
+from local_source import LocalDirectorySource, classify_local_files
+from classify_service import ClassificationService, create_server, parse_address, server_address_text, shutdown_server
+from run_metrics import RunMetrics, average_costs, estimate_run_costs, operation_kind
+from concurrency import ConcurrencyController, adaptive_maximum, is_retryable
+from classifier import classify, classify_name, find_company, find_statement_type
+from pdf_backends import BACKEND_CHOICES, DEFAULT_BACKEND, PDFTextExtractor
+from snapshot import walk_drive_tree, write_snapshot, read_snapshot, diff_snapshots
 
 class ProcessedFilesTracker:
     """Track files that have already been processed to avoid duplicates."""
@@ -93,23 +112,126 @@ logger = logging.getLogger(__name__)
 # Google Drive API scopes
 SCOPES = ['https://www.googleapis.com/auth/drive']
 
+# Fields requested from the change feed
+CHANGE_FIELDS = ('nextPageToken, newStartPageToken, '
+                 'changes(fileId, removed, file(id, name, mimeType, size, md5Checksum, modifiedTime, parents, trashed))')
+
+
+class LazyConsole:
+    """Rich console that is only created, and Rich only imported, on first use."""
+    
+    def __init__(self):
+        self._console = None
+    
+    def get(self):
+        """Return the underlying Rich console, creating it if needed."""
+        if self._console is None:
+            from rich.console import Console
+            self._console = Console()
+        return self._console
+    
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
 # Initialize Rich console
-console = Console()
+console = LazyConsole()
+
+
+class NullProgress:
+    """Stands in for a Rich progress display when several jobs share the console."""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    def add_task(self, description, total=None, **fields):
+        return 0
+    
+    def update(self, task, **fields):
+        pass
+    
+    def advance(self, task, advance=1):
+        pass
 
 
 class GoogleDriveOrganizer:
     """Main class for organizing Google Drive statements."""
     
-    def __init__(self, credentials_file: str = 'credentials.json', token_file: str = 'token.json'):
+    def __init__(self, credentials_file: str = 'credentials.json', token_file: str = 'token.json',
+                 pdf_backend: str = DEFAULT_BACKEND, file_mapping: Optional[FileMapping] = None,
+                 rate_limiter: Optional[RateLimiter] = None, show_progress: bool = True,
+                 negative_cache: Optional[NegativeCache] = None, profiler: Optional[Profiler] = None,
+                 tracer: Optional[SpanTracer] = None, blob_cache: Optional[BlobCache] = None,
+                 text_store: Optional[TextStore] = None, metrics: Optional[RunMetrics] = None,
+                 concurrency: Optional[ConcurrencyController] = None):
         self.credentials_file = credentials_file
         self.token_file = token_file
-        self.service = None
-        self.file_mapping = FileMapping()
+        self.pdf_extractor = PDFTextExtractor(pdf_backend)
+        self._service = None
+        self.transport: Optional[DriveTransport] = None
+        self._auth_lock = threading.Lock()
+        self.file_mapping = file_mapping or FileMapping()
+        self.negative_cache = negative_cache or NegativeCache()
+        self.blob_cache = blob_cache
+        self.text_store = text_store
+        self.metrics = metrics or RunMetrics()
+        self.concurrency = concurrency
+        # Set by SnapshotOrganizer: nothing is downloaded and no cache is written
+        self.offline = False
+        self._thread_state = threading.local()
+        self.rate_limiter = rate_limiter
+        self.show_progress = show_progress
+        self.profiler = profiler
+        self.tracer = tracer
         self.processed_tracker = ProcessedFilesTracker()
-        self.authenticate()
+        self.folder_indexes: Dict[str, FolderContentsIndex] = {}
+        self.folder_names: Dict[str, str] = {}
+        self.folder_matchers: Dict[str, FolderMatcher] = {}
+        self._folder_flights = SingleFlight()
+        self._folder_locks: Dict[str, threading.Lock] = {}
+        self._folder_locks_lock = threading.Lock()
+    
+    @property
+    def service(self):
+        """
+        Google Drive API client for the calling thread, authenticated on first use.
+        Each thread gets its own client from the transport, since httplib2 clients
+        are not thread-safe.
+        """
+        if self._service is not None:
+            return self._service
+        if self.transport is None:
+            with self._auth_lock:
+                if self.transport is None:
+                    self.authenticate()
+        if self._service is not None:
+            return self._service
+        return self.transport.service()
+    
+    @service.setter
+    def service(self, service):
+        """Use a single fixed client for all threads (e.g. a mock in tests)."""
+        self._service = service
+    
+    def close(self):
+        """Close the keep-alive Drive connections of every thread once the run is over."""
+        if self.transport is not None:
+            self.transport.close()
+    
+    def _save_token(self, creds):
+        """Save credentials for the next run."""
+        with open(self.token_file, 'w') as token:
+            token.write(creds.to_json())
     
     def authenticate(self):
         """Authenticate with Google Drive API."""
+        from google.auth.transport.requests import Request
+        from google.oauth2.credentials import Credentials
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        
         creds = None
         
         # Load existing token
@@ -129,12 +251,63 @@ class GoogleDriveOrganizer:
                 creds = flow.run_local_server(port=0)
             
             # Save credentials for next run
-            with open(self.token_file, 'w') as token:
-                token.write(creds.to_json())
+            self._save_token(creds)
         
-        self.service = build('drive', 'v3', credentials=creds)
+        # Token refreshes during the run are serialized by the shared transport
+        self.transport = DriveTransport(creds, on_refresh=self._save_token)
         console.print("[green]✓ Successfully authenticated with Google Drive[/green]")
     
+    def _throttle(self, requests: int = 1):
+        """Wait for the shared request budget, if there is one."""
+        if self.rate_limiter:
+            self.rate_limiter.acquire(requests)
+    
+    def _call_drive(self, kind: str, call: Callable, requests: int = 1):
+        """
+        Make one Drive call within the shared request budget and, with adaptive
+        concurrency, within the limit for its kind of request ('media', 'metadata'
+        or 'mutation'). Rate-limited calls are then retried after a backoff.
+        A batch call counts as its number of requests against the budget.
+        """
+        attempt = 0
+        while True:
+            self._throttle(requests)
+            try:
+                if not self.concurrency:
+                    return call()
+                with self.concurrency.slot(kind):
+                    return call()
+            except HttpError as error:
+                if not (self.concurrency and self.concurrency.should_retry(error, attempt)):
+                    raise
+                time.sleep(self.concurrency.retry_delay(attempt))
+                attempt += 1
+    
+    def _execute(self, request):
+        """Execute a Drive API request within the shared request budget, timing it for --estimate."""
+        method = getattr(request, 'methodId', None)
+        operation = method if isinstance(method, str) else 'other'
+        started = time.perf_counter()
+        result = self._call_drive(operation_kind(operation), request.execute)
+        self.metrics.record(operation, time.perf_counter() - started)
+        return result
+    
+    def _span(self, name: str):
+        """Time a pipeline stage of the current file for the trace file, if tracing."""
+        return self.tracer.span(name) if self.tracer else nullcontext({})
+    
+    def _stage(self, name: str):
+        """Mark a stage boundary of the run for the profiler, if profiling."""
+        if self.profiler:
+            self.profiler.stage(name)
+    
+    def _progress(self, *columns):
+        """Return a Rich progress display, or a silent one when progress is disabled."""
+        if not self.show_progress:
+            return NullProgress()
+        from rich.progress import Progress
+        return Progress(*columns, console=console.get())
+    
     def find_folder_by_name(self, folder_name: str, parent_id: Optional[str] = None) -> Optional[str]:
         """Find a folder by name and optionally parent folder ID."""
         query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder'"
@@ -142,7 +315,7 @@ class GoogleDriveOrganizer:
             query += f" and '{parent_id}' in parents"
         
         try:
-            results = self.service.files().list(q=query, spaces='drive', fields='files(id, name)').execute()
+            results = self._execute(self.service.files().list(q=query, spaces='drive', fields='files(id, name)'))
             files = results.get('files', [])
             
             if files:
@@ -154,34 +327,73 @@ class GoogleDriveOrganizer:
             console.print(f"[red]Error finding folder '{folder_name}': {error}[/red]")
             return None
     
-    def get_files_in_folder(self, folder_id: str, recursive: bool = True) -> List[Dict]:
-        """Get all files in a folder, optionally searching recursively through subfolders."""
+    def get_files_in_folder(self, folder_id: str, recursive: bool = True) -> List[DriveFile]:
+        """
+        Get all files in a folder, optionally searching recursively through subfolders.
+        Each file carries the metadata used downstream, so it is not fetched again.
+        """
         all_files = []
         
         try:
             # Get immediate children of the folder
-            results = self.service.files().list(
-                q=f"'{folder_id}' in parents and trashed=false",
-                spaces='drive',
-                fields='files(id, name, mimeType, size)'
-            ).execute()
-            items = results.get('files', [])
+            items = []
+            page_token = None
+            while True:
+                results = self._execute(self.service.files().list(
+                    q=f"'{folder_id}' in parents and trashed=false",
+                    spaces='drive',
+                    fields=f'nextPageToken, files({LISTING_FIELDS})',
+                    pageSize=1000,
+                    pageToken=page_token
+                ))
+                items.extend(results.get('files', []))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
             
             for item in items:
-                if item['mimeType'] == 'application/vnd.google-apps.folder':
+                if item['mimeType'] == FOLDER_MIME_TYPE:
                     # It's a folder, recursively search it if recursive=True
                     if recursive:
                         subfolder_files = self.get_files_in_folder(item['id'], recursive=True)
                         all_files.extend(subfolder_files)
                 else:
                     # It's a file, add it to our list
-                    all_files.append(item)
+                    all_files.append(DriveFile.from_resource(item))
             
             return all_files
         except HttpError as error:
             console.print(f"[red]Error getting files from folder: {error}[/red]")
             return []
-    
+
+    def _folder_lock(self, folder_id: str) -> threading.Lock:
+        """The lock that serializes duplicate checks and copies into one folder."""
+        with self._folder_locks_lock:
+            return self._folder_locks.setdefault(folder_id, threading.Lock())
+
+    def get_folder_index(self, folder_id: str) -> FolderContentsIndex:
+        """Get the contents index for a destination folder, listing it once per run."""
+        if folder_id in self.folder_indexes:
+            return self.folder_indexes[folder_id]
+
+        files = []
+        page_token = None
+        while True:
+            results = self._execute(self.service.files().list(
+                q=f"'{folder_id}' in parents and trashed=false",
+                spaces='drive',
+                fields='nextPageToken, files(id, name, size, md5Checksum)',
+                pageSize=1000,
+                pageToken=page_token
+            ))
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+
+        # Another worker may have listed the same folder meanwhile; keep the first index
+        return self.folder_indexes.setdefault(folder_id, FolderContentsIndex(map(DriveFile.from_resource, files)))
+
     def create_folder(self, folder_name: str, parent_id: Optional[str] = None) -> Optional[str]:
         """Create a folder in Google Drive."""
         file_metadata = {
@@ -193,38 +405,79 @@ class GoogleDriveOrganizer:
             file_metadata['parents'] = [parent_id]
         
         try:
-            folder = self.service.files().create(body=file_metadata, fields='id').execute()
+            folder = self._execute(self.service.files().create(body=file_metadata, fields='id'))
             console.print(f"[green]✓ Created folder: {folder_name}[/green]")
+            
+            # Later statements can be matched to the new folder without listing again
+            if parent_id in self.folder_matchers and folder.get('id'):
+                self.folder_matchers[parent_id].add_folder({'id': folder['id'], 'name': folder_name})
+                self.folder_names[folder['id']] = folder_name
             return folder.get('id')
         except HttpError as error:
             console.print(f"[red]Error creating folder '{folder_name}': {error}[/red]")
             return None
     
+    def resolve_folder(self, folder_name: str, parent_id: str, create: bool = True) -> Optional[str]:
+        """
+        Find a folder by name under a parent, creating it if it is missing and create is set.
+        Concurrent calls for the same folder share one lookup or creation, so workers
+        never create duplicates, and the result is remembered for the rest of the run.
+        """
+        def resolve():
+            folder_id = self.find_folder_by_name(folder_name, parent_id)
+            if not folder_id and create:
+                folder_id = self.create_folder(folder_name, parent_id)
+            return folder_id
+        
+        # Without create, "not found" is remembered too; failed creations are retried
+        return self._folder_flights.do((parent_id, folder_name, create), resolve, cache_none=not create)
+    
     def download_file(self, file_id: str) -> Optional[bytes]:
         """Download a file from Google Drive."""
+        from googleapiclient.http import MediaIoBaseDownload
+        
         try:
             request = self.service.files().get_media(fileId=file_id)
             file = io.BytesIO()
             downloader = MediaIoBaseDownload(file, request)
             
+            started = time.perf_counter()
             done = False
             while done is False:
-                status, done = downloader.next_chunk()
+                status, done = self._call_drive('media', downloader.next_chunk)
             
-            return file.getvalue()
+            content = file.getvalue()
+            self.metrics.record('download', time.perf_counter() - started, len(content))
+            return content
         except HttpError as error:
             console.print(f"[red]Error downloading file: {error}[/red]")
             return None
     
+    def fetch_file_content(self, file: Mapping):
+        """
+        Return a file's content from the blob cache, if there is one, or download it
+        and add it to the cache. Cached content may be a memory map; close it after use.
+        """
+        md5 = file.get('md5Checksum')
+        if self.blob_cache:
+            content = self.blob_cache.get(md5)
+            if content is not None:
+                return content
+        
+        content = self.download_file(file['id'])
+        if content is not None and self.blob_cache:
+            self.blob_cache.put(md5, content)
+        return content
+    
     def rename_folder(self, folder_id: str, new_name: str) -> bool:
         """Rename a Google Drive folder."""
         try:
             # Update the folder name
             file_metadata = {'name': new_name}
-            updated_folder = self.service.files().update(
+            updated_folder = self._execute(self.service.files().update(
                 fileId=folder_id,
                 body=file_metadata
-            ).execute()
+            ))
             
             console.print(f"[green]✓ Renamed folder to: {new_name}[/green]")
             return True
@@ -236,10 +489,10 @@ class GoogleDriveOrganizer:
     def get_folder_info(self, folder_id: str) -> Optional[dict]:
         """Get folder information including current name."""
         try:
-            folder = self.service.files().get(
+            folder = self._execute(self.service.files().get(
                 fileId=folder_id,
                 fields='id,name,parents'
-            ).execute()
+            ))
             return folder
         except HttpError as error:
             console.print(f"[red]Error getting folder info: {error}[/red]")
@@ -252,11 +505,11 @@ class GoogleDriveOrganizer:
             if parent_folder_id:
                 query += f" and '{parent_folder_id}' in parents"
             
-            results = self.service.files().list(
+            results = self._execute(self.service.files().list(
                 q=query,
                 spaces='drive',
                 fields='files(id, name)'
-            ).execute()
+            ))
             
             folders = results.get('files', [])
             if folders:
@@ -267,103 +520,205 @@ class GoogleDriveOrganizer:
             console.print(f"[red]Error finding folder: {error}[/red]")
             return None
 
-    def batch_rename_folders(self, rename_mapping: dict, dry_run: bool = True) -> dict:
-        """Batch rename multiple folders with progress tracking."""
+    def list_child_folders(self, parent_folder_id: str) -> List[Dict]:
+        """List all immediate child folders of a parent folder, following pagination."""
+        folders = []
+        page_token = None
+        while True:
+            results = self._execute(self.service.files().list(
+                q=f"'{parent_folder_id}' in parents and trashed=false and mimeType='application/vnd.google-apps.folder'",
+                spaces='drive',
+                fields='nextPageToken, files(id, name)',
+                pageSize=1000,
+                pageToken=page_token
+            ))
+            folders.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+        return folders
+
+    def get_start_page_token(self) -> str:
+        """Return the change feed position from which later changes are listed."""
+        return self._execute(self.service.changes().getStartPageToken())['startPageToken']
+    
+    def list_changes(self, page_token: str) -> Tuple[List[Dict], str]:
+        """Return every change since page_token and the token to continue from."""
+        changes = []
+        while True:
+            results = self._execute(self.service.changes().list(
+                pageToken=page_token,
+                spaces='drive',
+                includeRemoved=True,
+                pageSize=1000,
+                fields=CHANGE_FIELDS
+            ))
+            changes.extend(results.get('changes', []))
+            if 'newStartPageToken' in results:
+                return changes, results['newStartPageToken']
+            page_token = results['nextPageToken']
+
+    def plan_folder_renames(self, rename_mapping: dict, folders: List[Dict]) -> Dict[str, Dict]:
+        """
+        Resolve a rename mapping against a folder listing without any API calls.
+        Returns a per-item plan with status 'pending', 'skipped' or 'failed'.
+        """
+        folders_by_name = {}
+        for folder in folders:
+            folders_by_name.setdefault(folder['name'], []).append(folder)
+        
+        # Names that will still be taken after the planned renames
+        renamed_away = {old for old, new in rename_mapping.items()
+                        if old != new and len(folders_by_name.get(old, [])) == 1}
+        taken_names = {name for name in folders_by_name if name not in renamed_away}
+        target_counts = {}
+        for old_name, new_name in rename_mapping.items():
+            if old_name != new_name:
+                target_counts[new_name] = target_counts.get(new_name, 0) + 1
+        
+        plan = {}
+        for old_name, new_name in rename_mapping.items():
+            matches = folders_by_name.get(old_name, [])
+            item = {'folder_id': None, 'old_name': old_name, 'new_name': new_name,
+                    'status': 'pending', 'reason': None}
+            
+            if old_name == new_name:
+                item.update(status='skipped', reason='Already correct')
+            elif not matches:
+                if new_name in folders_by_name:
+                    item.update(status='skipped', reason='Already correct',
+                                folder_id=folders_by_name[new_name][0]['id'])
+                else:
+                    item.update(status='skipped', reason='Folder not found')
+            elif len(matches) > 1:
+                item.update(status='failed', reason=f'{len(matches)} folders named {old_name!r}')
+            elif new_name in taken_names:
+                item.update(status='failed', folder_id=matches[0]['id'],
+                            reason=f'A folder named {new_name!r} already exists')
+            elif target_counts[new_name] > 1:
+                item.update(status='failed', folder_id=matches[0]['id'],
+                            reason=f'Multiple folders would be renamed to {new_name!r}')
+            else:
+                item['folder_id'] = matches[0]['id']
+            
+            plan[old_name] = item
+        
+        return plan
+
+    def batch_rename_folders(self, rename_mapping: dict, dry_run: bool = True,
+                             parent_folder_id: Optional[str] = None, batch_size: int = 100) -> dict:
+        """
+        Batch rename multiple folders in a parent folder.
+        The parent is listed once, every rename is resolved and checked for
+        collisions locally, and the updates are sent as batched HTTP requests.
+        Renames that Drive rejects with 429 or a 5xx error are sent again in a
+        later batch.
+        """
         results = {
             'success': [],
             'failed': [],
-            'skipped': []
+            'skipped': [],
+            'items': {}
         }
         
         console.print(f"\n[bold blue]{'DRY RUN: ' if dry_run else ''}Batch Renaming {len(rename_mapping)} Folders[/bold blue]")
         
-        # Find destination folder
-        dest_folder_id = self.find_folder_by_name('Statements by Account')
-        if not dest_folder_id:
-            console.print("[red]Error: Could not find 'Statements by Account' folder[/red]")
+        if not parent_folder_id:
+            from config import DEFAULT_FOLDERS
+            parent_folder_id = self.find_folder_by_name(DEFAULT_FOLDERS['statements_by_account'])
+            if not parent_folder_id:
+                console.print(f"[red]Error: Could not find '{DEFAULT_FOLDERS['statements_by_account']}' folder[/red]")
+                return results
+        
+        try:
+            folders = self.list_child_folders(parent_folder_id)
+        except HttpError as error:
+            console.print(f"[red]Error listing folders: {error}[/red]")
             return results
         
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            MofNCompleteColumn(),
-            TimeElapsedColumn(),
-        ) as progress:
-            
-            task = progress.add_task("Renaming folders...", total=len(rename_mapping))
+        plan = self.plan_folder_renames(rename_mapping, folders)
+        results['items'] = plan
+        pending = [item for item in plan.values() if item['status'] == 'pending']
+        
+        for item in plan.values():
+            if item['status'] == 'skipped':
+                console.print(f"[dim]{item['reason']}: {item['old_name']}[/dim]")
+            elif item['status'] == 'failed':
+                console.print(f"[red]✗ {item['old_name']}: {item['reason']}[/red]")
+        
+        if dry_run:
+            for item in pending:
+                console.print(f"[cyan]Would rename: '{item['old_name']}' → '{item['new_name']}'[/cyan]")
+                item['status'] = 'success'
+        else:
+            from rich.progress import SpinnerColumn, TextColumn, BarColumn, MofNCompleteColumn, TimeElapsedColumn
+            from config import BATCH_RETRIES, BATCH_RETRY_DELAY
+            
+            retry = []
+            attempt = 0
+            
+            def on_response(request_id, response, exception):
+                item = plan[pending[int(request_id)]['old_name']]
+                if exception is not None and attempt < BATCH_RETRIES and is_retryable(exception):
+                    retry.append(int(request_id))  # Sent again in the next batch
+                elif exception is not None:
+                    item.update(status='failed', reason=str(exception))
+                    console.print(f"[red]Error renaming '{item['old_name']}': {exception}[/red]")
+                else:
+                    item['status'] = 'success'
+                    console.print(f"[green]✓ Renamed '{item['old_name']}' → '{item['new_name']}'[/green]")
             
-            for old_name, new_name in rename_mapping.items():
-                progress.update(task, description=f"Processing: {old_name[:30]}...")
-                
-                try:
-                    # Find the folder by old name
-                    folder_id = self.find_folder_by_exact_name(old_name, dest_folder_id)
-                    
-                    if not folder_id:
-                        console.print(f"[yellow]⚠️  Folder not found: {old_name}[/yellow]")
-                        results['skipped'].append(old_name)
-                        progress.advance(task)
-                        continue
-                    
-                    # Get current folder info
-                    folder_info = self.get_folder_info(folder_id)
-                    if not folder_info:
-                        results['failed'].append(old_name)
-                        progress.advance(task)
-                        continue
-                    
-                    current_name = folder_info['name']
-                    
-                    if current_name == new_name:
-                        console.print(f"[dim]Already correct: {new_name}[/dim]")
-                        results['skipped'].append(old_name)
-                        progress.advance(task)
-                        continue
-                    
-                    if dry_run:
-                        console.print(f"[cyan]Would rename: '{current_name}' → '{new_name}'[/cyan]")
-                        results['success'].append(old_name)
-                    else:
-                        # Actually rename the folder
-                        if self.rename_folder(folder_id, new_name):
-                            results['success'].append(old_name)
-                        else:
-                            results['failed'].append(old_name)
-                    
-                except Exception as e:
-                    console.print(f"[red]Error processing {old_name}: {e}[/red]")
-                    results['failed'].append(old_name)
+            with self._progress(
+                SpinnerColumn(),
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                MofNCompleteColumn(),
+                TimeElapsedColumn()
+            ) as progress:
+                task = progress.add_task("Renaming folders...", total=len(pending))
                 
-                progress.advance(task)
+                for start in range(0, len(pending), batch_size):
+                    chunk = range(start, min(start + batch_size, len(pending)))
+                    positions = list(chunk)
+                    attempt = 0
+                    while positions:
+                        if attempt:
+                            time.sleep(BATCH_RETRY_DELAY * 2 ** (attempt - 1))
+                        retry.clear()
+                        batch = self.service.new_batch_http_request(callback=on_response)
+                        for position in positions:
+                            item = pending[position]
+                            batch.add(
+                                self.service.files().update(fileId=item['folder_id'], body={'name': item['new_name']}, fields='id, name'),
+                                request_id=str(position)
+                            )
+                        try:
+                            started = time.perf_counter()
+                            self._call_drive('mutation', batch.execute, requests=len(positions))
+                            self.metrics.record('drive.batch', time.perf_counter() - started)
+                        except HttpError as error:
+                            for position in chunk:
+                                item = pending[position]
+                                if item['status'] == 'pending':
+                                    item.update(status='failed', reason=str(error))
+                            console.print(f"[red]Error executing rename batch: {error}[/red]")
+                            break
+                        positions = list(retry)
+                        attempt += 1
+                    progress.advance(task, len(chunk))
+        
+        for old_name, item in plan.items():
+            results[item['status'] if item['status'] != 'pending' else 'failed'].append(old_name)
         
         return results
 
     def backup_folder_structure(self, parent_folder_id: str) -> dict:
-        """Create a backup of the current folder structure."""
+        """Create a compressed snapshot of every folder and file below the parent folder."""
         try:
-            console.print("[blue]Creating backup of folder structure...[/blue]")
+            console.print("[blue]Creating snapshot of folder structure...[/blue]")
             
-            results = self.service.files().list(
-                q=f"'{parent_folder_id}' in parents and trashed=false and mimeType='application/vnd.google-apps.folder'",
-                spaces='drive',
-                fields='files(id, name, parents, createdTime, modifiedTime)'
-            ).execute()
-            
-            folders = results.get('files', [])
-            
-            from datetime import datetime
-            backup_data = {
-                'backup_date': datetime.now().isoformat(),
-                'parent_folder_id': parent_folder_id,
-                'total_folders': len(folders),
-                'folders': folders
-            }
-            
-            # Save backup to local file
-            backup_filename = f"folder_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            with open(backup_filename, 'w') as f:
-                json.dump(backup_data, f, indent=2)
+            backup_filename = f"folder_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl.gz"
+            backup_data = write_snapshot(backup_filename, walk_drive_tree(self.service, parent_folder_id, execute=self._execute), parent_folder_id)
             
             console.print(f"[green]✓ Backup saved to: {backup_filename}[/green]")
             return backup_data
@@ -372,43 +727,66 @@ class GoogleDriveOrganizer:
             console.print(f"[red]Error creating backup: {error}[/red]")
             return {}
 
-    def copy_file(self, file_id: str, destination_folder_id: str, new_name: Optional[str] = None, check_duplicates: bool = True) -> bool:
-        """Copy a file to a new location in Google Drive with duplicate detection."""
+    def write_run_snapshot(self, path: str, source_folder_id: str, dest_folder_id: str) -> Dict:
+        """
+        Snapshot the source and destination trees into one file, with the metadata
+        used for matching and duplicate checks, for offline dry runs (--from-snapshot).
+        """
+        records = itertools.chain(walk_drive_tree(self.service, source_folder_id, execute=self._execute),
+                                  walk_drive_tree(self.service, dest_folder_id, execute=self._execute))
+        return write_snapshot(path, records, source_folder_id, header={'dest_root_id': dest_folder_id})
+    
+    def copy_file(self, file_id: str, destination_folder_id: str, new_name: Optional[str] = None, check_duplicates: bool = True,
+                  file: Optional[Mapping] = None) -> bool:
+        """
+        Copy a file to a new location in Google Drive with duplicate detection.
+        Pass the listed file record to avoid fetching its metadata again.
+        """
         try:
-            # Get file metadata
-            file_metadata = self.service.files().get(fileId=file_id).execute()
-            original_name = file_metadata['name']
-            
-            # Check for duplicates if requested
-            if check_duplicates:
-                duplicates = self.check_for_duplicates(file_id, destination_folder_id, original_name)
+            if file is None:
+                file = self._execute(self.service.files().get(fileId=file_id, fields='id, name, size, md5Checksum'))
+            original_name = file['name']
+            
+            # One file at a time per folder, so two copies of the same file are never both copied
+            # and a renamed copy never takes a name another thread is about to use
+            with self._folder_lock(destination_folder_id):
+                # Check for duplicates if requested
+                if check_duplicates:
+                    with self._span('dedupe'):
+                        duplicates = self.check_for_duplicates(file_id, destination_folder_id, original_name, file=file)
+                    
+                    if duplicates['recommended_action'] == 'skip':
+                        console.print(f"[yellow]⏭️  Skipped: {original_name} - {duplicates['reason']}[/yellow]")
+                        return True  # Return True since this is expected behavior
+                    
+                    elif duplicates['recommended_action'] == 'rename':
+                        if not new_name:  # Only auto-rename if no custom name provided
+                            new_name = self.generate_unique_filename(original_name, destination_folder_id)
+                            console.print(f"[blue]🔄 Renaming duplicate: {original_name} → {new_name}[/blue]")
+                        else:
+                            console.print(f"[blue]🔄 Using custom name for duplicate: {original_name} → {new_name}[/blue]")
+                    
+                    elif duplicates['recommended_action'] == 'copy':
+                        if duplicates['exact_filename'] or duplicates['content_duplicate']:
+                            console.print(f"[blue]ℹ️  Info: {original_name} - {duplicates['reason']}[/blue]")
                 
-                if duplicates['recommended_action'] == 'skip':
-                    console.print(f"[yellow]⏭️  Skipped: {original_name} - {duplicates['reason']}[/yellow]")
-                    return True  # Return True since this is expected behavior
+                # Prepare copy metadata
+                copy_metadata = {
+                    'name': new_name or original_name,
+                    'parents': [destination_folder_id]
+                }
                 
-                elif duplicates['recommended_action'] == 'rename':
-                    if not new_name:  # Only auto-rename if no custom name provided
-                        new_name = self.generate_unique_filename(original_name, destination_folder_id)
-                        console.print(f"[blue]🔄 Renaming duplicate: {original_name} → {new_name}[/blue]")
-                    else:
-                        console.print(f"[blue]🔄 Using custom name for duplicate: {original_name} → {new_name}[/blue]")
+                # Copy the file
+                with self._span('copy'):
+                    copied_file = self._execute(self.service.files().copy(
+                        fileId=file_id,
+                        body=copy_metadata,
+                        fields='id, name, size, md5Checksum'
+                    ))
                 
-                elif duplicates['recommended_action'] == 'copy':
-                    if duplicates['exact_filename'] or duplicates['content_duplicate']:
-                        console.print(f"[blue]ℹ️  Info: {original_name} - {duplicates['reason']}[/blue]")
-            
-            # Prepare copy metadata
-            copy_metadata = {
-                'name': new_name or original_name,
-                'parents': [destination_folder_id]
-            }
-            
-            # Copy the file
-            copied_file = self.service.files().copy(
-                fileId=file_id,
-                body=copy_metadata
-            ).execute()
+                # Keep the destination index current for later duplicate checks
+                if destination_folder_id in self.folder_indexes:
+                    self.folder_indexes[destination_folder_id].add(DriveFile.from_resource(copied_file))
             
             console.print(f"[green]✓ Copied: {copy_metadata['name']}[/green]")
             return True
@@ -418,180 +796,134 @@ class GoogleDriveOrganizer:
     
     def extract_text_from_pdf(self, pdf_content: bytes) -> str:
         """Extract text content from PDF bytes."""
+        selecting = self.pdf_extractor.backend is None
+        
         try:
-            pdf_file = io.BytesIO(pdf_content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            text = ""
+            with self._span('extract'):
+                text = self.pdf_extractor.extract_text(pdf_content)
             
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
+            if selecting:
+                timings = ', '.join(f"{backend.name}={seconds * 1000:.0f}ms"
+                                    for backend, seconds, _ in self.pdf_extractor.benchmark)
+                console.print(f"[dim]Selected PDF backend: {self.pdf_extractor.backend.name} ({timings})[/dim]")
             
             return text
         except Exception as e:
+            self._thread_state.pdf_error = str(e)
             console.print(f"[yellow]Warning: Could not extract text from PDF: {e}[/yellow]")
             return ""
     
-    def classify_file(self, file_name: str, file_content: Optional[bytes] = None, file_id: str = None, file_size: str = None) -> Tuple[Optional[str], Optional[str], Optional[str]]:
-        """Classify a file based on filename and optionally content. Returns (company, statement_type, account_info)."""
+    def find_company(self, text_lower: str) -> Optional[str]:
+        """Return the first company whose patterns occur in lowercased text."""
+        return find_company(text_lower)
+    
+    def find_statement_type(self, text_lower: str) -> Optional[str]:
+        """Return the first statement type whose patterns occur in lowercased text."""
+        return find_statement_type(text_lower)
+    
+    def get_pdf_text(self, pdf_content, file_md5: Optional[str] = None) -> str:
+        """
+        Return the text of a PDF from the text store, or extract it and store it.
+        Text from PDFs that failed to parse is not stored.
+        """
+        extractor = self.pdf_extractor.version
+        if self.text_store and extractor:
+            text = self.text_store.get(file_md5, extractor)
+            if text is not None:
+                return text
+        
+        self._thread_state.pdf_error = None
+        started = time.perf_counter()
+        text = self.extract_text_from_pdf(pdf_content)
+        self.metrics.record('extract', time.perf_counter() - started)
+        if self.text_store and not self._thread_state.pdf_error:
+            # In auto mode the backend is chosen by the first extraction
+            self.text_store.put(file_md5, self.pdf_extractor.version, text)
+        return text
+    
+    def is_cached(self, file: Dict) -> bool:
+        """Check whether a listed file already has a cached classification (misses are classified again)."""
+        cached = self.file_mapping.get_classification(file['id'], file['name'], file.get('size'))
+        return bool(cached and cached[0] and cached[1])
+    
+    def is_classifiable(self, file: Dict) -> bool:
+        """Check whether a listed file can be classified from its name, without downloading it."""
+        file_lower = file['name'].lower()
+        return bool(self.find_company(file_lower) and self.find_statement_type(file_lower))
+    
+    def classify_file(self, file_name: str, file_content: Optional[bytes] = None, file_id: str = None, file_size: str = None,
+                      file_md5: Optional[str] = None) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """
+        Classify a file based on filename and optionally content. Returns (company, statement_type, account_info).
+        Cached misses are not reused: a file only gets here once the negative cache
+        says it is due for another attempt. A miss is only cached if the PDF text was read.
+        """
         
         # Check cache first if we have file ID
         if file_id:
             cached_result = self.file_mapping.get_classification(file_id, file_name, file_size)
-            if cached_result:
+            if cached_result and cached_result[0] and cached_result[1]:
                 console.print(f"[dim]Using cached result for {file_name}[/dim]")
                 return cached_result
         
-        company = None
-        statement_type = None
-        account_info = None
-        
-        # Import patterns from config
-        from config import COMPANY_PATTERNS, STATEMENT_PATTERNS
-        
-        # Analyze filename
-        file_lower = file_name.lower()
+        # The PDF is parsed at most once, and only if the filename leaves something unresolved
+        text_read = []
         
-        # Find company
-        for company_name, patterns in COMPANY_PATTERNS.items():
-            if any(pattern in file_lower for pattern in patterns):
-                company = company_name
-                break
+        def load_text() -> Optional[str]:
+            if not file_content:
+                return None
+            self._thread_state.pdf_error = None
+            text = self.get_pdf_text(file_content, file_md5)
+            if not self._thread_state.pdf_error:
+                text_read.append(True)
+            return text
         
-        # Find statement type
-        for stmt_type, patterns in STATEMENT_PATTERNS.items():
-            if any(pattern in file_lower for pattern in patterns):
-                statement_type = stmt_type
-                break
+        company, statement_type, account_info = classify(file_name, load_text)
         
-        # Extract account information
-        account_info = self.extract_account_info(file_name, file_content)
-        
-        # If filename analysis didn't work, try PDF content
-        if (not company or not statement_type) and file_content:
-            pdf_text = self.extract_text_from_pdf(file_content)
-            pdf_lower = pdf_text.lower()
-            
-            # Find company in PDF content
-            if not company:
-                for company_name, patterns in COMPANY_PATTERNS.items():
-                    if any(pattern in pdf_lower for pattern in patterns):
-                        company = company_name
-                        break
-            
-            # Find statement type in PDF content
-            if not statement_type:
-                for stmt_type, patterns in STATEMENT_PATTERNS.items():
-                    if any(pattern in pdf_lower for pattern in patterns):
-                        statement_type = stmt_type
-                        break
-            
-            # Extract account info from PDF content if not found in filename
-            if not account_info:
-                account_info = self.extract_account_info_from_text(pdf_text)
-        
-        # Cache the result if we have file ID
-        if file_id:
-            self.file_mapping.set_classification(file_id, file_name, company, statement_type, account_info, file_size)
+        # A failed download or parse is retried later rather than remembered as unclassifiable
+        if file_id and ((company and statement_type) or text_read):
+            self.file_mapping.set_classification(file_id, file_name, company, statement_type, account_info,
+                                                 file_size, file_md5)
         
         return company, statement_type, account_info
     
-    def extract_account_info(self, file_name: str, file_content: Optional[bytes] = None) -> Optional[str]:
+    def extract_account_info(self, file_name: str, file_content: Optional[bytes] = None,
+                             pdf_text: Optional[str] = None) -> Optional[str]:
         """Extract account information from filename or content."""
-        import re
-        
-        # Common account patterns
-        account_patterns = [
-            r'account[:\s_]*([A-Z0-9\-]+)',  # Account: 1234-5678 or account_1234-5678
-            r'#([A-Z0-9\-]+)',              # #1234-5678
-            r'ending[:\s]*([0-9]{4})',      # ending 1234
-            r'last[:\s]*([0-9]{4})',        # last 1234
-            r'([0-9]{4}[-*][0-9]{4}[-*][0-9]{4}[-*][0-9]{4})',  # Credit card format
-            r'checking[:\s]*([A-Z0-9\-]+)', # Checking: 1234-5678
-            r'savings[:\s]*([A-Z0-9\-]+)',  # Savings: 1234-5678
-            r'brokerage[:\s]*([A-Z0-9\-]+)', # Brokerage: 1234-5678
-        ]
-        
         # Check filename first
-        for pattern in account_patterns:
-            match = re.search(pattern, file_name, re.IGNORECASE)
-            if match:
-                return match.group(1) if match.groups() else match.group(0)
+        account_info = FILENAME_EXTRACTOR.best(file_name)
+        if account_info:
+            return account_info
         
         # Check PDF content if available
-        if file_content:
+        if pdf_text is None and file_content:
             pdf_text = self.extract_text_from_pdf(file_content)
-            for pattern in account_patterns:
-                match = re.search(pattern, pdf_text, re.IGNORECASE)
-                if match:
-                    return match.group(1) if match.groups() else match.group(0)
+        if pdf_text:
+            return FILENAME_EXTRACTOR.best(pdf_text)
         
         return None
     
     def extract_account_info_from_text(self, text: str) -> Optional[str]:
         """Extract account information from text content."""
-        import re
-        
-        # Enhanced account number patterns - DIGITS ONLY
-        account_patterns = [
-            # Full account numbers with clear delimiters
-            r'account\s*(?:number|#|no\.?)[:\s]*([0-9]{4,20})',  # account number: 12345678
-            r'account[:\s]+([0-9]{4,20})',  # account: 12345678
-            r'acct\.?\s*(?:number|#|no\.?)[:\s]*([0-9]{4,20})',  # acct number: 12345678
-            r'acct[:\s]+([0-9]{4,20})',  # acct: 12345678
-            
-            # Ending patterns - most common in statements
-            r'ending\s+in[:\s]*([0-9]{3,8})',  # ending in 12345
-            r'ending[:\s]+([0-9]{3,8})',  # ending: 12345
-            r'account\s+ending[:\s]+([0-9]{3,8})',  # account ending: 12345
-            
-            # Card patterns with masking
-            r'(?:x{4,}|\*{4,})[^0-9]*([0-9]{4,5})',  # xxxx1234 or ****12345
-            r'card\s+ending[:\s]*([0-9]{4,5})',  # card ending: 1234
-            
-            # Hyphenated patterns (common format)
-            r'([0-9]{4}-[0-9]{4,8})',  # 1234-56789
-            r'([0-9]{6,8}-[0-9]{2,4})',  # 123456-78
-            
-            # Direct number patterns (be more selective)
-            r'\b([0-9]{8,16})\b',  # 8-16 digit standalone numbers
-        ]
-        
-        for pattern in account_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                account = match.group(1) if match.groups() else match.group(0)
-                # Clean and validate
-                clean_account = account.replace('-', '').replace(' ', '')
-                if (len(clean_account) >= 3 and 
-                    clean_account.isdigit() and 
-                    len(set(clean_account)) > 1):  # Not all same digit
-                    return account
-        
-        return None
+        return TEXT_EXTRACTOR.best(text)
+    
+    def extract_account_candidates(self, text: str) -> List[AccountCandidate]:
+        """Return all valid account numbers in a text, best candidate first."""
+        return TEXT_EXTRACTOR.extract(text)
     
     def get_last_digits(self, account_info: str, num_digits: int = 5) -> str:
         """Extract the last N digits from account information."""
-        import re
-        
-        # Remove all non-alphanumeric characters and get digits/letters
-        clean_account = re.sub(r'[^A-Z0-9]', '', account_info.upper())
-        
-        # If it's shorter than requested digits, return the whole thing
-        if len(clean_account) <= num_digits:
-            return clean_account
-        
-        # Return last N characters
-        return clean_account[-num_digits:]
+        return last_characters(account_info, num_digits)
     
     def find_matching_existing_folder(self, company_folder_id: str, account_type: str, account_digits: str) -> Optional[str]:
         """Find existing folder that matches the account type and digits."""
         try:
             # Get all folders in the company folder
-            results = self.service.files().list(
+            results = self._execute(self.service.files().list(
                 q=f"'{company_folder_id}' in parents and trashed=false and mimeType='application/vnd.google-apps.folder'",
                 spaces='drive',
                 fields='files(id, name)'
-            ).execute()
+            ))
             folders = results.get('files', [])
             
             for folder in folders:
@@ -615,177 +947,302 @@ class GoogleDriveOrganizer:
             console.print(f"[red]Error finding existing folders: {error}[/red]")
             return None
     
+    def get_folder_matcher(self, dest_folder_id: str) -> FolderMatcher:
+        """Get the folder matcher for a destination folder, listing its folders once per run."""
+        if dest_folder_id in self.folder_matchers:
+            return self.folder_matchers[dest_folder_id]
+        
+        folders = self.list_child_folders(dest_folder_id)
+        self.folder_names.update((folder['id'], folder['name']) for folder in folders)
+        # Another worker may have listed the same folder meanwhile; keep the first matcher
+        return self.folder_matchers.setdefault(dest_folder_id, FolderMatcher(folders))
+    
     def find_target_folder(self, dest_folder_id: str, company: str, statement_type: str, account_info: Optional[str]) -> Optional[str]:
         """Find the best matching existing folder for this statement using smart matching."""
         try:
-            # Get all folders in Statements by Account
-            results = self.service.files().list(
-                q=f"'{dest_folder_id}' in parents and trashed=false and mimeType='application/vnd.google-apps.folder'",
-                spaces='drive',
-                fields='files(id, name)'
-            ).execute()
-            folders = results.get('files', [])
-            
-            # Extract account digits from account_info if available
-            account_digits = None
-            if account_info:
-                import re
-                # Extract all digits from account info
-                digits = re.findall(r'\d+', str(account_info))
-                if digits:
-                    # Try to get last 4-5 digits from the longest number
-                    longest_digits = max(digits, key=len)
-                    if len(longest_digits) >= 4:
-                        account_digits = longest_digits[-5:] if len(longest_digits) >= 5 else longest_digits[-4:]
-            
-            # Smart folder matching logic
-            best_matches = []
-            
-            for folder in folders:
-                folder_name = folder['name'].lower()
-                match_score = 0
-                match_reasons = []
-                
-                # Company matching with flexible patterns
-                company_patterns = {
-                    'american express': ['amex', 'american express', 'blue'],
-                    'chase': ['chase', 'freedom'],
-                    'citi': ['citi', 'best buy', 'american airlines', 'double cash'],
-                    'schwab': ['schwab', 'charles schwab'],
-                    'capital one': ['capital one', 'quicksilver', 'savor'],
-                    'synchrony': ['synchrony', 'amazon store'],
-                    'sofi': ['sofi'],
-                    't-mobile': ['t-mobile', 'tmobile'],
-                    'paypal': ['paypal'],
-                    'wise': ['wise'],
-                    'wells fargo': ['wells'],
-                    'bank of america': ['bank of america', 'bofa'],
-                    'apple': ['apple'],
-                    'td bank': ['td bank', 'td'],
-                    'at&t': ['at&t', 'att'],
-                    'swan bitcoin': ['swan'],
-                    'okcoin': ['okcoin', 'ok coin'],
-                }
-                
-                # Check company match
-                if company and company.lower() in company_patterns:
-                    patterns = company_patterns[company.lower()]
-                    for pattern in patterns:
-                        if pattern in folder_name:
-                            match_score += 10
-                            match_reasons.append(f'company:{pattern}')
-                            break
-                
-                # Check account number match (highest priority)
-                if account_digits:
-                    if account_digits in folder_name:
-                        match_score += 50  # High priority for exact account match
-                        match_reasons.append(f'account:{account_digits}')
-                    else:
-                        # Try partial matches (last 3-4 digits)
-                        for i in range(3, min(len(account_digits) + 1, 6)):
-                            partial = account_digits[-i:]
-                            if partial in folder_name and len(partial) >= 3:
-                                match_score += 20 + i  # More points for longer matches
-                                match_reasons.append(f'partial_account:{partial}')
-                                break
-                
-                # Statement type matching (more flexible)
-                type_patterns = {
-                    'bank statement': ['checking', 'savings', 'money', 'bank'],
-                    'credit card statement': ['credit', 'card'],
-                    'investment statement': ['brokerage', 'ira', 'broker', 'investment'],
-                    'loan statement': ['loan'],
-                    'utility statement': ['bill', 'utility'],
-                    'monthly statement': ['statement', 'checking', 'savings', 'money']  # Monthly can be bank statements
-                }
-                
-                if statement_type and statement_type in type_patterns:
-                    patterns = type_patterns[statement_type]
-                    for pattern in patterns:
-                        if pattern in folder_name:
-                            match_score += 5
-                            match_reasons.append(f'type:{pattern}')
-                            break
-                
-                if match_score > 0:
-                    best_matches.append({
-                        'folder': folder,
-                        'score': match_score,
-                        'reasons': match_reasons
-                    })
-            
-            if best_matches:
-                # Sort by score (highest first)
-                best_matches.sort(key=lambda x: x['score'], reverse=True)
-                best_match = best_matches[0]
-                
-                # Check for exact company name matches as fallback (case insensitive)
-                if best_match['score'] < 15 and company:
-                    for folder in folders:
-                        folder_name = folder['name'].lower()
-                        if company.lower() == folder_name or company.lower() in folder_name:
-                            console.print(f"[dim]✅ Fallback match to existing folder: {folder['name']} (exact company name)[/dim]")
-                            return folder['id']
-                
-                # Lower threshold for better matches (score >= 10)
-                if best_match['score'] >= 10:
-                    console.print(f"[dim]✅ Matched to existing folder: {best_match['folder']['name']} (score: {best_match['score']}, reasons: {', '.join(best_match['reasons'])})[/dim]")
-                    return best_match['folder']['id']
-                else:
-                    console.print(f"[dim]⚠️  Low confidence match for {company}/{statement_type}, will create new folder[/dim]")
-            
-            # Final fallback: check for exact company name matches when no scored matches found
-            if company:
-                for folder in folders:
-                    folder_name = folder['name'].lower()
-                    if company.lower() == folder_name or company.lower() in folder_name:
-                        console.print(f"[dim]✅ Final fallback match: {folder['name']} (company name found)[/dim]")
-                        return folder['id']
-            
-            return None
-            
+            match = self.get_folder_matcher(dest_folder_id).match(company, statement_type, account_info)
         except Exception as e:
             console.print(f"[red]Error in folder matching: {str(e)}[/red]")
             return None
-            
-            if account_info:
-                account_digits = self.get_last_digits(account_info, 4)
-                
-                # Look for folders that contain the account digits
-                for folder in folders:
-                    folder_name = folder['name'].lower()
-                    if account_digits.lower() in folder_name:
-                        # Check if company matches
-                        if company in company_keywords:
-                            if any(keyword in folder_name for keyword in company_keywords[company]):
-                                return folder['id']
-                
-                # Look for folders that match company and account type
-                for folder in folders:
-                    folder_name = folder['name'].lower()
+        
+        if match is None:
+            return None
+        if match.rule == 'low_confidence':
+            console.print(f"[dim]⚠️  Low confidence match for {company}/{statement_type}, will create new folder[/dim]")
+        elif match.rule == 'company_fallback':
+            console.print(f"[dim]✅ Fallback match to existing folder: {match.folder_name} (exact company name)[/dim]")
+        elif match.rule == 'final_fallback':
+            console.print(f"[dim]✅ Final fallback match: {match.folder_name} (company name found)[/dim]")
+        else:
+            console.print(f"[dim]✅ Matched to existing folder: {match.folder_name} (score: {match.score}, reasons: {', '.join(match.reasons)})[/dim]")
+        return match.folder_id
+    
+    def _process_file(self, file: Dict, dest_folder_id: str, dry_run: bool, duplicate_handling: str) -> List[str]:
+        """Classify and file one statement. Returns the names of the statistics to count."""
+        if not self.tracer:
+            return self._classify_and_file(file, dest_folder_id, dry_run, duplicate_handling)
+        
+        with self.tracer.file(file), self.tracer.span('file') as span:
+            counters = self._classify_and_file(file, dest_folder_id, dry_run, duplicate_handling)
+            span['outcome'] = counters
+        return counters
+    
+    def _classify_and_file(self, file: Dict, dest_folder_id: str, dry_run: bool, duplicate_handling: str) -> List[str]:
+        counters = []
+        
+        try:
+            # Skip non-PDF files for now
+            if not file['name'].lower().endswith('.pdf'):
+                console.print(f"[yellow]Skipping non-PDF file: {file['name']}[/yellow]")
+                return ['skipped']
+            
+            # Leave files that failed recently alone until their retry time
+            file_md5 = file.get('md5Checksum')
+            deferral = self.negative_cache.get_deferral(file['id'], file_md5)
+            if deferral:
+                retry_at = datetime.fromtimestamp(deferral['retry_after']).strftime('%Y-%m-%d %H:%M')
+                console.print(f"[dim]Deferred: {file['name']} ({deferral['reason']}, retry after {retry_at})[/dim]")
+                return ['deferred']
+            
+            # Download file content for analysis
+            with self._span('download'):
+                file_content = self.fetch_file_content(file)
+            
+            # Classify the file (with caching)
+            self._thread_state.pdf_error = None
+            try:
+                with self._span('classify'):
+                    company, statement_type, account_info = self.classify_file(
+                        file['name'], 
+                        file_content, 
+                        file_id=file['id'], 
+                        file_size=file.get('size'),
+                        file_md5=file_md5
+                    )
+            finally:
+                if isinstance(file_content, mmap.mmap):
+                    file_content.close()
+            
+            if not company or not statement_type:
+                if file_content is None:
+                    reason = 'download_failed'
+                elif self._thread_state.pdf_error:
+                    reason = 'corrupt_pdf'
+                else:
+                    reason = 'unclassified'
+                if not self.offline:
+                    self.negative_cache.record_failure(file['id'], file_md5, reason, file['name'])
+                console.print(f"[yellow]Could not classify: {file['name']}[/yellow]")
+                return ['unclassified']
+            
+            if not self.offline:
+                self.negative_cache.record_success(file['id'])
+            
+            # Find the appropriate existing folder or create new structure
+            with self._span('match'):
+                target_folder_id = self.find_target_folder(dest_folder_id, company, statement_type, account_info)
+            
+            if target_folder_id:
+                # Found existing folder, use it directly
+                if not dry_run:
+                    # Apply duplicate handling strategy
+                    if duplicate_handling == 'skip':
+                        # Skip all duplicates
+                        success = self.copy_file(file['id'], target_folder_id, check_duplicates=True, file=file)
+                        if success:
+                            counters.append('copied')
+                        else:
+                            counters.append('errors')
+                    elif duplicate_handling == 'rename':
+                        # Force rename all duplicates
+                        success = self.copy_file(file['id'], target_folder_id, check_duplicates=True, file=file)
+                        if success:
+                            counters.append('copied')
+                        else:
+                            counters.append('errors')
+                    elif duplicate_handling == 'force':
+                        # Force copy without duplicate checking
+                        success = self.copy_file(file['id'], target_folder_id, check_duplicates=False, file=file)
+                        if success:
+                            counters.append('copied')
+                        else:
+                            counters.append('errors')
+                    else:  # smart (default)
+                        # Use intelligent duplicate detection
+                        success = self.copy_file(file['id'], target_folder_id, check_duplicates=True, file=file)
+                        if success:
+                            counters.append('copied')
+                        else:
+                            counters.append('errors')
+                elif self.offline:
+                    self.plan_copy(file, target_folder_id, duplicate_handling)
+                    counters.append('copied')
+                else:
+                    # The folder name is known from the listing used for matching
+                    folder_name = self.folder_names.get(target_folder_id)
+                    if folder_name:
+                        console.print(f"[green]Would copy: {file['name']} → {folder_name}/ (existing folder)[/green]")
+                    else:
+                        console.print(f"[green]Would copy: {file['name']} → existing folder[/green]")
+                    counters.append('copied')
+            else:
+                # No existing folder found, create new structure
+                company_folder_id = self.resolve_folder(company, dest_folder_id, create=not dry_run)
+                if not company_folder_id and dry_run:
+                    console.print(f"[blue]Would create folder: {company}[/blue]")
                     
-                    # Check company match
-                    if company in company_keywords:
-                        if any(keyword in folder_name for keyword in company_keywords[company]):
-                            # Check account type match
-                            if statement_type in type_keywords:
-                                if any(keyword in folder_name for keyword in type_keywords[statement_type]):
-                                    return folder['id']
+                # For dry run, show what would happen
+                if dry_run:
+                    if account_info:
+                        clean_type = statement_type.replace(" statement", "").replace("_statement", "")
+                        account_digits = self.get_last_digits(account_info, 4)
+                        folder_path = f"{company}/{clean_type} -{account_digits}"
+                        console.print(f"[blue]Would copy: {file['name']} → {folder_path}/ (new folder)[/blue]")
+                    else:
+                        clean_type = statement_type.replace(" statement", "").replace("_statement", "")
+                        folder_path = f"{company}/{clean_type}"
+                        console.print(f"[blue]Would copy: {file['name']} → {folder_path}/[/blue]")
+                    if account_info:
+                        console.print(f"[blue]  Account: {account_info} → Last 4: {self.get_last_digits(account_info, 4)}[/blue]")
+                    counters.append('copied')
             
-            return None
+            counters.append('processed')
             
-        except HttpError as error:
-            console.print(f"[red]Error finding target folder: {error}[/red]")
-            return None
+        except Exception as e:
+            console.print(f"[red]Error processing {file['name']}: {e}[/red]")
+            counters.append('errors')
+        
+        return counters
+    
+    def process_files(self, files: List[Dict], dest_folder_id: str, dry_run: bool, duplicate_handling: str,
+                       workers: int = 1, on_start: Optional[Callable] = None) -> Iterator[Tuple[Dict, List[str]]]:
+        """
+        Process files, yielding (file, counters) as each one finishes.
+        With more than one worker, files are processed concurrently and those not
+        yet started are cancelled when the caller stops iterating.
+        """
+        if workers <= 1:
+            for file in files:
+                if on_start:
+                    on_start(file)
+                yield file, self._process_file(file, dest_folder_id, dry_run, duplicate_handling)
+            return
+        
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = {
+                executor.submit(self._process_file, file, dest_folder_id, dry_run, duplicate_handling): file
+                for file in files
+            }
+            for future in concurrent.futures.as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
     
-    def organize_statements(self, source_folder_id: str, dest_folder_id: str, dry_run: bool = False, duplicate_handling: str = 'smart') -> Dict:
-        """Organize statements from source folder to destination folder."""
+    def count_run_work(self, files: List[Dict], dest_folder_id: str) -> Dict:
+        """
+        Count the work an organize run would do on the listed files, from the
+        classification cache, the negative cache, the blob cache and the text
+        store. Classified files are matched to the destination folders, and each
+        target folder is listed once to find the files already in it (same md5),
+        which duplicate checks would skip. Files whose classification needs
+        their PDF text are assumed to be copied.
+        """
+        counts = {
+            'files': len(files),
+            'skipped': 0,
+            'deferred': 0,
+            'download_sizes': [],
+            'blob_cache_hits': 0,
+            'parses': 0,
+            'copies': 0,
+            'unresolved_copies': 0,
+            'already_copied': 0,
+            'target_folders': 0,
+            'new_folders': 0,
+        }
+        matcher = self.get_folder_matcher(dest_folder_id)
+        extractor = self.pdf_extractor.version
+        target_folders = set()
+        new_folders = set()
+        
+        for file in files:
+            if not file['name'].lower().endswith('.pdf'):
+                counts['skipped'] += 1
+                continue
+            file_md5 = file.get('md5Checksum')
+            if self.negative_cache.get_deferral(file['id'], file_md5):
+                counts['deferred'] += 1
+                continue
+            
+            # Every PDF is fetched, even when its classification is cached
+            if self.blob_cache and file_md5 in self.blob_cache:
+                counts['blob_cache_hits'] += 1
+            else:
+                counts['download_sizes'].append(int(file.get('size') or 0))
+            
+            classification = self.file_mapping.get_classification(file['id'], file['name'], file.get('size'))
+            if not (classification and classification[0] and classification[1]):
+                classification = classify_name(file['name'])
+                if not all(classification):
+                    if not (self.text_store and self.text_store.has(file_md5, extractor)):
+                        counts['parses'] += 1
+                    counts['copies'] += 1
+                    counts['unresolved_copies'] += 1
+                    continue
+            
+            company, statement_type, account_info = classification
+            if not company or not statement_type:
+                continue
+            match = matcher.match(company, statement_type, account_info)
+            if match is None or match.folder_id is None:
+                new_folders.add(company)
+                continue
+            target_folders.add(match.folder_id)
+            if file_md5 and self.get_folder_index(match.folder_id).find_by_md5(file_md5):
+                counts['already_copied'] += 1
+            else:
+                counts['copies'] += 1
+        
+        # Each target folder is listed once for duplicate checks; unresolved files add up to one each
+        counts['target_folders'] = len(target_folders) + counts['unresolved_copies']
+        counts['new_folders'] = len(new_folders)
+        return counts
+    
+    def estimate_run(self, source_folder_id: str, dest_folder_id: str, workers: int = 1) -> Dict:
+        """
+        Estimate the Drive requests, bytes and duration of organizing a source folder
+        with the given number of workers, from the average costs measured by previous runs.
+        Only the source tree and the destination folders are listed; nothing is downloaded.
+        """
+        listed_before = self.metrics.count()
+        files = self.get_files_in_folder(source_folder_id, recursive=True)
+        counts = self.count_run_work(files, dest_folder_id)
+        counts['listing_calls'] = self.metrics.count() - listed_before
+        
+        costs = average_costs(self.metrics.load_history())
+        requests_per_second = self.rate_limiter.rate if self.rate_limiter else None
+        estimate = estimate_run_costs(counts, costs, workers, requests_per_second)
+        estimate.update(counts=counts, costs=costs, workers=workers)
+        return estimate
+    
+    def organize_statements(self, source_folder_id: str, dest_folder_id: str, dry_run: bool = False,
+                            duplicate_handling: str = 'smart', workers: int = 1, order: Sequence[str] = ()) -> Dict:
+        """
+        Organize statements from source folder to destination folder.
+        Files are processed in the given scheduling order (listing order by default).
+        With more than one worker, files are processed concurrently; each worker
+        thread uses its own Drive client.
+        """
+        from rich.progress import SpinnerColumn, TextColumn
+        
         console.print(f"\n[bold blue]Starting statement organization...[/bold blue]")
         
         # Get files from source folder (recursively)
         console.print("Searching for files recursively through all subfolders...")
-        files = self.get_files_in_folder(source_folder_id, recursive=True)
+        with self._span('list'):
+            files = self.get_files_in_folder(source_folder_id, recursive=True)
+        self._stage('listed')
         
         if not files:
             console.print("[yellow]No files found in source folder or its subfolders[/yellow]")
@@ -801,6 +1258,10 @@ class GoogleDriveOrganizer:
         
         console.print(f"File types found: {dict(file_types)}")
         
+        if order:
+            files = schedule_files(files, order, self)
+            console.print(f"Processing order: {', '.join(order)}")
+        
         # Statistics
         stats = {
             'total_files': len(files),
@@ -808,136 +1269,125 @@ class GoogleDriveOrganizer:
             'copied': 0,
             'skipped': 0,
             'errors': 0,
-            'unclassified': 0
+            'unclassified': 0,
+            'deferred': 0
         }
         
         # Process each file
-        with Progress(
+        with self._progress(
             SpinnerColumn(),
-            TextColumn("[progress.description]{task.description}"),
-            console=console
+            TextColumn("[progress.description]{task.description}")
         ) as progress:
             task = progress.add_task("Processing files...", total=len(files))
             
-            for file in files:
+            def on_start(file):
                 progress.update(task, description=f"Processing: {file['name']}")
-                
-                try:
-                    # Skip non-PDF files for now
-                    if not file['name'].lower().endswith('.pdf'):
-                        console.print(f"[yellow]Skipping non-PDF file: {file['name']}[/yellow]")
-                        stats['skipped'] += 1
-                        progress.advance(task)
-                        continue
-                    
-                    # Download file content for analysis
-                    file_content = self.download_file(file['id'])
-                    
-                    # Classify the file (with caching)
-                    company, statement_type, account_info = self.classify_file(
-                        file['name'], 
-                        file_content, 
-                        file_id=file['id'], 
-                        file_size=file.get('size')
-                    )
-                    
-                    if not company or not statement_type:
-                        console.print(f"[yellow]Could not classify: {file['name']}[/yellow]")
-                        stats['unclassified'] += 1
-                        progress.advance(task)
-                        continue
-                    
-                    # Find the appropriate existing folder or create new structure
-                    target_folder_id = self.find_target_folder(dest_folder_id, company, statement_type, account_info)
-                    
-                    if target_folder_id:
-                        # Found existing folder, use it directly
-                        if not dry_run:
-                            # Apply duplicate handling strategy
-                            if duplicate_handling == 'skip':
-                                # Skip all duplicates
-                                success = self.copy_file(file['id'], target_folder_id, check_duplicates=True)
-                                if success:
-                                    stats['copied'] += 1
-                                else:
-                                    stats['errors'] += 1
-                            elif duplicate_handling == 'rename':
-                                # Force rename all duplicates
-                                success = self.copy_file(file['id'], target_folder_id, check_duplicates=True)
-                                if success:
-                                    stats['copied'] += 1
-                                else:
-                                    stats['errors'] += 1
-                            elif duplicate_handling == 'force':
-                                # Force copy without duplicate checking
-                                success = self.copy_file(file['id'], target_folder_id, check_duplicates=False)
-                                if success:
-                                    stats['copied'] += 1
-                                else:
-                                    stats['errors'] += 1
-                            else:  # smart (default)
-                                # Use intelligent duplicate detection
-                                success = self.copy_file(file['id'], target_folder_id, check_duplicates=True)
-                                if success:
-                                    stats['copied'] += 1
-                                else:
-                                    stats['errors'] += 1
-                        else:
-                            # Get folder name for display
-                            try:
-                                folder_info = self.service.files().get(fileId=target_folder_id, fields='name').execute()
-                                folder_name = folder_info['name']
-                                console.print(f"[green]Would copy: {file['name']} → {folder_name}/ (existing folder)[/green]")
-                            except:
-                                console.print(f"[green]Would copy: {file['name']} → existing folder[/green]")
-                            stats['copied'] += 1
-                    else:
-                        # No existing folder found, create new structure
-                        company_folder_id = self.find_folder_by_name(company, dest_folder_id)
-                        if not company_folder_id and not dry_run:
-                            company_folder_id = self.create_folder(company, dest_folder_id)
-                        elif not company_folder_id and dry_run:
-                            console.print(f"[blue]Would create folder: {company}[/blue]")
-                            
-                        # For dry run, show what would happen
-                        if dry_run:
-                            if account_info:
-                                clean_type = statement_type.replace(" statement", "").replace("_statement", "")
-                                account_digits = self.get_last_digits(account_info, 4)
-                                folder_path = f"{company}/{clean_type} -{account_digits}"
-                                console.print(f"[blue]Would copy: {file['name']} → {folder_path}/ (new folder)[/blue]")
-                            else:
-                                clean_type = statement_type.replace(" statement", "").replace("_statement", "")
-                                folder_path = f"{company}/{clean_type}"
-                                console.print(f"[blue]Would copy: {file['name']} → {folder_path}/[/blue]")
-                            if account_info:
-                                console.print(f"[blue]  Account: {account_info} → Last 4: {self.get_last_digits(account_info, 4)}[/blue]")
-                            stats['copied'] += 1
-                    
-                    stats['processed'] += 1
-                    
-                except Exception as e:
-                    console.print(f"[red]Error processing {file['name']}: {e}[/red]")
-                    stats['errors'] += 1
-                
+            
+            # Statistics are only updated from this thread
+            for file, counters in self.process_files(files, dest_folder_id, dry_run, duplicate_handling,
+                                                       workers, on_start=on_start):
+                if workers > 1:
+                    progress.update(task, description=f"Processed: {file['name']}")
+                for counter in counters:
+                    stats[counter] += 1
                 progress.advance(task)
+        self._stage('classified')
+        
+        return stats
+
+    def organize_sharded(self, source_folder_id: str, dest_folder_id: str, lease_store: LeaseStore, worker_id: str,
+                         dry_run: bool = False, duplicate_handling: str = 'smart', workers: int = 1,
+                         lease_seconds: float = 300, unit_size: int = 50, order: Sequence[str] = ()) -> Dict:
+        """
+        Organize statements as one of several worker processes sharing a lease store.
+        The first worker lists the source folder, schedules it in the given order
+        and splits it into work units; every worker then claims units, in order,
+        until none are left.
+        """
+        console.print(f"\n[bold blue]Starting sharded statement organization as {worker_id}...[/bold blue]")
+        
+        if not lease_store.is_seeded():
+            console.print("Searching for files recursively through all subfolders...")
+            with self._span('list'):
+                files = schedule_files(self.get_files_in_folder(source_folder_id, recursive=True), order, self)
+            self._stage('listed')
+            if lease_store.seed([file.to_resource() for file in files], unit_size=unit_size,
+                                source_folder_id=source_folder_id, dest_folder_id=dest_folder_id):
+                console.print(f"Split {len(files)} files into work units of {unit_size}")
+        
+        for key, folder_id in (('source_folder_id', source_folder_id), ('dest_folder_id', dest_folder_id)):
+            if lease_store.get_meta(key) != folder_id:
+                raise ValueError(f"{lease_store.path} was created for {key} {lease_store.get_meta(key)}, not {folder_id}")
+        
+        stats = {
+            'total_files': 0,
+            'processed': 0,
+            'copied': 0,
+            'skipped': 0,
+            'errors': 0,
+            'unclassified': 0,
+            'deferred': 0
+        }
+        
+        while True:
+            claim = lease_store.claim(worker_id, lease_seconds)
+            if claim is None:
+                break
+            
+            unit_id, resources = claim
+            files = [DriveFile.from_resource(resource) for resource in resources]
+            console.print(f"[dim]Claimed work unit {unit_id} ({len(files)} files)[/dim]")
+            stats['total_files'] += len(files)
+            lease_lost = False
+            
+            results = self.process_files(files, dest_folder_id, dry_run, duplicate_handling, workers)
+            try:
+                for file, counters in results:
+                    # Files are marked one by one so a reclaimed unit only redoes unfinished files
+                    lease_store.mark_done(file['id'], worker_id, ','.join(counters))
+                    for counter in counters:
+                        stats[counter] += 1
+                    
+                    if not lease_store.renew(unit_id, worker_id, lease_seconds):
+                        console.print(f"[yellow]Lease on work unit {unit_id} expired and was reclaimed; leaving it to its new owner[/yellow]")
+                        lease_lost = True
+                        break
+            except BaseException:
+                results.close()
+                lease_store.release(unit_id, worker_id)
+                raise
+            results.close()
+            
+            if not lease_lost:
+                lease_store.complete(unit_id, worker_id)
+        self._stage('classified')
+        
+        progress = lease_store.get_progress()
+        console.print(f"Work units: {progress['done']} done, {progress['leased']} leased by other workers, "
+                      f"{progress['pending']} pending ({progress['done_files']}/{progress['total_files']} files processed)")
         
         return stats
 
-    def check_for_duplicates(self, file_id: str, destination_folder_id: str, file_name: str = None) -> Dict:
+    def check_for_duplicates(self, file_id: str, destination_folder_id: str, file_name: str = None,
+                             file: Optional[Mapping] = None) -> Dict:
         """
         Check for various types of duplicates before copying a file.
         Returns dict with duplicate info and recommended action.
+        Metadata is taken from the file record when given, otherwise fetched.
         """
         try:
+            if file is not None:
+                file_name = file_name or file['name']
+                file_size = file.get('size', '0')
+                file_md5 = file.get('md5Checksum')
             # Get file metadata if not provided
-            if not file_name:
-                file_metadata = self.service.files().get(fileId=file_id, fields='name,size,md5Checksum').execute()
+            elif not file_name:
+                file_metadata = self._execute(self.service.files().get(fileId=file_id, fields='name,size,md5Checksum'))
                 file_name = file_metadata['name']
                 file_size = file_metadata.get('size', '0')
                 file_md5 = file_metadata.get('md5Checksum')
             else:
-                file_metadata = self.service.files().get(fileId=file_id, fields='size,md5Checksum').execute()
+                file_metadata = self._execute(self.service.files().get(fileId=file_id, fields='size,md5Checksum'))
                 file_size = file_metadata.get('size', '0')
                 file_md5 = file_metadata.get('md5Checksum')
             
@@ -949,12 +1399,13 @@ class GoogleDriveOrganizer:
                 'reason': 'No duplicates found'
             }
             
+            folder_index = self.get_folder_index(destination_folder_id)
+
             # 1. Check for exact filename match
-            query = f"name='{file_name}' and '{destination_folder_id}' in parents and trashed=false"
-            exact_matches = self.service.files().list(q=query, fields='files(id,name,size,md5Checksum)').execute()
-            
-            if exact_matches['files']:
-                exact_match = exact_matches['files'][0]
+            exact_matches = folder_index.find_by_name(file_name)
+
+            if exact_matches:
+                exact_match = exact_matches[0]
                 duplicates['exact_filename'] = exact_match
                 
                 # Check if it's the same file (same ID)
@@ -972,39 +1423,17 @@ class GoogleDriveOrganizer:
             
             # 2. Check for content duplicates (same MD5 hash)
             if file_md5:
-                query = f"md5Checksum='{file_md5}' and '{destination_folder_id}' in parents and trashed=false"
-                content_matches = self.service.files().list(q=query, fields='files(id,name,size,md5Checksum)').execute()
-                
-                if content_matches['files']:
-                    # Filter out the current file
-                    content_dupes = [f for f in content_matches['files'] if f['id'] != file_id]
-                    if content_dupes:
-                        duplicates['content_duplicate'] = content_dupes[0]
-                        if duplicates['recommended_action'] == 'copy':
-                            duplicates['recommended_action'] = 'skip'
-                            duplicates['reason'] = 'Identical content already exists in destination'
-            
+                # Filter out the current file
+                content_dupes = [f for f in folder_index.find_by_md5(file_md5) if f['id'] != file_id]
+                if content_dupes:
+                    duplicates['content_duplicate'] = content_dupes[0]
+                    if duplicates['recommended_action'] == 'copy':
+                        duplicates['recommended_action'] = 'skip'
+                        duplicates['reason'] = 'Identical content already exists in destination'
+
             # 3. Check for similar filenames (same base name, different extensions or dates)
-            base_name = os.path.splitext(file_name)[0]
-            # Remove common date patterns
-            base_name_clean = re.sub(r'[-_]\d{4}[-_]\d{2}[-_]\d{2}', '', base_name)
-            base_name_clean = re.sub(r'[-_]\d{8}', '', base_name_clean)
-            
-            query = f"'{destination_folder_id}' in parents and trashed=false"
-            all_files = self.service.files().list(q=query, fields='files(id,name,size)').execute()
-            
-            for file in all_files['files']:
-                if file['id'] != file_id:
-                    other_base = os.path.splitext(file['name'])[0]
-                    other_base_clean = re.sub(r'[-_]\d{4}[-_]\d{2}[-_]\d{2}', '', other_base)
-                    other_base_clean = re.sub(r'[-_]\d{8}', '', other_base_clean)
-                    
-                    # Check for similar base names
-                    if (base_name_clean.lower() == other_base_clean.lower() or 
-                        base_name_clean.lower().startswith(other_base_clean.lower()) or
-                        other_base_clean.lower().startswith(base_name_clean.lower())):
-                        duplicates['similar_filename'].append(file)
-            
+            duplicates['similar_filename'] = folder_index.find_similar(file_name, exclude_id=file_id)
+
             return duplicates
             
         except Exception as e:
@@ -1026,11 +1455,10 @@ class GoogleDriveOrganizer:
         counter = 1
         new_name = original_name
         
+        folder_index = self.get_folder_index(destination_folder_id)
+        
         while True:
-            query = f"name='{new_name}' and '{destination_folder_id}' in parents and trashed=false"
-            matches = self.service.files().list(q=query, fields='files(id)').execute()
-            
-            if not matches['files']:
+            if not folder_index.has_name(new_name):
                 break
             
             new_name = f"{base_name} ({counter}){extension}"
@@ -1047,6 +1475,8 @@ class GoogleDriveOrganizer:
         """
         Analyze destination folders for potential duplicates and provide a report.
         """
+        from rich.progress import SpinnerColumn, TextColumn
+        
         console.print(f"\n[bold blue]Analyzing duplicates in destination folders...[/bold blue]")
         
         try:
@@ -1064,10 +1494,9 @@ class GoogleDriveOrganizer:
             filename_groups = {}
             potential_duplicates = []
             
-            with Progress(
+            with self._progress(
                 SpinnerColumn(),
-                TextColumn("[progress.description]{task.description}"),
-                console=console
+                TextColumn("[progress.description]{task.description}")
             ) as progress:
                 task = progress.add_task("Analyzing files...", total=len(all_files))
                 
@@ -1075,38 +1504,10 @@ class GoogleDriveOrganizer:
                     progress.update(task, description=f"Analyzing: {file['name']}")
                     
                     try:
-                        # Get file metadata with MD5
-                        file_metadata = self.service.files().get(
-                            fileId=file['id'], 
-                            fields='name,size,md5Checksum,parents'
-                        ).execute()
-                        
-                        file_name = file_metadata['name']
-                        file_size = file_metadata.get('size', '0')
-                        file_md5 = file_metadata.get('md5Checksum')
-                        file_parents = file_metadata.get('parents', [])
-                        
-                        # Group by MD5 hash
-                        if file_md5:
-                            if file_md5 not in md5_groups:
-                                md5_groups[file_md5] = []
-                            md5_groups[file_md5].append({
-                                'id': file['id'],
-                                'name': file_name,
-                                'size': file_size,
-                                'parents': file_parents
-                            })
-                        
-                        # Group by filename
-                        if file_name not in filename_groups:
-                            filename_groups[file_name] = []
-                        filename_groups[file_name].append({
-                            'id': file['id'],
-                            'name': file_name,
-                            'size': file_size,
-                            'md5': file_md5,
-                            'parents': file_parents
-                        })
+                        # The listed records carry the MD5 and parents, so the groups share them
+                        if file.md5_checksum:
+                            md5_groups.setdefault(file.md5_checksum, []).append(file)
+                        filename_groups.setdefault(file.name, []).append(file)
                         
                     except Exception as e:
                         console.print(f"[yellow]Warning: Could not analyze {file['name']}: {e}[/yellow]")
@@ -1161,7 +1562,7 @@ class GoogleDriveOrganizer:
                         folder_name = "Unknown"
                         if file['parents']:
                             try:
-                                parent_info = self.service.files().get(fileId=file['parents'][0], fields='name').execute()
+                                parent_info = self._execute(self.service.files().get(fileId=file['parents'][0], fields='name'))
                                 folder_name = parent_info['name']
                             except:
                                 pass
@@ -1175,11 +1576,11 @@ class GoogleDriveOrganizer:
                         folder_name = "Unknown"
                         if file['parents']:
                             try:
-                                parent_info = self.service.files().get(fileId=file['parents'][0], fields='name').execute()
+                                parent_info = self._execute(self.service.files().get(fileId=file['parents'][0], fields='name'))
                                 folder_name = parent_info['name']
                             except:
                                 pass
-                        console.print(f"    • {file['name']} ({folder_name}/) - Size: {file['size']} bytes")
+                        console.print(f"    • {file['name']} ({folder_name}/) - Size: {file.get('size', '0')} bytes")
             
             return duplicate_report
             
@@ -1188,6 +1589,383 @@ class GoogleDriveOrganizer:
             return {}
 
 
+class SnapshotOrganizer(GoogleDriveOrganizer):
+    """
+    Organizer for dry runs from a snapshot written by --snapshot-out, without
+    a Drive connection. Listings, folder lookups and duplicate checks are
+    answered from the snapshot. Files are classified from the classification
+    cache, the stored PDF text or, failing both, their name. No cache is written.
+    """
+    
+    def __init__(self, snapshot_path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.offline = True
+        header, records = read_snapshot(snapshot_path)
+        self.source_folder_id = header['root_id']
+        self.dest_folder_id = header.get('dest_root_id')
+        self.children: Dict[str, List[DriveFile]] = {}
+        for record in records.values():
+            for parent_id in record.parents:
+                self.children.setdefault(parent_id, []).append(record)
+        self.planned_copies = 0
+    
+    def authenticate(self):
+        raise RuntimeError('A snapshot dry run has no Google Drive connection')
+    
+    def _child_folders(self, parent_id: Optional[str]) -> List[Dict]:
+        if parent_id is None:
+            children = itertools.chain.from_iterable(self.children.values())
+        else:
+            children = self.children.get(parent_id, [])
+        return [record for record in children if record.is_folder]
+    
+    def find_folder_by_name(self, folder_name: str, parent_id: Optional[str] = None) -> Optional[str]:
+        for folder in self._child_folders(parent_id):
+            if folder['name'] == folder_name:
+                return folder['id']
+        console.print(f"[yellow]Warning: Folder '{folder_name}' not found[/yellow]")
+        return None
+    
+    def get_files_in_folder(self, folder_id: str, recursive: bool = True) -> List[DriveFile]:
+        # Same order as the live listing: each subfolder's files in place of the subfolder
+        all_files = []
+        for item in self.children.get(folder_id, []):
+            if item.get('mimeType') == FOLDER_MIME_TYPE:
+                if recursive:
+                    all_files.extend(self.get_files_in_folder(item['id'], recursive=True))
+            else:
+                all_files.append(item)
+        return all_files
+    
+    def list_child_folders(self, parent_folder_id: str) -> List[Dict]:
+        return [{'id': folder['id'], 'name': folder['name']} for folder in self._child_folders(parent_folder_id)]
+    
+    def get_folder_index(self, folder_id: str) -> FolderContentsIndex:
+        if folder_id not in self.folder_indexes:
+            files = [record for record in self.children.get(folder_id, []) if not record.is_folder]
+            self.folder_indexes[folder_id] = FolderContentsIndex(files)
+        return self.folder_indexes[folder_id]
+    
+    def fetch_file_content(self, file: Mapping):
+        return None
+    
+    def classify_file(self, file_name: str, file_content: Optional[bytes] = None, file_id: str = None, file_size: str = None,
+                      file_md5: Optional[str] = None) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        if file_id:
+            cached_result = self.file_mapping.get_classification(file_id, file_name, file_size)
+            if cached_result:
+                console.print(f"[dim]Using cached result for {file_name}[/dim]")
+                return cached_result
+        
+        def load_text() -> Optional[str]:
+            text = self.text_store.get(file_md5) if self.text_store else None
+            if text is None:
+                console.print(f"[dim]No cached classification or stored text for {file_name}; using its name only[/dim]")
+            return text
+        
+        return classify(file_name, load_text)
+    
+    def plan_copy(self, file: Mapping, target_folder_id: str, duplicate_handling: str):
+        """Show what copying a file would do, applying the duplicate checks to the snapshot."""
+        folder_name = self.folder_names.get(target_folder_id, 'existing folder')
+        name = file['name']
+        if duplicate_handling != 'force':
+            duplicates = self.check_for_duplicates(file['id'], target_folder_id, file=file)
+            if duplicates['recommended_action'] == 'skip':
+                console.print(f"[yellow]Would skip: {name} → {folder_name}/ - {duplicates['reason']}[/yellow]")
+                return
+            if duplicates['recommended_action'] == 'rename':
+                name = self.generate_unique_filename(name, target_folder_id)
+        
+        console.print(f"[green]Would copy: {file['name']} → {folder_name}/{name if name != file['name'] else ''} (existing folder)[/green]")
+        # Later files of the plan are checked against this copy, as in a real run
+        self.planned_copies += 1
+        self.get_folder_index(target_folder_id).add({'id': f"planned-{self.planned_copies}", 'name': name,
+                                                     'size': file.get('size'), 'md5Checksum': file.get('md5Checksum')})
+
+
+def print_snapshot_diff(old_path: str, new_path: str, limit: int = 20):
+    """Print the differences between two folder snapshots."""
+    from rich.table import Table
+    
+    _, old_records = read_snapshot(old_path)
+    _, new_records = read_snapshot(new_path)
+    diff = diff_snapshots(old_records, new_records)
+    
+    def folder_name(folder_id: str) -> str:
+        record = new_records.get(folder_id) or old_records.get(folder_id)
+        return record['name'] if record else folder_id
+    
+    table = Table(title="Snapshot Differences")
+    table.add_column("Change", style="cyan")
+    table.add_column("Count", style="magenta")
+    for change in ('added', 'removed', 'moved', 'renamed'):
+        table.add_row(change.capitalize(), str(len(diff[change])))
+    console.print(table)
+    
+    for record in diff['added'][:limit]:
+        console.print(f"[green]+ {record['name']}[/green]")
+    for record in diff['removed'][:limit]:
+        console.print(f"[red]- {record['name']}[/red]")
+    for move in diff['moved'][:limit]:
+        old_parents = ', '.join(folder_name(p) for p in move['old_parents'])
+        new_parents = ', '.join(folder_name(p) for p in move['new_parents'])
+        console.print(f"[blue]→ {move['name']}: {old_parents}/ → {new_parents}/[/blue]")
+    for rename in diff['renamed'][:limit]:
+        console.print(f"[yellow]~ {rename['old_name']} → {rename['new_name']}[/yellow]")
+    
+    if any(len(entries) > limit for entries in diff.values()):
+        console.print(f"[dim]Showing at most {limit} entries per change type[/dim]")
+    
+    return diff
+
+
+def run_jobs(jobs: List[OrganizeJob], requests_per_second: Optional[float] = None,
+             pdf_backend: str = DEFAULT_BACKEND, file_mapping: Optional[FileMapping] = None,
+             retry_failed: bool = False, tracer: Optional[SpanTracer] = None,
+             blob_cache: Optional[BlobCache] = None, text_store: Optional[TextStore] = None,
+             concurrency: Optional[ConcurrencyController] = None) -> Dict[str, Optional[Dict]]:
+    """
+    Run several organize jobs concurrently in one process.
+    All jobs draw on one request budget and concurrency controller and share
+    the classification, negative, blob and text caches, and jobs with the
+    same credentials share one authenticated transport. With a concurrency
+    controller, each job gets as many workers as its limits allow. Returns
+    the statistics of each job by name, in manifest order; failed jobs have
+    None.
+    """
+    rate_limiter = RateLimiter(requests_per_second) if requests_per_second else None
+    file_mapping = file_mapping or FileMapping()
+    negative_cache = NegativeCache()
+    negative_cache.retry_all = retry_failed
+    metrics = RunMetrics()
+    transports = {}
+    organizers = {}
+    
+    # Authenticate up front and one job at a time, since a login may open a browser
+    for job in jobs:
+        organizer = GoogleDriveOrganizer(job.credentials_file, job.token_file, pdf_backend=pdf_backend,
+                                         file_mapping=file_mapping, rate_limiter=rate_limiter, show_progress=False,
+                                         negative_cache=negative_cache, tracer=tracer, blob_cache=blob_cache,
+                                         text_store=text_store, metrics=metrics, concurrency=concurrency)
+        credentials = (job.credentials_file, job.token_file)
+        if credentials not in transports:
+            organizer.authenticate()
+            transports[credentials] = organizer.transport
+        organizer.transport = transports[credentials]
+        organizers[job.name] = organizer
+    
+    def run_job(job: OrganizeJob) -> Optional[Dict]:
+        organizer = organizers[job.name]
+        source_folder_id = job.source_folder_id or organizer.find_folder_by_name(job.source_folder_name)
+        dest_folder_id = job.dest_folder_id or organizer.find_folder_by_name(job.dest_folder_name)
+        if not source_folder_id or not dest_folder_id:
+            console.print(f"[red]{job.name}: could not find the source or destination folder[/red]")
+            return None
+        
+        console.print(f"[bold blue]▶ Starting job {job.name}[/bold blue]")
+        workers = concurrency.maximum if concurrency else job.workers
+        stats = organizer.organize_statements(source_folder_id, dest_folder_id, job.dry_run,
+                                              job.duplicate_handling, workers=workers, order=job.order)
+        console.print(f"[bold blue]■ Finished job {job.name}[/bold blue]")
+        return stats
+    
+    results = {}
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            futures = {executor.submit(run_job, job): job for job in jobs}
+            for future in concurrent.futures.as_completed(futures):
+                job = futures[future]
+                try:
+                    results[job.name] = future.result()
+                except Exception as e:
+                    console.print(f"[red]{job.name}: {e}[/red]")
+                    results[job.name] = None
+    finally:
+        for transport in transports.values():
+            transport.close()
+    
+    if rate_limiter:
+        console.print(f"[dim]{rate_limiter.requests} API requests, {rate_limiter.waited:.1f}s waiting for the request budget[/dim]")
+    metrics.save()
+    
+    return {job.name: results[job.name] for job in jobs}
+
+
+def print_job_results(results: Dict[str, Optional[Dict]]):
+    """Print one row of processing statistics per job."""
+    from rich.table import Table
+    
+    columns = ['total_files', 'processed', 'copied', 'skipped', 'unclassified', 'deferred', 'errors']
+    table = Table(title="Job Results")
+    table.add_column("Job", style="cyan")
+    for column in columns:
+        table.add_column(column.replace('_', ' ').title(), style="magenta")
+    
+    for name, stats in results.items():
+        table.add_row(name, *(str((stats or {}).get(column, '-')) for column in columns))
+    
+    console.print(table)
+
+
+def print_run_summary(organizer: GoogleDriveOrganizer, stats: Dict, blob_cache: Optional[BlobCache] = None,
+                      concurrency: Optional[ConcurrencyController] = None):
+    """Print the results of an organize run and the state of the caches."""
+    # Display results
+    console.print(f"\n[bold blue]Organization Complete![/bold blue]")
+    
+    from rich.table import Table
+    table = Table(title="Processing Results")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Count", style="magenta")
+    
+    table.add_row("Total Files", str(stats['total_files']))
+    table.add_row("Processed", str(stats['processed']))
+    table.add_row("Copied", str(stats['copied']))
+    table.add_row("Skipped", str(stats['skipped']))
+    table.add_row("Unclassified", str(stats['unclassified']))
+    table.add_row("Deferred", str(stats['deferred']))
+    table.add_row("Errors", str(stats['errors']))
+    
+    console.print(table)
+    
+    # Show cache statistics
+    cache_stats = organizer.file_mapping.get_cache_stats()
+    console.print(f"\n[bold blue]Cache Statistics:[/bold blue]")
+    console.print(f"📁 Total cached files: {cache_stats['total_cached_files']}")
+    console.print(f"✅ Classified files: {cache_stats['classified_files']}")
+    console.print(f"❓ Unclassified files: {cache_stats['unclassified_files']}")
+    console.print(f"💾 Cache file size: {cache_stats['cache_file_size']} bytes")
+    if cache_stats['stale_files']:
+        console.print(f"🔁 Classified under older patterns: {cache_stats['stale_files']} (run --reclassify to update)")
+    
+    failure_stats = organizer.negative_cache.get_stats()
+    if failure_stats['total']:
+        reasons = ', '.join(f"{reason}: {count}" for reason, count in sorted(failure_stats['by_reason'].items()))
+        console.print(f"⏳ Failed files waiting for retry: {failure_stats['waiting']} of {failure_stats['total']} ({reasons})")
+    
+    if blob_cache:
+        blob_stats = blob_cache.get_stats()
+        console.print(f"📦 Cached PDFs: {blob_stats['blobs']} ({blob_stats['total_bytes'] / 1024 / 1024:.1f} of "
+                      f"{blob_stats['max_bytes'] / 1024 / 1024:.0f} MB), {blob_stats['hits']} read locally, "
+                      f"{blob_stats['misses']} downloaded")
+    
+    if concurrency:
+        print_concurrency_report(concurrency)
+
+
+def print_concurrency_report(concurrency: ConcurrencyController):
+    """Print the concurrency limits chosen over the run for each kind of request."""
+    console.print(f"\n[bold blue]Adaptive Concurrency (limit@elapsed):[/bold blue]")
+    for line in concurrency.report():
+        console.print(f"  {line}")
+
+
+def format_duration(seconds: float) -> str:
+    """Format a duration as e.g. 2h 05m, 4m 10s or 12s."""
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def print_estimate(estimate: Dict):
+    """Print the projected work, API calls, bytes and duration of a run."""
+    from rich.table import Table
+    
+    counts = estimate['counts']
+    table = Table(title=f"Estimate for {estimate['workers']} worker(s)")
+    table.add_column("Item", style="cyan")
+    table.add_column("Projected", style="magenta")
+    
+    table.add_row("Files listed", str(counts['files']))
+    table.add_row("Skipped (not PDF) / deferred", f"{counts['skipped']} / {counts['deferred']}")
+    table.add_row("Downloads", f"{len(counts['download_sizes'])} ({estimate['download_bytes'] / 1024 / 1024:.1f} MB)")
+    if counts['blob_cache_hits']:
+        table.add_row("Read from the PDF cache", str(counts['blob_cache_hits']))
+    table.add_row("PDFs parsed", str(counts['parses']))
+    table.add_row("Copies", f"{counts['copies']} (up to; {counts['unresolved_copies']} depend on PDF text)")
+    table.add_row("Already copied", str(counts['already_copied']))
+    table.add_row("Folders created", str(counts['new_folders']))
+    table.add_row("API calls", f"{estimate['api_calls']} ({estimate['metadata_calls']} metadata, "
+                               f"{estimate['mutation_calls']} copy/create, {estimate['download_requests']} download)")
+    table.add_row("Duration", f"{format_duration(estimate['seconds'])} (limited by {estimate['bottleneck']})")
+    console.print(table)
+    
+    measured = estimate['costs']['measured']
+    if measured:
+        console.print(f"[dim]Measured by previous runs: {', '.join(measured)}; other costs are defaults from config.py[/dim]")
+    else:
+        console.print("[dim]No measurements from previous runs yet; using the default costs from config.py[/dim]")
+    if estimate['parse_seconds'] > estimate['network_seconds'] / max(estimate['workers'], 1):
+        console.print("[dim]PDF parsing holds the GIL, so more workers will not shorten this run[/dim]")
+
+
+def reclassify_cache(file_mapping: FileMapping, text_store: TextStore, extractor: Optional[str] = None,
+                     dry_run: bool = False) -> Dict:
+    """
+    Re-apply the classification patterns to the cached files classified under
+    other patterns, using stored PDF text instead of downloading. Files whose
+    name is not enough and whose text is not stored stay stale. Unless dry_run
+    is set, the new classifications are saved in one write.
+    Returns counts and the list of (file name, old, new) changes.
+    """
+    stale = file_mapping.stale_entries()
+    updates = {}
+    changes = []
+    missing_text = 0
+    
+    for key, entry in stale:
+        text_missing = False
+        
+        def load_text() -> Optional[str]:
+            nonlocal text_missing
+            text = text_store.get(entry.get('md5'), extractor) if extractor else None
+            if text is None:
+                text = text_store.get(entry.get('md5'))
+            text_missing = text is None
+            return text
+        
+        new = classify(entry['file_name'], load_text)
+        if text_missing:
+            missing_text += 1
+            continue
+        
+        updates[key] = new
+        old = (entry.get('company'), entry.get('statement_type'), entry.get('account_info'))
+        if new != old:
+            changes.append((entry['file_name'], old, new))
+    
+    if updates and not dry_run:
+        file_mapping.update_classifications(updates)
+    
+    return {
+        'stale': len(stale),
+        'reclassified': len(updates),
+        'changed': changes,
+        'missing_text': missing_text
+    }
+
+
+def print_reclassify_report(report: Dict, limit: int = 50):
+    """Print the classifications changed by --reclassify."""
+    def describe(classification) -> str:
+        return ' / '.join(value or '-' for value in classification)
+    
+    for file_name, old, new in report['changed'][:limit]:
+        click.echo(f"  {file_name}: {describe(old)} → {describe(new)}")
+    if len(report['changed']) > limit:
+        click.echo(f"  ... and {len(report['changed']) - limit} more")
+    
+    click.secho(f"Reclassified {report['reclassified']} of {report['stale']} stale entries: "
+                f"{len(report['changed'])} changed", fg='green')
+    if report['missing_text']:
+        click.secho(f"{report['missing_text']} entries need their PDF text, which is not stored; "
+                    f"they are classified again when next organized", fg='yellow')
+
+
 @click.command()
 @click.option('--source-folder-id', envvar='SOURCE_FOLDER_ID', help='Google Drive folder ID for source folder')
 @click.option('--dest-folder-id', envvar='DEST_FOLDER_ID', help='Google Drive folder ID for destination folder')
@@ -1196,7 +1974,21 @@ class GoogleDriveOrganizer:
 @click.option('--monthly-statements', default='Monthly Statements', help='Name of monthly statements folder')
 @click.option('--statements-by-account', default='Statements by Account', help='Name of statements by account folder')
 @click.option('--clear-cache', is_flag=True, help='Clear the file classification cache')
-@click.option('--export-cache', help='Export cache to specified file')
+@click.option('--export-cache', help='Export cache to specified file (.json, .jsonl or .csv)')
+@click.option('--reclassify', is_flag=True,
+              help='Re-apply changed classification patterns to cached files using stored PDF text (with --dry-run, only report)')
+@click.option('--text-store', 'text_store_path', default='text_store.db', help='Where extracted PDF text is kept for --reclassify (default: text_store.db)')
+@click.option('--classify-local', type=click.Path(exists=True, file_okay=False), default=None,
+              help='Classify the PDFs in a local directory (e.g. a Takeout export) into the cache, without Drive')
+@click.option('--manifest-out', type=click.Path(dir_okay=False), default=None,
+              help='With --classify-local: write the results to this CSV file instead of the cache')
+@click.option('--processes', type=int, default=None, help='Worker processes for --classify-local (default: one per CPU)')
+@click.option('--serve', 'serve_address', default=None,
+              help='Run a classification service on a Unix socket path or a localhost port (PORT or HOST:PORT), using --workers threads')
+@click.option('--serve-root', type=click.Path(exists=True, file_okay=False), default=None,
+              help='With --serve: directory whose files may be classified by path (default: only PDF bytes are accepted)')
+@click.option('--import-mapping', type=click.Path(exists=True, dir_okay=False),
+              help='Apply manual classifications from a .json, .jsonl or .csv file to the cache')
 @click.option('--rename-folders', is_flag=True, help='Rename folders with confirmed account numbers')
 @click.option('--backup-folders', is_flag=True, help='Create backup of current folder structure')
 @click.option('--test-rename', help='Test renaming a single folder (format: "old_name,new_name")')
@@ -1204,40 +1996,231 @@ class GoogleDriveOrganizer:
 @click.option('--duplicate-handling', default='smart', type=click.Choice(['smart', 'skip', 'rename', 'force']), 
               help='How to handle duplicates: smart=auto-detect, skip=skip all, rename=auto-rename, force=overwrite (default: smart)')
 @click.option('--analyze-duplicates', is_flag=True, help='Analyze and report on duplicates in destination folders')
+@click.option('--pdf-backend', default=DEFAULT_BACKEND, type=click.Choice(BACKEND_CHOICES),
+              help='PDF text extraction backend; auto benchmarks the installed backends and picks the fastest (default: pypdf2)')
+@click.option('--diff-snapshots', nargs=2, type=click.Path(exists=True, dir_okay=False), default=None,
+              help='Compare two folder snapshots created by --backup-folders (format: OLD NEW)')
+@click.option('--jobs-manifest', type=click.Path(exists=True, dir_okay=False),
+              help='Run every source/destination job listed in a JSON manifest concurrently')
+@click.option('--requests-per-second', type=float, default=None,
+              help='Drive API request budget shared by all workers and jobs (default: unlimited, or 10 with --jobs-manifest)')
+@click.option('--shard-db', type=click.Path(dir_okay=False),
+              help='SQLite work-lease database shared by several organizer processes; each claims work units from it')
+@click.option('--worker-id', default=None, help='Worker name in the --shard-db database (default: hostname:pid)')
+@click.option('--lease-seconds', default=300.0, help='How long a claimed work unit stays reserved without progress (default: 300)')
+@click.option('--unit-size', default=50, help='Files per work unit when the --shard-db database is created (default: 50)')
+@click.option('--watch', is_flag=True, help='Keep running and organize new or changed statements as they arrive')
+@click.option('--watch-interval', default=30.0, help='Seconds between change checks in --watch mode (default: 30)')
+@click.option('--watch-state', default='watch_state.json', help='Where --watch keeps its change feed position (default: watch_state.json)')
+@click.option('--retry-failed', is_flag=True, help='Retry files that failed recently instead of waiting for their retry time')
+@click.option('--adaptive-concurrency', is_flag=True,
+              help='Tune the Drive requests in flight per kind (downloads, metadata, changes) up to --max-workers')
+@click.option('--max-workers', type=click.IntRange(min=1), default=None,
+              help='With --adaptive-concurrency: the most requests in flight per kind (default: 4 × --workers)')
+@click.option('--snapshot-out', type=click.Path(dir_okay=False), default=None,
+              help='Snapshot the source and destination trees into this file for --from-snapshot, then exit')
+@click.option('--from-snapshot', type=click.Path(exists=True, dir_okay=False), default=None,
+              help='With --dry-run: plan the run from a --snapshot-out file, without connecting to Google Drive')
+@click.option('--estimate', is_flag=True, help='Project API calls, bytes and duration of the run for --workers, without running it')
+@click.option('--order', default='', help=f"Processing order, comma-separated and applied left to right: {', '.join(ORDERINGS)} (default: listing order)")
+@click.option('--profile', type=click.Choice(PROFILE_MODES), default=None,
+              help='Profile the run: cpu (cProfile stats and flamegraph stacks) or mem (tracemalloc snapshots per stage)')
+@click.option('--trace-file', type=click.Path(dir_okay=False), default=None,
+              help='Append per-file stage timings (list/download/extract/classify/match/dedupe/copy) as JSON lines')
+@click.option('--blob-cache-dir', type=click.Path(file_okay=False), default=None,
+              help='Keep downloaded PDFs in this directory, keyed by md5, so reclassifying does not download them again')
+@click.option('--blob-cache-size', type=int, default=None,
+              help='Size budget of --blob-cache-dir in MB; least recently used PDFs are removed beyond it (default: 2048)')
+@click.option('--blob-cache-mmap/--no-blob-cache-mmap', default=True,
+              help='Memory-map cached PDFs for the PDF parser instead of reading them into memory (default: on)')
 def main(source_folder_id: str, dest_folder_id: str, credentials_file: str, dry_run: bool, 
          monthly_statements: str, statements_by_account: str, clear_cache: bool, export_cache: str,
-         rename_folders: bool, backup_folders: bool, test_rename: str, workers: int, duplicate_handling: str, analyze_duplicates: bool):
+         reclassify: bool, text_store_path: str, classify_local: Optional[str], manifest_out: Optional[str],
+         processes: Optional[int], serve_address: Optional[str], serve_root: Optional[str], import_mapping: str,
+         rename_folders: bool, backup_folders: bool, test_rename: str, workers: int, duplicate_handling: str, analyze_duplicates: bool,
+         pdf_backend: str, diff_snapshots: Optional[Tuple[str, str]], jobs_manifest: str,
+         requests_per_second: Optional[float], shard_db: str, worker_id: Optional[str], lease_seconds: float,
+         unit_size: int, watch: bool, watch_interval: float, watch_state: str, retry_failed: bool, adaptive_concurrency: bool,
+         max_workers: Optional[int], snapshot_out: Optional[str], from_snapshot: Optional[str], estimate: bool, order: str,
+         profile: Optional[str], trace_file: Optional[str], blob_cache_dir: Optional[str],
+         blob_cache_size: Optional[int], blob_cache_mmap: bool):
     """Organize Google Drive statements by company and type."""
     
-    console.print("[bold green]Google Drive Statement Organizer[/bold green]")
+    click.secho("Google Drive Statement Organizer", fg='green', bold=True)
+    
+    # Handle cache operations - these only touch the local cache, so they
+    # skip authentication and the Rich/Google/PDF imports entirely
+    if clear_cache:
+        FileMapping().clear_cache()
+        NegativeCache().clear()
+        click.secho("✓ Cache cleared successfully", fg='green')
+        return 0
+    
+    if export_cache:
+        export_file = FileMapping().export_mapping(export_cache)
+        click.secho(f"✓ Cache exported to {export_file}", fg='green')
+        return 0
+    
+    if reclassify:
+        store = TextStore(text_store_path)
+        try:
+            extractor = PDFTextExtractor(pdf_backend).version
+            report = reclassify_cache(FileMapping(), store, extractor, dry_run=dry_run)
+        finally:
+            store.close()
+        print_reclassify_report(report)
+        if dry_run:
+            click.secho("Dry run: the cache was not updated", fg='yellow')
+        return 0
+    
+    if classify_local:
+        store = TextStore(text_store_path)
+        try:
+            stats = classify_local_files(LocalDirectorySource(classify_local), FileMapping(), store,
+                                         manifest_path=manifest_out, processes=processes, backend=pdf_backend)
+        finally:
+            store.close()
+        rate = stats['files'] / stats['seconds'] if stats['seconds'] else 0
+        click.secho(f"✓ Classified {stats['classified']} of {stats['files']} files in {stats['seconds']:.1f}s "
+                    f"({rate:.0f} files/s)", fg='green')
+        click.echo(f"From cache: {stats['cache']}, from name: {stats['name']}, from PDF text: {stats['pdf']}, "
+                   f"unclassified: {stats['unclassified']}, errors: {stats['errors']}")
+        click.echo(f"Results written to {manifest_out or 'the classification cache'}")
+        return 0
+    
+    if serve_address:
+        try:
+            address = parse_address(serve_address)
+        except ValueError as e:
+            click.secho(f"✗ {e}", fg='red')
+            return 1
+        store = TextStore(text_store_path)
+        service = ClassificationService(FileMapping(), store, PDFTextExtractor(pdf_backend), workers=workers,
+                                        path_root=serve_root)
+        try:
+            server = create_server(address, service)
+        except ValueError as e:
+            service.close()
+            store.close()
+            click.secho(f"✗ {e}", fg='red')
+            return 1
+        click.secho(f"✓ Classifying on {server_address_text(server)} with {workers} workers (Ctrl+C to stop)", fg='green')
+        # Stop as cleanly on SIGTERM as on Ctrl+C
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            shutdown_server(server)
+            store.close()
+        click.echo(f"Served {service.stats['requests']} requests ({service.stats['errors']} errors)")
+        return 0
+    
+    if import_mapping:
+        if not FileMapping().import_manual_mapping(import_mapping):
+            click.secho(f"✗ Could not import mappings from {import_mapping}", fg='red')
+            return 1
+        click.secho(f"✓ Manual mappings imported from {import_mapping}", fg='green')
+        return 0
+    
+    # Snapshot comparison works on local files only
+    if diff_snapshots:
+        print_snapshot_diff(*diff_snapshots)
+        return 0
+    
+    try:
+        order = parse_order(order)
+    except ValueError as e:
+        click.secho(f"✗ {e}", fg='red')
+        return 1
     
     if dry_run:
         console.print("[yellow]Running in DRY RUN mode - no changes will be made[/yellow]")
     
+    blob_cache = None
+    if blob_cache_dir:
+        from config import BLOB_CACHE_MAX_MB
+        blob_cache = BlobCache(blob_cache_dir, (blob_cache_size or BLOB_CACHE_MAX_MB) * 1024 * 1024,
+                               use_mmap=blob_cache_mmap)
+    
+    text_store = TextStore(text_store_path)
+    profiler = Profiler(profile) if profile else None
+    tracer = SpanTracer(trace_file) if trace_file else None
+    if profiler or tracer:
+        def finish_profiling():
+            if tracer:
+                tracer.close()
+                console.print(f"[dim]Span timings written to {trace_file}[/dim]")
+            if profiler:
+                for report in profiler.stop():
+                    console.print(f"[dim]Profile written to {report}[/dim]")
+        
+        # Reports are written however the command returns
+        click.get_current_context().call_on_close(finish_profiling)
+        if profiler:
+            profiler.start()
+    
+    if from_snapshot:
+        if not dry_run:
+            console.print("[red]--from-snapshot can only be used with --dry-run[/red]")
+            return 1
+        organizer = SnapshotOrganizer(from_snapshot, pdf_backend=pdf_backend, profiler=profiler,
+                                      tracer=tracer, text_store=text_store)
+        stats = organizer.organize_statements(source_folder_id or organizer.source_folder_id,
+                                              dest_folder_id or organizer.dest_folder_id, dry_run,
+                                              duplicate_handling, order=order)
+        print_run_summary(organizer, stats)
+        return 0
+    
+    if jobs_manifest:
+        from config import DRIVE_REQUESTS_PER_SECOND
+        
+        try:
+            settings, jobs = load_job_manifest(jobs_manifest, dry_run=dry_run, workers=workers, order=order)
+        except (ValueError, json.JSONDecodeError) as e:
+            console.print(f"[red]Invalid jobs manifest: {e}[/red]")
+            return 1
+        
+        budget = requests_per_second or settings.get('requests_per_second', DRIVE_REQUESTS_PER_SECOND)
+        console.print(f"Running {len(jobs)} jobs with a shared budget of {budget} requests/second")
+        concurrency = (ConcurrencyController(adaptive_maximum(max(job.workers for job in jobs), max_workers))
+                       if adaptive_concurrency else None)
+        try:
+            results = run_jobs(jobs, budget, pdf_backend=pdf_backend, retry_failed=retry_failed, tracer=tracer,
+                               blob_cache=blob_cache, text_store=text_store, concurrency=concurrency)
+        except Exception as e:
+            console.print(f"[red]Failed to initialize: {e}[/red]")
+            return 1
+        
+        print_job_results(results)
+        if concurrency:
+            print_concurrency_report(concurrency)
+        return 1 if None in results.values() else 0
+    
     # Initialize organizer
     try:
-        organizer = GoogleDriveOrganizer(credentials_file)
+        rate_limiter = RateLimiter(requests_per_second) if requests_per_second else None
+        concurrency = ConcurrencyController(adaptive_maximum(workers, max_workers)) if adaptive_concurrency else None
+        organizer = GoogleDriveOrganizer(credentials_file, pdf_backend=pdf_backend, rate_limiter=rate_limiter,
+                                         profiler=profiler, tracer=tracer, blob_cache=blob_cache, text_store=text_store,
+                                         concurrency=concurrency)
+        organizer.negative_cache.retry_all = retry_failed
+        organizer.authenticate()
     except Exception as e:
         console.print(f"[red]Failed to initialize: {e}[/red]")
         return 1
-    
-    # Handle cache operations
-    if clear_cache:
-        organizer.file_mapping.clear_cache()
-        console.print("[green]✓ Cache cleared successfully[/green]")
-        return 0
-    
-    if export_cache:
-        export_file = organizer.file_mapping.export_mapping(export_cache)
-        console.print(f"[green]✓ Cache exported to {export_file}[/green]")
-        return 0
+    # Drive connections are closed however the command returns
+    click.get_current_context().call_on_close(organizer.close)
+    # The adaptive limits, not the pool, decide how many Drive requests run
+    pool_workers = concurrency.maximum if concurrency else workers
     
     # Handle folder operations
     if backup_folders:
         dest_folder_id = organizer.find_folder_by_name(statements_by_account)
         if dest_folder_id:
             backup_data = organizer.backup_folder_structure(dest_folder_id)
-            console.print(f"[green]✓ Backup created with {backup_data.get('total_folders', 0)} folders[/green]")
+            console.print(f"[green]✓ Backup created with {backup_data.get('total_folders', 0)} folders and {backup_data.get('total_files', 0)} files[/green]")
         return 0
     
     if analyze_duplicates:
@@ -1322,7 +2305,12 @@ def main(source_folder_id: str, dest_folder_id: str, credentials_file: str, dry_
         
         console.print(f"[bold yellow]Renaming {len(confirmed_renames)} folders with confirmed account numbers[/bold yellow]")
         
-        results = organizer.batch_rename_folders(confirmed_renames, dry_run=dry_run)
+        dest_folder_id = dest_folder_id or organizer.find_folder_by_name(statements_by_account)
+        if not dest_folder_id:
+            console.print(f"[red]Error: Could not find '{statements_by_account}' folder[/red]")
+            return 1
+        
+        results = organizer.batch_rename_folders(confirmed_renames, dry_run=dry_run, parent_folder_id=dest_folder_id)
         
         # Display results
         console.print(f"\n[bold blue]Rename Results:[/bold blue]")
@@ -1333,7 +2321,7 @@ def main(source_folder_id: str, dest_folder_id: str, credentials_file: str, dry_
         if results['failed']:
             console.print(f"\n[red]Failed folders:[/red]")
             for folder in results['failed']:
-                console.print(f"  • {folder}")
+                console.print(f"  • {folder}: {results['items'][folder]['reason']}")
         
         return 0
     
@@ -1352,33 +2340,47 @@ def main(source_folder_id: str, dest_folder_id: str, credentials_file: str, dry_
             console.print(f"[red]Could not find '{statements_by_account}' folder[/red]")
             return 1
     
-    # Organize statements
-    stats = organizer.organize_statements(source_folder_id, dest_folder_id, dry_run, duplicate_handling)
-    
-    # Display results
-    console.print(f"\n[bold blue]Organization Complete![/bold blue]")
-    
-    table = Table(title="Processing Results")
-    table.add_column("Metric", style="cyan")
-    table.add_column("Count", style="magenta")
+    if snapshot_out:
+        summary = organizer.write_run_snapshot(snapshot_out, source_folder_id, dest_folder_id)
+        console.print(f"[green]✓ Snapshot saved to {snapshot_out}: {summary['total_folders']} folders and "
+                      f"{summary['total_files']} files[/green]")
+        return 0
     
-    table.add_row("Total Files", str(stats['total_files']))
-    table.add_row("Processed", str(stats['processed']))
-    table.add_row("Copied", str(stats['copied']))
-    table.add_row("Skipped", str(stats['skipped']))
-    table.add_row("Unclassified", str(stats['unclassified']))
-    table.add_row("Errors", str(stats['errors']))
+    if estimate:
+        print_estimate(organizer.estimate_run(source_folder_id, dest_folder_id, workers))
+        return 0
     
-    console.print(table)
+    if watch:
+        watcher = DriveWatcher(organizer, source_folder_id, dest_folder_id, state_file=watch_state,
+                               interval=watch_interval, dry_run=dry_run, duplicate_handling=duplicate_handling,
+                               workers=pool_workers, order=order, log=console.print)
+        stats = watcher.run()
+        organizer.metrics.save()
+        console.print(f"Polls: {stats['polls']}, processed: {stats['processed']}, copied: {stats['copied']}, "
+                      f"unclassified: {stats['unclassified']}, deferred: {stats['deferred']}, errors: {stats['errors']}")
+        if concurrency:
+            print_concurrency_report(concurrency)
+        return 0
     
-    # Show cache statistics
-    cache_stats = organizer.file_mapping.get_cache_stats()
-    console.print(f"\n[bold blue]Cache Statistics:[/bold blue]")
-    console.print(f"📁 Total cached files: {cache_stats['total_cached_files']}")
-    console.print(f"✅ Classified files: {cache_stats['classified_files']}")
-    console.print(f"❓ Unclassified files: {cache_stats['unclassified_files']}")
-    console.print(f"💾 Cache file size: {cache_stats['cache_file_size']} bytes")
+    # Organize statements
+    if shard_db:
+        lease_store = LeaseStore(shard_db)
+        try:
+            stats = organizer.organize_sharded(source_folder_id, dest_folder_id, lease_store,
+                                               worker_id or default_worker_id(), dry_run, duplicate_handling,
+                                               workers=pool_workers, lease_seconds=lease_seconds, unit_size=unit_size,
+                                               order=order)
+        except ValueError as e:
+            console.print(f"[red]{e}[/red]")
+            return 1
+        finally:
+            lease_store.close()
+    else:
+        stats = organizer.organize_statements(source_folder_id, dest_folder_id, dry_run, duplicate_handling,
+                                              workers=pool_workers, order=order)
     
+    organizer.metrics.save()
+    print_run_summary(organizer, stats, blob_cache, concurrency)
     return 0
 
 
@@ -0,0 +1,109 @@
+"""
+Negative cache: files that failed to download, could not be parsed or could
+not be classified, and when to try them again.
+
+Entries are keyed by file ID and remember the file's md5 and the fingerprint
+of the classification patterns they failed under. A new file version or a
+pattern change makes the entry stale, so the file is tried again right away;
+otherwise the delay before the next attempt doubles with every failure.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import NEGATIVE_CACHE_RETRY_DELAYS, NEGATIVE_CACHE_MAX_DELAY, classification_fingerprint
+
+
+DEFAULT_RETRY_DELAY = 12 * 60 * 60
+
+
+class NegativeCache:
+    """Failed files with an exponential retry schedule."""
+
+    def __init__(self, cache_file: str = 'negative_cache.json', fingerprint: Optional[str] = None,
+                 retry_delays: Optional[Dict[str, float]] = None, max_delay: float = NEGATIVE_CACHE_MAX_DELAY):
+        self.cache_file = cache_file
+        self.fingerprint = fingerprint or classification_fingerprint()
+        self.retry_delays = retry_delays or NEGATIVE_CACHE_RETRY_DELAYS
+        self.max_delay = max_delay
+        self.retry_all = False
+        self._lock = threading.RLock()
+        self.entries = self._load_cache()
+
+    def _load_cache(self) -> Dict[str, Dict]:
+        """Load existing entries from file."""
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, 'r') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, IOError):
+                return {}
+        return {}
+
+    def _save_cache(self):
+        """Save entries to file."""
+        try:
+            with self._lock, open(self.cache_file, 'w') as f:
+                json.dump(self.entries, f, indent=2)
+        except IOError:
+            pass  # Fail silently if can't save
+
+    def _is_current(self, entry: Dict, md5: Optional[str]) -> bool:
+        """Check that an entry is for this file version and these patterns."""
+        return entry.get('md5') == md5 and entry.get('fingerprint') == self.fingerprint
+
+    def get_deferral(self, file_id: str, md5: Optional[str]) -> Optional[Dict]:
+        """Return the entry if the file should not be tried before its retry time, else None."""
+        if self.retry_all:
+            return None
+        entry = self.entries.get(file_id)
+        if entry is None or not self._is_current(entry, md5):
+            return None
+        return entry if time.time() < entry['retry_after'] else None
+
+    def record_failure(self, file_id: str, md5: Optional[str], reason: str, file_name: Optional[str] = None) -> Dict:
+        """Record a failed attempt and schedule the next one."""
+        with self._lock:
+            previous = self.entries.get(file_id)
+            failures = previous['failures'] + 1 if previous and self._is_current(previous, md5) else 1
+            delay = min(self.retry_delays.get(reason, DEFAULT_RETRY_DELAY) * 2 ** (failures - 1), self.max_delay)
+            now = time.time()
+
+            entry = {
+                'file_name': file_name,
+                'md5': md5,
+                'fingerprint': self.fingerprint,
+                'reason': reason,
+                'failures': failures,
+                'last_failed': datetime.fromtimestamp(now).isoformat(),
+                'retry_after': now + delay,
+            }
+            self.entries[file_id] = entry
+            self._save_cache()
+            return entry
+
+    def record_success(self, file_id: str):
+        """Forget earlier failures of a file that has now been processed."""
+        with self._lock:
+            if self.entries.pop(file_id, None) is not None:
+                self._save_cache()
+
+    def clear(self):
+        """Forget all failures."""
+        with self._lock:
+            self.entries = {}
+            self._save_cache()
+
+    def get_stats(self) -> Dict:
+        """Count current entries by failure reason, and how many are waiting to be retried."""
+        now = time.time()
+        stats = {'total': len(self.entries), 'waiting': 0, 'by_reason': {}}
+        for entry in list(self.entries.values()):
+            stats['by_reason'][entry['reason']] = stats['by_reason'].get(entry['reason'], 0) + 1
+            if entry.get('fingerprint') == self.fingerprint and now < entry['retry_after']:
+                stats['waiting'] += 1
+        return stats
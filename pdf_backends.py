@@ -0,0 +1,211 @@
+"""
+Interchangeable PDF text-extraction backends.
+
+PyPDF2 is the default and the only required backend. pypdf, pdfminer.six and
+pypdfium2 are used when they are installed.
+
+PDF content may be bytes or a read-only memory map of a cached file, which
+the backends read in place.
+"""
+
+import importlib.metadata
+import importlib.util
+import io
+import mmap
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def pdf_stream(pdf_content):
+    """Return a file object positioned at the start of the PDF content."""
+    if isinstance(pdf_content, mmap.mmap):
+        pdf_content.seek(0)
+        return pdf_content
+    return io.BytesIO(pdf_content)
+
+
+class PDFBackend(ABC):
+    """Base class for PDF text-extraction backends."""
+
+    name = None
+    module = None
+    distribution = None
+
+    def is_available(self) -> bool:
+        """Check whether the backend's library is installed."""
+        return importlib.util.find_spec(self.module) is not None
+
+    @property
+    def version(self) -> str:
+        """Backend name and library version, e.g. "pypdf2-3.0.1"; stored text is keyed by it."""
+        try:
+            return f"{self.name}-{importlib.metadata.version(self.distribution)}"
+        except importlib.metadata.PackageNotFoundError:
+            return self.name
+
+    @abstractmethod
+    def extract_text(self, pdf_content: bytes) -> str:
+        """Extract the text of every page, one page per line block."""
+
+
+class PyPDF2Backend(PDFBackend):
+    """Text extraction with PyPDF2."""
+
+    name = 'pypdf2'
+    distribution = 'PyPDF2'
+    module = 'PyPDF2'
+
+    def extract_text(self, pdf_content: bytes) -> str:
+        import PyPDF2
+
+        pdf_reader = PyPDF2.PdfReader(pdf_stream(pdf_content))
+        text = ""
+        for page in pdf_reader.pages:
+            text += page.extract_text() + "\n"
+        return text
+
+
+class PypdfBackend(PDFBackend):
+    """Text extraction with pypdf, the maintained successor of PyPDF2."""
+
+    name = 'pypdf'
+    distribution = 'pypdf'
+    module = 'pypdf'
+
+    def extract_text(self, pdf_content: bytes) -> str:
+        import pypdf
+
+        pdf_reader = pypdf.PdfReader(pdf_stream(pdf_content))
+        return "".join(page.extract_text() + "\n" for page in pdf_reader.pages)
+
+
+class PdfminerBackend(PDFBackend):
+    """Text extraction with pdfminer.six."""
+
+    name = 'pdfminer'
+    distribution = 'pdfminer.six'
+    module = 'pdfminer'
+
+    def extract_text(self, pdf_content: bytes) -> str:
+        from pdfminer.high_level import extract_text
+
+        return extract_text(pdf_stream(pdf_content))
+
+
+class Pypdfium2Backend(PDFBackend):
+    """Text extraction with pypdfium2 (PDFium bindings)."""
+
+    name = 'pypdfium2'
+    distribution = 'pypdfium2'
+    module = 'pypdfium2'
+
+    def extract_text(self, pdf_content: bytes) -> str:
+        import pypdfium2
+
+        pdf = pypdfium2.PdfDocument(pdf_content if isinstance(pdf_content, bytes) else pdf_stream(pdf_content))
+        try:
+            text = ""
+            for page in pdf:
+                text_page = page.get_textpage()
+                text += text_page.get_text_range() + "\n"
+                text_page.close()
+                page.close()
+            return text
+        finally:
+            pdf.close()
+
+
+BACKENDS: Dict[str, PDFBackend] = {
+    backend.name: backend
+    for backend in (PyPDF2Backend(), PypdfBackend(), PdfminerBackend(), Pypdfium2Backend())
+}
+
+DEFAULT_BACKEND = 'pypdf2'
+BACKEND_CHOICES = ['auto'] + list(BACKENDS)
+
+
+def available_backends() -> List[PDFBackend]:
+    """Return the installed backends, default first."""
+    return [backend for backend in BACKENDS.values() if backend.is_available()]
+
+
+def benchmark_backends(samples: Sequence[bytes], backends: Optional[Sequence[PDFBackend]] = None) -> List[Tuple[PDFBackend, float, int]]:
+    """
+    Time each backend on the sample PDFs.
+    Returns (backend, seconds, characters extracted) sorted fastest first;
+    backends that fail on a sample are left out.
+    """
+    results = []
+    for backend in backends if backends is not None else available_backends():
+        characters = 0
+        try:
+            # Import outside the timed section so library load time is not counted
+            importlib.import_module(backend.module)
+            started = time.perf_counter()
+            for sample in samples:
+                characters += len(backend.extract_text(sample).strip())
+        except Exception:
+            continue
+        results.append((backend, time.perf_counter() - started, characters))
+
+    results.sort(key=lambda result: result[1])
+    return results
+
+
+class PDFTextExtractor:
+    """Extracts PDF text with a preferred backend, falling back to the others on parse errors."""
+
+    def __init__(self, backend: str = DEFAULT_BACKEND):
+        if backend != 'auto' and backend not in BACKENDS:
+            raise ValueError(f"Unknown PDF backend '{backend}', choose from: {', '.join(BACKEND_CHOICES)}")
+        self.requested = backend
+        self.backend: Optional[PDFBackend] = None if backend == 'auto' else BACKENDS[backend]
+        self.benchmark: List[Tuple[PDFBackend, float, int]] = []
+        self._lock = threading.Lock()
+        self._versions: Dict[str, str] = {}
+
+    @property
+    def version(self) -> Optional[str]:
+        """Version of the preferred backend, or None while auto mode has not chosen one."""
+        if self.backend is None:
+            return None
+        if self.backend.name not in self._versions:
+            self._versions[self.backend.name] = self.backend.version
+        return self._versions[self.backend.name]
+
+    def select(self, samples: Sequence[bytes]) -> PDFBackend:
+        """Benchmark the installed backends and keep the fastest one that produces text."""
+        self.benchmark = benchmark_backends(samples)
+        producing = [backend for backend, _, characters in self.benchmark if characters]
+        if producing:
+            self.backend = producing[0]
+        elif self.benchmark:
+            self.backend = self.benchmark[0][0]
+        else:
+            self.backend = BACKENDS[DEFAULT_BACKEND]
+        return self.backend
+
+    def extract_text(self, pdf_content: bytes) -> str:
+        """Extract text, trying the other installed backends if the selected one cannot parse the PDF."""
+        if self.backend is None:
+            # In auto mode the first PDF seen is the benchmark sample
+            with self._lock:
+                if self.backend is None:
+                    self.select([pdf_content])
+
+        try:
+            return self.backend.extract_text(pdf_content)
+        except Exception as error:
+            last_error = error
+
+        for backend in available_backends():
+            if backend is self.backend:
+                continue
+            try:
+                return backend.extract_text(pdf_content)
+            except Exception as error:
+                last_error = error
+
+        raise last_error
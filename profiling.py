@@ -0,0 +1,218 @@
+"""
+Profiling hooks for organize runs.
+
+Profiler wraps a run in cProfile ("cpu") or tracemalloc ("mem") and writes
+its reports when stopped. SpanTracer writes the time each file spends in
+every pipeline stage as JSON lines, one line per span.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+
+
+PROFILE_MODES = ('cpu', 'mem')
+
+# Allocation sites and differences listed per memory snapshot
+MEMORY_TOP_LINES = 15
+
+
+def _function_label(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == '~':
+        return name  # Built-in
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(';', ',')
+
+
+def collapsed_stacks(stats: pstats.Stats, max_depth: int = 40, min_fraction: float = 0.001) -> Dict[str, int]:
+    """
+    Build flamegraph input ("a;b;c microseconds") from profile statistics.
+    cProfile only records caller/callee pairs, so the stacks are reconstructed:
+    a function's own time is split over its callers in proportion to the time
+    spent through each, and recursion is cut at the first repeated function.
+    """
+    entries = stats.stats
+    memo: Dict[Tuple, Dict[Tuple, float]] = {}
+
+    def paths(func, active) -> Dict[Tuple, float]:
+        if func in memo:
+            return memo[func]
+        callers = {caller: edge for caller, edge in entries[func][4].items()
+                   if caller in entries and caller not in active}
+        total = sum(edge[3] for edge in callers.values())
+        result: Dict[Tuple, float] = {}
+        if callers and total > 0 and len(active) < max_depth:
+            for caller, edge in callers.items():
+                share = edge[3] / total
+                for stack, fraction in paths(caller, active | {func}).items():
+                    if fraction * share >= min_fraction:
+                        result[stack + (func,)] = result.get(stack + (func,), 0.0) + fraction * share
+        if not result:
+            result = {(func,): 1.0}
+        memo[func] = result
+        return result
+
+    folded: Dict[str, int] = {}
+    for func, (_, _, own_time, _, _) in entries.items():
+        if own_time <= 0:
+            continue
+        for stack, fraction in paths(func, frozenset()).items():
+            weight = int(own_time * fraction * 1_000_000)
+            if weight:
+                line = ';'.join(_function_label(f) for f in stack)
+                folded[line] = folded.get(line, 0) + weight
+    return folded
+
+
+class Profiler:
+    """
+    CPU or memory profile of a run. Use as a context manager, or call start()
+    and stop(). stage() marks a boundary in the run; in "mem" mode it takes a
+    tracemalloc snapshot there.
+    """
+
+    def __init__(self, mode: str, output_prefix: Optional[str] = None):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode}; choose from: {', '.join(PROFILE_MODES)}")
+        self.mode = mode
+        self.output_prefix = output_prefix or f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        self._lock = threading.Lock()
+        self._profiles: List[cProfile.Profile] = []
+        self._snapshots: List[Tuple[str, tracemalloc.Snapshot, Tuple[int, int]]] = []
+        self.running = False
+
+    def __enter__(self) -> 'Profiler':
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _profile_thread(self, frame, event, arg):
+        # Installed with threading.setprofile: gives each new thread its own profile
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        try:
+            profile.enable()
+        except ValueError:
+            sys.setprofile(None)  # The interpreter already profiles every thread
+
+    def start(self):
+        """Start profiling the current thread and threads started from now on."""
+        if self.mode == 'cpu':
+            profile = cProfile.Profile()
+            self._profiles.append(profile)
+            threading.setprofile(self._profile_thread)
+            profile.enable()
+        else:
+            tracemalloc.start(25)
+        self.running = True
+
+    def stage(self, name: str):
+        """Mark the end of a stage of the run."""
+        if self.running and self.mode == 'mem':
+            self._snapshots.append((name, tracemalloc.take_snapshot(), tracemalloc.get_traced_memory()))
+
+    def stop(self) -> List[str]:
+        """Stop profiling and write the reports. Returns the files written."""
+        if not self.running:
+            return []
+        if self.mode == 'cpu':
+            threading.setprofile(None)
+            with self._lock:
+                for profile in self._profiles:
+                    profile.disable()
+            self.running = False
+            return self._write_cpu_reports()
+
+        self.stage('end')
+        tracemalloc.stop()
+        self.running = False
+        return [self._write_memory_report()]
+
+    def _write_cpu_reports(self) -> List[str]:
+        stats = pstats.Stats(*self._profiles)
+        stats_file = f'{self.output_prefix}.pstats'
+        stats.dump_stats(stats_file)
+
+        stacks_file = f'{self.output_prefix}.collapsed'
+        with open(stacks_file, 'w') as f:
+            for stack, weight in sorted(collapsed_stacks(stats).items()):
+                f.write(f'{stack} {weight}\n')
+        return [stats_file, stacks_file]
+
+    def _write_memory_report(self) -> str:
+        report_file = f'{self.output_prefix}.mem.txt'
+        previous = None
+        with open(report_file, 'w') as f:
+            for name, snapshot, (current, peak) in self._snapshots:
+                f.write(f"== {name}: {current / 1024 / 1024:.1f} MB traced, peak {peak / 1024 / 1024:.1f} MB\n")
+                f.write("Largest allocation sites:\n")
+                for stat in snapshot.statistics('lineno')[:MEMORY_TOP_LINES]:
+                    f.write(f"  {stat}\n")
+                if previous is not None:
+                    f.write("Largest changes since the previous stage:\n")
+                    for stat in snapshot.compare_to(previous, 'lineno')[:MEMORY_TOP_LINES]:
+                        f.write(f"  {stat}\n")
+                f.write("\n")
+                previous = snapshot
+        return report_file
+
+
+class SpanTracer:
+    """
+    Writes per-file stage timings as JSON lines. Spans opened while a file is
+    being processed on the same thread are attributed to that file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._out = open(path, 'a', buffering=1)
+
+    def close(self):
+        with self._lock:
+            self._out.close()
+
+    @contextmanager
+    def file(self, file: Mapping) -> Iterator[None]:
+        """Attribute the spans opened inside this block to file."""
+        previous = getattr(self._local, 'file', None)
+        self._local.file = file
+        try:
+            yield
+        finally:
+            self._local.file = previous
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[Dict]:
+        """Time a stage. Fields added to the yielded dict are written with the span."""
+        fields: Dict = {}
+        file = getattr(self._local, 'file', None)
+        started = time.time()
+        start = time.perf_counter()
+        try:
+            yield fields
+        finally:
+            record = {
+                'span': name,
+                'file_id': file['id'] if file is not None else None,
+                'file_name': file['name'] if file is not None else None,
+                'start': round(started, 6),
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                'thread': threading.current_thread().name,
+            }
+            record.update(fields)
+            with self._lock:
+                if not self._out.closed:
+                    self._out.write(json.dumps(record) + '\n')
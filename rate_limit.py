@@ -0,0 +1,45 @@
+"""
+Request budget shared by every Drive client in the process.
+"""
+
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """Token bucket limiting the request rate across all threads and jobs."""
+
+    def __init__(self, requests_per_second: float, burst: Optional[int] = None):
+        if requests_per_second <= 0:
+            raise ValueError('requests_per_second must be positive')
+        self.rate = requests_per_second
+        self.capacity = burst or max(1, int(requests_per_second))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.waited = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, requests: int = 1):
+        """
+        Block until the budget allows the given number of requests.
+        Waiting callers hold the lock, so they are served in arrival order; a
+        request larger than the burst (e.g. an HTTP batch) is admitted once the
+        bucket is full and its excess is paid back by the following callers.
+        """
+        with self._lock:
+            self._refill()
+            needed = min(requests, self.capacity)
+            if self._tokens < needed:
+                delay = (needed - self._tokens) / self.rate
+                time.sleep(delay)
+                self.waited += delay
+                self._refill()
+            self._tokens -= requests
+            self.requests += requests
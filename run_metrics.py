@@ -0,0 +1,153 @@
+"""
+Per-operation cost measurements and the --estimate cost model.
+
+Every Drive request, download and PDF parse of a run is timed by operation
+(the API method, e.g. drive.files.copy, or "download" and "extract"). At the
+end of a run the totals are added to run_metrics.json. --estimate divides
+those totals into average costs and multiplies them by the work a run would
+do.
+"""
+
+import json
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import ESTIMATE_DEFAULT_COSTS
+
+
+# Default chunk size of MediaIoBaseDownload; larger files take one request per chunk
+DOWNLOAD_CHUNK_BYTES = 100 * 1024 * 1024
+
+MUTATION_METHODS = ('copy', 'create', 'update', 'delete', 'batch')
+
+
+def operation_kind(operation: str) -> str:
+    """Classify an operation as 'media', 'mutation' or 'metadata'."""
+    if operation == 'download' or operation.endswith('get_media'):
+        return 'media'
+    if operation.rsplit('.', 1)[-1] in MUTATION_METHODS:
+        return 'mutation'
+    return 'metadata'
+
+
+class RunMetrics:
+    """Counts, time and bytes per operation for one run, saved into a cumulative history."""
+
+    def __init__(self, metrics_file: str = 'run_metrics.json'):
+        self.metrics_file = metrics_file
+        self._lock = threading.Lock()
+        self.operations: Dict[str, Dict[str, float]] = {}
+
+    def record(self, operation: str, seconds: float, size: int = 0):
+        """Record one operation that took seconds and transferred size bytes."""
+        with self._lock:
+            totals = self.operations.setdefault(operation, {'count': 0, 'seconds': 0.0, 'bytes': 0})
+            totals['count'] += 1
+            totals['seconds'] += seconds
+            totals['bytes'] += size
+
+    def count(self, kind: Optional[str] = None) -> int:
+        """Number of operations recorded in this run, optionally of one kind."""
+        with self._lock:
+            return sum(int(totals['count']) for operation, totals in self.operations.items()
+                       if kind is None or operation_kind(operation) == kind)
+
+    def load_history(self) -> Dict:
+        """Return the saved totals of previous runs."""
+        if os.path.exists(self.metrics_file):
+            try:
+                with open(self.metrics_file, 'r') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, IOError):
+                pass
+        return {'runs': 0, 'operations': {}}
+
+    def save(self):
+        """Add this run's totals to the history file."""
+        with self._lock:
+            if not self.operations:
+                return
+            history = self.load_history()
+            for operation, totals in self.operations.items():
+                saved = history['operations'].setdefault(operation, {'count': 0, 'seconds': 0.0, 'bytes': 0})
+                for field, value in totals.items():
+                    saved[field] += value
+            history['runs'] += 1
+            history['updated_at'] = datetime.now().isoformat()
+            self.operations = {}
+
+        temp_file = f'{self.metrics_file}.tmp'
+        try:
+            with open(temp_file, 'w') as f:
+                json.dump(history, f, indent=2)
+            os.replace(temp_file, self.metrics_file)
+        except IOError:
+            pass  # Fail silently if can't save
+
+
+def average_costs(history: Dict) -> Dict[str, float]:
+    """
+    Average cost per operation kind from the history, falling back to the
+    defaults in config.py for kinds that were never measured.
+    """
+    costs = dict(ESTIMATE_DEFAULT_COSTS)
+    measured = set()
+    by_kind: Dict[str, Dict[str, float]] = {}
+    for operation, totals in history.get('operations', {}).items():
+        if not totals.get('count'):
+            continue
+        key = operation if operation in ('download', 'extract') else operation_kind(operation)
+        kind = by_kind.setdefault(key, {'count': 0, 'seconds': 0.0, 'bytes': 0})
+        for field in kind:
+            kind[field] += totals.get(field, 0)
+
+    for key, totals in by_kind.items():
+        if key == 'download':
+            if totals['bytes'] and totals['seconds']:
+                costs['download_bytes_per_second'] = totals['bytes'] / totals['seconds']
+                measured.add('download_bytes_per_second')
+        elif key in ('extract', 'metadata', 'mutation'):
+            costs[f'{key}_seconds'] = totals['seconds'] / totals['count']
+            measured.add(f'{key}_seconds')
+
+    costs['measured'] = sorted(measured)
+    return costs
+
+
+def estimate_run_costs(counts: Dict[str, int], costs: Dict[str, float], workers: int = 1,
+                       requests_per_second: Optional[float] = None) -> Dict:
+    """
+    Project Drive requests, bytes and wall time for the work in counts
+    (see GoogleDriveOrganizer.count_run_work). Network time is shared by the
+    workers and limited by the request budget. PDF parsing holds the GIL, so
+    it takes the same time for any number of worker threads.
+    """
+    download_requests = sum(max(1, math.ceil(size / DOWNLOAD_CHUNK_BYTES)) for size in counts['download_sizes'])
+    metadata_calls = counts['listing_calls'] + counts['target_folders'] + counts['new_folders']
+    mutation_calls = counts['copies'] + counts['new_folders']
+    api_calls = metadata_calls + mutation_calls + download_requests
+    download_bytes = sum(counts['download_sizes'])
+
+    network_seconds = (metadata_calls * costs['metadata_seconds']
+                       + mutation_calls * costs['mutation_seconds']
+                       + download_bytes / costs['download_bytes_per_second'])
+    parse_seconds = counts['parses'] * costs['extract_seconds']
+    budget_seconds = api_calls / requests_per_second if requests_per_second else 0.0
+    seconds = max(network_seconds / max(workers, 1), budget_seconds, parse_seconds)
+
+    return {
+        'api_calls': api_calls,
+        'metadata_calls': metadata_calls,
+        'mutation_calls': mutation_calls,
+        'download_requests': download_requests,
+        'download_bytes': download_bytes,
+        'network_seconds': network_seconds,
+        'parse_seconds': parse_seconds,
+        'budget_seconds': budget_seconds,
+        'seconds': seconds,
+        'bottleneck': max((('network', network_seconds / max(workers, 1)), ('request budget', budget_seconds),
+                           ('PDF parsing', parse_seconds)), key=lambda item: item[1])[0],
+    }
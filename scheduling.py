@@ -0,0 +1,77 @@
+"""
+Processing order for the files of an organize run.
+
+Each ordering maps a file to a sort key, smaller first. Orderings can be
+combined, e.g. "cached,newest" processes cache hits first and the newest files
+first within each group. Files that tie keep their listing order.
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+# key(file, context) -> sortable value; context provides is_cached(file) and is_classifiable(file)
+Ordering = Callable[[Dict, object], object]
+
+ORDERINGS: Dict[str, Ordering] = {}
+
+MISSING = float('inf')
+
+
+def register_ordering(name: str, key: Ordering):
+    """Make an ordering available to --order."""
+    ORDERINGS[name] = key
+
+
+def _modified_timestamp(file: Dict) -> float:
+    modified = file.get('modifiedTime')
+    if not modified:
+        return MISSING
+    try:
+        return datetime.fromisoformat(modified.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return MISSING
+
+
+def newest_first(file: Dict, context) -> float:
+    """Most recently modified files first; files without a date last."""
+    timestamp = _modified_timestamp(file)
+    return -timestamp if timestamp != MISSING else MISSING
+
+
+def smallest_first(file: Dict, context) -> float:
+    """Smallest files first; files without a size (e.g. Google Docs) last."""
+    try:
+        return int(file['size'])
+    except (KeyError, TypeError, ValueError):
+        return MISSING
+
+
+def cached_first(file: Dict, context) -> int:
+    """Cache hits first, then files classifiable from their name alone, then the rest."""
+    if context.is_cached(file):
+        return 0
+    if context.is_classifiable(file):
+        return 1
+    return 2
+
+
+register_ordering('newest', newest_first)
+register_ordering('smallest', smallest_first)
+register_ordering('cached', cached_first)
+
+
+def parse_order(order: Optional[str]) -> List[str]:
+    """Split a comma-separated list of ordering names, rejecting unknown ones."""
+    names = [name.strip() for name in (order or '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in ORDERINGS]
+    if unknown:
+        raise ValueError(f"Unknown ordering {', '.join(unknown)}; choose from: {', '.join(ORDERINGS)}")
+    return names
+
+
+def schedule_files(files: List[Dict], order: Sequence[str], context=None) -> List[Dict]:
+    """Return the files in processing order. An empty order keeps the listing order."""
+    if not order:
+        return list(files)
+    keys = [ORDERINGS[name] for name in order]
+    return sorted(files, key=lambda file: tuple(key(file, context) for key in keys))
@@ -0,0 +1,63 @@
+"""
+Single-flight calls: concurrent callers asking for the same key share one
+in-flight call, and its result is remembered for later callers.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+
+class _Call:
+    """One in-flight call and its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs a call at most once per key at a time and memoizes its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results: Dict[Hashable, Any] = {}
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, function: Callable[[], Any], cache_none: bool = False) -> Any:
+        """
+        Return the memoized result for key, wait for the call already running
+        for it, or run function. Errors are passed to every waiting caller and
+        are not memoized; neither are None results unless cache_none is set.
+        """
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = function()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None and (call.result is not None or cache_none):
+                    self._results[key] = call.result
+            call.done.set()
+        return call.result
+
+    def forget(self, key: Hashable):
+        """Drop a memoized result so the next call runs again."""
+        with self._lock:
+            self._results.pop(key, None)
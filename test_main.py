@@ -5,11 +5,46 @@ Tests for Google Drive Statement Organizer
 
 import unittest
 from unittest.mock import Mock, patch, MagicMock
+import csv
+import hashlib
+import json
 import tempfile
+import threading
+import time
 import os
+import base64
+import socket
+import stat
 import io
+import re
 
 from main import GoogleDriveOrganizer
+from file_mapping import FileMapping
+from folder_index import FolderContentsIndex, normalize_base_name
+from account_extractor import AccountExtractor, TEXT_EXTRACTOR, FILENAME_EXTRACTOR, luhn_valid
+from config import ACCOUNT_PATTERNS, TEXT_ACCOUNT_PATTERNS
+from drive_transport import DriveTransport, SharedCredentials
+from pdf_backends import PDFBackend, PDFTextExtractor
+from snapshot import walk_drive_tree, write_snapshot, read_snapshot, diff_snapshots
+from rate_limit import RateLimiter
+from job_manifest import load_job_manifest
+from work_leases import LeaseStore
+from scheduling import parse_order, schedule_files
+from watcher import DriveWatcher
+from negative_cache import NegativeCache
+from single_flight import SingleFlight
+from drive_file import DriveFile
+from profiling import Profiler, SpanTracer
+from blob_cache import BlobCache
+from text_store import TextStore
+from folder_matcher import FolderMatcher
+from main import reclassify_cache, SnapshotOrganizer
+import local_source
+from local_source import LocalDirectorySource, StatementSource, classify_local_file, classify_local_files
+from run_metrics import RunMetrics, average_costs, estimate_run_costs
+from concurrency import AdaptiveLimit, ConcurrencyController, adaptive_maximum
+from classify_service import ClassificationService, create_server, parse_address, shutdown_server
+from googleapiclient.errors import HttpError
 
 
 class TestGoogleDriveOrganizer(unittest.TestCase):
@@ -17,9 +52,12 @@ class TestGoogleDriveOrganizer(unittest.TestCase):
     
     def setUp(self):
         """Set up test fixtures."""
+        # Keep the classification cache out of the working tree
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
         # Mock the authentication to avoid requiring real credentials
         with patch.object(GoogleDriveOrganizer, 'authenticate'):
-            self.organizer = GoogleDriveOrganizer()
+            self.organizer = GoogleDriveOrganizer(file_mapping=FileMapping(os.path.join(self.tmp.name, 'mapping.json')))
             self.organizer.service = Mock()
     
     def test_classify_file_bank_statement(self):
@@ -137,9 +175,12 @@ class TestFileClassification(unittest.TestCase):
     
     def setUp(self):
         """Set up test fixtures."""
+        # Keep the classification cache out of the working tree
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
         # Mock the authentication to avoid requiring real credentials
         with patch.object(GoogleDriveOrganizer, 'authenticate'):
-            self.organizer = GoogleDriveOrganizer()
+            self.organizer = GoogleDriveOrganizer(file_mapping=FileMapping(os.path.join(self.tmp.name, 'mapping.json')))
     
     def test_company_patterns(self):
         """Test various company name patterns."""
@@ -185,5 +226,1927 @@ class TestFileClassification(unittest.TestCase):
         self.assertIsNotNone(statement_type, f"Statement type should be found for {filename}")
 
 
+class TestFolderContentsIndex(unittest.TestCase):
+    """Test cases for the destination folder index."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.index = FolderContentsIndex([
+            {'id': 'a', 'name': 'chase_statement_2024-01-15.pdf', 'md5Checksum': 'md5a'},
+            {'id': 'b', 'name': 'chase_statement_20240215.pdf', 'md5Checksum': 'md5b'},
+            {'id': 'c', 'name': 'chase.pdf'},
+            {'id': 'd', 'name': 'amex_statement.pdf'},
+        ])
+    
+    def test_normalize_base_name(self):
+        """Test that extensions and date suffixes are stripped."""
+        self.assertEqual(normalize_base_name('Chase_Statement_2024-01-15.pdf'), 'chase_statement')
+        self.assertEqual(normalize_base_name('Chase_Statement_20240115.PDF'), 'chase_statement')
+    
+    def test_find_similar(self):
+        """Test exact, prefix and extension matches on normalized base names."""
+        similar = {f['id'] for f in self.index.find_similar('CHASE_statement.pdf')}
+        self.assertEqual(similar, {'a', 'b', 'c'})
+        
+        similar = {f['id'] for f in self.index.find_similar('chase_statement_2024-03-15.pdf', exclude_id='a')}
+        self.assertEqual(similar, {'b', 'c'})
+    
+    def test_add_updates_lookups(self):
+        """Test that copied files become visible to later lookups."""
+        self.assertFalse(self.index.has_name('amex_statement (1).pdf'))
+        self.index.add({'id': 'e', 'name': 'amex_statement (1).pdf', 'md5Checksum': 'md5e'})
+        
+        self.assertTrue(self.index.has_name('amex_statement (1).pdf'))
+        self.assertEqual(self.index.find_by_md5('md5e')[0]['id'], 'e')
+        self.assertEqual({f['id'] for f in self.index.find_similar('amex_statement.pdf')}, {'d', 'e'})
+    
+    def test_check_for_duplicates_uses_single_listing(self):
+        """Test that duplicate checks list the destination folder only once."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizer = GoogleDriveOrganizer()
+        organizer.service = MagicMock()
+        organizer.service.files().get().execute.return_value = {'size': '10', 'md5Checksum': 'md5a'}
+        organizer.service.files().list().execute.return_value = {
+            'files': [{'id': 'a', 'name': 'chase_statement_2024-01-15.pdf', 'md5Checksum': 'md5a'}]
+        }
+        organizer.service.files().list.reset_mock()
+        
+        first = organizer.check_for_duplicates('x', 'dest', 'chase_statement_2024-01-15.pdf')
+        second = organizer.check_for_duplicates('y', 'dest', 'chase_statement_2024-02-15.pdf')
+        
+        self.assertEqual(first['recommended_action'], 'skip')
+        self.assertEqual(len(second['similar_filename']), 1)
+        self.assertEqual(organizer.service.files().list.call_count, 1)
+
+
+class TestBatchRenameFolders(unittest.TestCase):
+    """Test cases for batched folder renaming."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            self.organizer = GoogleDriveOrganizer()
+        self.organizer.service = MagicMock()
+        self.organizer.service.files().list().execute.return_value = {
+            'files': [
+                {'id': '1', 'name': 'Chase Freedom Card'},
+                {'id': '2', 'name': 'SoFi Money'},
+                {'id': '3', 'name': 'SoFi Money -20516'},
+                {'id': '4', 'name': 'Wise'},
+                {'id': '5', 'name': 'Wise -18903'},
+            ]
+        }
+        self.mapping = {
+            'Chase Freedom Card': 'Chase Freedom Card -64649',
+            'SoFi Money': 'SoFi Money -20516',
+            'Wise -18903': 'Wise -18903',
+            'Missing Folder': 'Missing Folder -1',
+        }
+    
+    def test_plan_detects_collisions_and_noops(self):
+        """Test that renames are resolved locally with collisions flagged up front."""
+        folders = self.organizer.list_child_folders('parent')
+        plan = self.organizer.plan_folder_renames(self.mapping, folders)
+        
+        self.assertEqual(plan['Chase Freedom Card']['status'], 'pending')
+        self.assertEqual(plan['Chase Freedom Card']['folder_id'], '1')
+        self.assertEqual(plan['SoFi Money']['status'], 'failed')
+        self.assertEqual(plan['Wise -18903']['status'], 'skipped')
+        self.assertEqual(plan['Missing Folder']['reason'], 'Folder not found')
+    
+    def test_batch_rename_submits_single_batch(self):
+        """Test that pending renames are sent as one batch after a single listing."""
+        batch = MagicMock()
+        
+        def new_batch(callback):
+            batch.execute.side_effect = lambda: callback('0', {'id': '1'}, None)
+            return batch
+        
+        self.organizer.service.new_batch_http_request.side_effect = new_batch
+        self.organizer.service.files().list.reset_mock()
+        
+        results = self.organizer.batch_rename_folders(self.mapping, dry_run=False, parent_folder_id='parent')
+        
+        self.assertEqual(self.organizer.service.files().list.call_count, 1)
+        self.assertEqual(batch.add.call_count, 1)
+        self.assertEqual(results['success'], ['Chase Freedom Card'])
+        self.assertEqual(results['failed'], ['SoFi Money'])
+        self.assertEqual(sorted(results['skipped']), ['Missing Folder', 'Wise -18903'])
+    
+    def test_rate_limited_and_server_errors_are_retried(self):
+        """Test that renames rejected with 429 or 5xx are sent again and other errors are not."""
+        outcomes = [HttpError(Mock(status=429, reason='Too Many Requests'), b''),
+                    HttpError(Mock(status=503, reason='Backend Error'), b''),
+                    None]
+        batches = []
+        
+        def new_batch(callback):
+            batch = MagicMock()
+            batch.execute.side_effect = lambda: callback('0', {'id': '1'}, outcomes.pop(0))
+            batches.append(batch)
+            return batch
+        
+        self.organizer.service.new_batch_http_request.side_effect = new_batch
+        with patch('main.time.sleep') as sleep:
+            results = self.organizer.batch_rename_folders(self.mapping, dry_run=False, parent_folder_id='parent')
+        
+        self.assertEqual(results['success'], ['Chase Freedom Card'])
+        self.assertEqual(len(batches), 3)
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [1.0, 2.0])
+        self.assertEqual(self.organizer.metrics.operations['drive.batch']['count'], 3)
+        
+        outcomes[:] = [HttpError(Mock(status=403, reason='Forbidden'), b'insufficientPermissions')]
+        batches.clear()
+        results = self.organizer.batch_rename_folders(self.mapping, dry_run=False, parent_folder_id='parent')
+        self.assertEqual(results['failed'], ['Chase Freedom Card', 'SoFi Money'])
+        self.assertEqual(len(batches), 1)
+
+
+class TestSnapshots(unittest.TestCase):
+    """Test cases for folder snapshots."""
+    
+    def test_walk_follows_pages_and_subfolders(self):
+        """Test that the walk paginates and descends into subfolders."""
+        pages = {
+            ('root', None): {'files': [{'id': 'f1', 'name': 'Chase', 'mimeType': 'application/vnd.google-apps.folder'}],
+                             'nextPageToken': 'p2'},
+            ('root', 'p2'): {'files': [{'id': 'a', 'name': 'a.pdf', 'mimeType': 'application/pdf'}]},
+            ('f1', None): {'files': [{'id': 'b', 'name': 'b.pdf', 'mimeType': 'application/pdf'}]},
+        }
+        service = Mock()
+        
+        def list_files(q, pageToken=None, **kwargs):
+            request = Mock()
+            request.execute.return_value = pages[(q.split("'")[1], pageToken)]
+            return request
+        
+        service.files().list.side_effect = list_files
+        
+        ids = [record['id'] for record in walk_drive_tree(service, 'root')]
+        self.assertEqual(ids, ['f1', 'a', 'b'])
+    
+    def test_write_read_and_diff(self):
+        """Test snapshot round trip and diff categories."""
+        old = [
+            {'id': 'a', 'name': 'a.pdf', 'parents': ['x']},
+            {'id': 'b', 'name': 'b.pdf', 'parents': ['x']},
+            {'id': 'c', 'name': 'c.pdf', 'parents': ['x']},
+        ]
+        new = [
+            {'id': 'a', 'name': 'a.pdf', 'parents': ['y']},
+            {'id': 'b', 'name': 'b2.pdf', 'parents': ['x']},
+            {'id': 'd', 'name': 'd.pdf', 'parents': ['x']},
+        ]
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            old_path = os.path.join(tmp, 'old.jsonl.gz')
+            new_path = os.path.join(tmp, 'new.jsonl.gz')
+            summary = write_snapshot(old_path, old, 'x')
+            write_snapshot(new_path, new, 'x')
+            
+            self.assertEqual(summary['total_files'], 3)
+            header, old_records = read_snapshot(old_path)
+            _, new_records = read_snapshot(new_path)
+        
+        self.assertEqual(header['root_id'], 'x')
+        diff = diff_snapshots(old_records, new_records)
+        self.assertEqual([r['id'] for r in diff['added']], ['d'])
+        self.assertEqual([r['id'] for r in diff['removed']], ['c'])
+        self.assertEqual([m['id'] for m in diff['moved']], ['a'])
+        self.assertEqual([r['new_name'] for r in diff['renamed']], ['b2.pdf'])
+
+
+class TestAccountExtractor(unittest.TestCase):
+    """Test cases for the ranked account extractor."""
+    
+    def test_ranked_candidates(self):
+        """Test that candidates are ranked by pattern priority before position."""
+        text = "Card ending in 4321. Account number: 12345678"
+        candidates = TEXT_EXTRACTOR.extract(text)
+        
+        self.assertEqual([c.value for c in candidates], ['12345678', '4321'])
+        self.assertEqual(TEXT_EXTRACTOR.best(text), '12345678')
+    
+    def test_rejects_invalid_candidates(self):
+        """Test all-same-digit and Luhn rejection."""
+        self.assertEqual(TEXT_EXTRACTOR.best("acct # 55555555 acct: 12345"), '12345')
+        self.assertTrue(luhn_valid('4111111111111111'))
+        self.assertEqual(FILENAME_EXTRACTOR.best('card 4111-1111-1111-1111.pdf'), '4111-1111-1111-1111')
+    
+    def test_best_is_first_match_of_first_matching_pattern(self):
+        """Test that skipping patterns by their literal prefix keeps the per-pattern search result."""
+        def first_match(patterns, text):
+            for pattern in patterns:
+                match = re.search(pattern, text, re.IGNORECASE)
+                if match:
+                    return match.group(1)
+            return None
+        
+        names = ['Chase Account_1234-5678.pdf', 'amex #98765 Jan.pdf', 'SoFi ENDING 2051.pdf', 'last4 4321.pdf',
+                 'Fidelity Brokerage X12-345.pdf', 'wise savings 18903 and checking 20516.pdf', 'statement.pdf',
+                 'lastname ending 7641 account 42.pdf']
+        texts = ['Account Number: 000123456789', 'ACCT. NO 55512345', 'Card ending in 4321. Account number: 12345678',
+                 'xxxx-xxxx-xxxx-9876 due', 'Routing 021000021 reference 1234-567890', 'ending: 987',
+                 'Statement period January 2024', 'Your checking account 123456-78 ending']
+        for name in names:
+            with self.subTest(name=name):
+                self.assertEqual(FILENAME_EXTRACTOR.best(name), first_match(ACCOUNT_PATTERNS, name))
+        for text in texts:
+            with self.subTest(text=text):
+                self.assertEqual(TEXT_EXTRACTOR.best(text), first_match(TEXT_ACCOUNT_PATTERNS, text))
+        self.assertIsNone(FILENAME_EXTRACTOR.best('card 4111-1111-1111-1112.pdf'))
+    
+    def test_overlapping_patterns(self):
+        """Test that patterns overlapping the same text are all considered."""
+        extractor = AccountExtractor([r'(\d{4})-\d{4}', r'-(\d{4})'])
+        self.assertEqual([c.value for c in extractor.extract('1234-5678')], ['1234', '5678'])
+    
+    def test_classify_parses_pdf_once(self):
+        """Test that classification extracts PDF text at most once."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizer = GoogleDriveOrganizer()
+        with patch.object(organizer, 'extract_text_from_pdf', return_value="Chase checking statement\nCard ending 4321") as extract:
+            company, statement_type, account_info = organizer.classify_file('scan.pdf', b'%PDF')
+        
+        self.assertEqual(extract.call_count, 1)
+        self.assertEqual(company, 'chase')
+        self.assertEqual(account_info, '4321')
+
+
+class TestLazyStartup(unittest.TestCase):
+    """Test cases for lazy authentication and local-only commands."""
+    
+    def test_service_authenticates_on_first_use(self):
+        """Test that constructing the organizer does not authenticate."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate') as authenticate:
+            organizer = GoogleDriveOrganizer()
+            self.assertFalse(authenticate.called)
+            
+            authenticate.side_effect = lambda: setattr(organizer, 'service', Mock())
+            organizer.service.files()
+            organizer.service.files()
+            self.assertEqual(authenticate.call_count, 1)
+    
+    def test_cache_commands_skip_authentication(self):
+        """Test that cache-only commands run without credentials."""
+        from click.testing import CliRunner
+        import main as main_module
+        
+        runner = CliRunner()
+        with runner.isolated_filesystem(), \
+                patch.object(GoogleDriveOrganizer, 'authenticate', side_effect=AssertionError('authenticated')):
+            result = runner.invoke(main_module.main, ['--export-cache', 'export.json'])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertTrue(os.path.exists('export.json'))
+            
+            result = runner.invoke(main_module.main, ['--clear-cache'])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn('Cache cleared', result.output)
+
+
+class FakeCredentials:
+    """Minimal google.auth-style credentials for transport tests."""
+    
+    def __init__(self):
+        self.token = 'token-0'
+        self.valid = True
+        self.refreshes = 0
+    
+    def refresh(self, request):
+        time.sleep(0.01)
+        self.refreshes += 1
+        self.token = f'token-{self.refreshes}'
+        self.valid = True
+    
+    def apply(self, headers):
+        headers['authorization'] = f'Bearer {self.token}'
+
+
+class TestDriveTransport(unittest.TestCase):
+    """Test cases for the thread-safe Drive transport."""
+    
+    def test_concurrent_expiry_refreshes_once(self):
+        """Test that many threads seeing an expired token cause one refresh."""
+        credentials = FakeCredentials()
+        credentials.valid = False
+        shared = SharedCredentials(credentials)
+        headers = [{} for _ in range(8)]
+        
+        threads = [threading.Thread(target=shared.before_request, args=(None, 'GET', 'uri', h)) for h in headers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(credentials.refreshes, 1)
+        self.assertTrue(all(h['authorization'] == 'Bearer token-1' for h in headers))
+    
+    def test_concurrent_unauthorized_refreshes_once(self):
+        """Test that 401 responses for the same stale token cause one refresh."""
+        credentials = FakeCredentials()
+        shared = SharedCredentials(credentials)
+        barrier = threading.Barrier(4)
+        
+        def worker():
+            shared.before_request(None, 'GET', 'uri', {})
+            barrier.wait()
+            shared.refresh(None)
+        
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(credentials.refreshes, 1)
+    
+    def test_service_per_thread(self):
+        """Test that each thread gets its own client and the same thread reuses it."""
+        transport = DriveTransport(FakeCredentials())
+        with patch('googleapiclient.discovery.build_from_document', side_effect=lambda doc, http: Mock(http=http)):
+            main_service = transport.service()
+            self.assertIs(transport.service(), main_service)
+            
+            services = []
+            thread = threading.Thread(target=lambda: services.append(transport.service()))
+            thread.start()
+            thread.join()
+        
+        self.assertIsNot(services[0], main_service)
+        self.assertIsNot(services[0].http, main_service.http)
+        self.assertEqual(transport.client_count, 2)
+
+
+class FakePDFBackend(PDFBackend):
+    """PDF backend stub with a configurable result and delay."""
+    
+    module = 'io'
+    
+    def __init__(self, name, text='', delay=0.0, error=None):
+        self.name = name
+        self.text = text
+        self.delay = delay
+        self.error = error
+    
+    def extract_text(self, pdf_content):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.text
+
+
+class TestPDFBackends(unittest.TestCase):
+    """Test cases for PDF backend selection and fallback."""
+    
+    def test_auto_picks_fastest_backend_with_text(self):
+        """Test that auto mode ignores backends that are slower, fail or return no text."""
+        backends = [
+            FakePDFBackend('slow', 'text', delay=0.02),
+            FakePDFBackend('empty', ''),
+            FakePDFBackend('broken', error=ValueError('bad pdf')),
+            FakePDFBackend('fast', 'text', delay=0.001),
+        ]
+        with patch('pdf_backends.available_backends', return_value=backends):
+            extractor = PDFTextExtractor('auto')
+            self.assertEqual(extractor.extract_text(b'%PDF'), 'text')
+        
+        self.assertEqual(extractor.backend.name, 'fast')
+        self.assertEqual([b.name for b, _, _ in extractor.benchmark][-1], 'slow')
+    
+    def test_falls_back_on_parse_error(self):
+        """Test that another installed backend is tried when the selected one fails."""
+        extractor = PDFTextExtractor()
+        extractor.backend = FakePDFBackend('broken', error=ValueError('bad pdf'))
+        with patch('pdf_backends.available_backends',
+                   return_value=[extractor.backend, FakePDFBackend('other', 'recovered')]):
+            self.assertEqual(extractor.extract_text(b'%PDF'), 'recovered')
+    
+    def test_unknown_backend(self):
+        """Test that unknown backend names are rejected."""
+        with self.assertRaises(ValueError):
+            PDFTextExtractor('nope')
+    
+    def test_backends_must_extract_text(self):
+        """Test that a backend without extract_text cannot be created."""
+        class NamedOnly(PDFBackend):
+            name = 'named-only'
+            module = 'io'
+        
+        with self.assertRaises(TypeError):
+            NamedOnly()
+
+
+class TestFileMappingImportExport(unittest.TestCase):
+    """Test cases for FileMapping import and export formats."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mapping = FileMapping(os.path.join(self.tmp.name, 'cache.json'))
+        self.mapping.set_classification('id1', 'a.pdf', 'chase', 'bank statement', None)
+        self.mapping.set_classification('id2', 'b.pdf', None, None, None)
+        self.mapping.set_classification('id3', 'b.pdf', None, None, None)
+    
+    def tearDown(self):
+        """Clean up temporary files."""
+        self.tmp.cleanup()
+    
+    def test_streaming_export_formats(self):
+        """Test JSONL and CSV exports contain one row per cached file."""
+        jsonl_file = self.mapping.export_mapping(os.path.join(self.tmp.name, 'export.jsonl'))
+        csv_file = self.mapping.export_mapping(os.path.join(self.tmp.name, 'export.csv'))
+        
+        with open(jsonl_file) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([r['file_name'] for r in rows], ['a.pdf', 'b.pdf', 'b.pdf'])
+        
+        with open(csv_file, newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(rows[0]['company'], 'chase')
+        self.assertEqual(rows[1]['company'], '')
+    
+    def test_import_updates_first_entry_by_name(self):
+        """Test CSV and JSONL imports update the first cached entry with that name."""
+        csv_file = os.path.join(self.tmp.name, 'manual.csv')
+        with open(csv_file, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['file_name', 'company', 'statement_type', 'account_info'])
+            writer.writeheader()
+            writer.writerow({'file_name': 'b.pdf', 'company': 'citi', 'statement_type': 'credit card statement', 'account_info': ''})
+            writer.writerow({'file_name': 'missing.pdf', 'company': 'citi', 'statement_type': '', 'account_info': ''})
+        
+        self.assertTrue(self.mapping.import_manual_mapping(csv_file))
+        self.assertEqual(self.mapping.get_classification('id2', 'b.pdf'), ('citi', 'credit card statement', None))
+        self.assertEqual(self.mapping.get_classification('id3', 'b.pdf'), (None, None, None))
+        
+        jsonl_file = os.path.join(self.tmp.name, 'manual.jsonl')
+        with open(jsonl_file, 'w') as f:
+            f.write(json.dumps({'file_name': 'a.pdf', 'company': 'wells fargo', 'statement_type': 'bank statement'}) + '\n')
+        
+        self.assertTrue(self.mapping.import_manual_mapping(jsonl_file))
+        self.assertEqual(self.mapping.get_classification('id1', 'a.pdf')[0], 'wells fargo')
+    
+    def test_index_tracks_new_entries(self):
+        """Test that entries added after the index is built can be imported."""
+        self.mapping.import_manual_mapping(self.mapping.export_mapping(os.path.join(self.tmp.name, 'x.jsonl')))
+        self.mapping.set_classification('id4', 'c.pdf', None, None, None)
+        
+        manual_file = os.path.join(self.tmp.name, 'manual.json')
+        with open(manual_file, 'w') as f:
+            json.dump({'files': [{'file_name': 'c.pdf', 'company': 'amex', 'statement_type': 'credit card statement'}]}, f)
+        
+        self.assertTrue(self.mapping.import_manual_mapping(manual_file))
+        self.assertEqual(self.mapping.get_classification('id4', 'c.pdf')[0], 'amex')
+
+
+class TestJobOrchestration(unittest.TestCase):
+    """Test cases for concurrent jobs sharing a request budget and cache."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.tmp.cleanup()
+    
+    def write_manifest(self, manifest):
+        path = os.path.join(self.tmp.name, 'jobs.json')
+        with open(path, 'w') as f:
+            json.dump(manifest, f)
+        return path
+    
+    def test_rate_limiter_bounds_request_rate(self):
+        """Test that requests beyond the burst wait for the budget, batches included."""
+        limiter = RateLimiter(100, burst=1)
+        started = time.monotonic()
+        threads = [threading.Thread(target=limiter.acquire) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        limiter.acquire(3)
+        
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+        self.assertEqual(limiter.requests, 8)
+    
+    def test_load_job_manifest(self):
+        """Test manifest defaults, per-job credentials and validation."""
+        path = self.write_manifest({'workers': 2, 'jobs': [
+            {'name': 'personal', 'source_folder_id': 'src1', 'dest_folder_id': 'dst1'},
+            {'name': 'business', 'credentials_file': 'business.json', 'workers': 3, 'dry_run': True},
+        ]})
+        settings, jobs = load_job_manifest(path)
+        
+        self.assertEqual(settings, {'workers': 2})
+        self.assertEqual(jobs[0].token_file, 'token.json')
+        self.assertEqual(jobs[0].workers, 2)
+        self.assertEqual(jobs[1].token_file, 'token_business.json')
+        self.assertEqual(jobs[1].source_folder_name, 'Monthly Statements')
+        self.assertEqual((jobs[1].workers, jobs[1].dry_run), (3, True))
+        
+        for manifest in ({'jobs': []}, {'jobs': [{'name': 'a'}, {'name': 'a'}]}, {'jobs': [{'typo': 1}]}):
+            with self.assertRaises(ValueError):
+                load_job_manifest(self.write_manifest(manifest))
+        
+        with self.assertRaisesRegex(ValueError, 'Job b: order must be a comma-separated string'):
+            load_job_manifest(self.write_manifest({'jobs': [{'name': 'a'}, {'name': 'b', 'order': ['newest']}]}))
+        with self.assertRaisesRegex(ValueError, 'jobs.json: order must be'):
+            load_job_manifest(self.write_manifest({'order': ['newest'], 'jobs': [{'name': 'a'}]}))
+    
+    def test_organize_statements_with_workers(self):
+        """Test that files are processed concurrently and counted once each."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizer = GoogleDriveOrganizer(show_progress=False)
+        files = [{'id': str(i), 'name': f'statement_{i}.pdf'} for i in range(20)]
+        threads = set()
+        
+        def process(file, dest_folder_id, dry_run, duplicate_handling):
+            threads.add(threading.get_ident())
+            time.sleep(0.005)
+            return ['copied', 'processed'] if int(file['id']) % 2 else ['unclassified']
+        
+        with patch.object(organizer, 'get_files_in_folder', return_value=files), \
+                patch.object(organizer, '_process_file', side_effect=process):
+            stats = organizer.organize_statements('src', 'dst', workers=4)
+        
+        self.assertEqual((stats['processed'], stats['copied'], stats['unclassified']), (10, 10, 10))
+        self.assertGreater(len(threads), 1)
+    
+    def test_run_jobs_shares_budget_cache_and_credentials(self):
+        """Test that jobs share one cache and budget, authenticating once per credentials."""
+        import main as main_module
+        
+        path = self.write_manifest({'jobs': [
+            {'name': 'a', 'source_folder_id': 's1', 'dest_folder_id': 'd1'},
+            {'name': 'b', 'source_folder_id': 's2', 'dest_folder_id': 'd2'},
+            {'name': 'c', 'source_folder_id': 's3', 'dest_folder_id': 'd3', 'credentials_file': 'other.json'},
+        ]})
+        _, jobs = load_job_manifest(path)
+        mapping = FileMapping(os.path.join(self.tmp.name, 'cache.json'))
+        organizers = []
+        
+        def authenticate(organizer):
+            organizer.transport = Mock()
+        
+        def organize(organizer, source_folder_id, dest_folder_id, dry_run, duplicate_handling, **options):
+            organizers.append(organizer)
+            return {'total_files': 1, 'processed': 1}
+        
+        with patch.object(GoogleDriveOrganizer, 'authenticate', autospec=True, side_effect=authenticate) as auth, \
+                patch.object(GoogleDriveOrganizer, 'organize_statements', autospec=True, side_effect=organize):
+            results = main_module.run_jobs(jobs, requests_per_second=50, file_mapping=mapping)
+        
+        self.assertEqual(list(results), ['a', 'b', 'c'])
+        self.assertNotIn(None, results.values())
+        self.assertEqual(auth.call_count, 2)
+        self.assertEqual(len({id(o.file_mapping) for o in organizers}), 1)
+        self.assertEqual(len({id(o.rate_limiter) for o in organizers}), 1)
+        self.assertEqual(len({id(o.transport) for o in organizers}), 2)
+        for organizer in organizers:
+            organizer.transport.close.assert_called_once_with()
+    
+    def test_concurrent_classifications_are_all_cached(self):
+        """Test that a shared FileMapping keeps every concurrent write."""
+        mapping = FileMapping(os.path.join(self.tmp.name, 'cache.json'))
+        
+        def worker(start):
+            for i in range(start, start + 25):
+                mapping.set_classification(f'id{i}', f'file{i}.pdf', 'chase', 'bank statement', None)
+        
+        threads = [threading.Thread(target=worker, args=(start,)) for start in range(0, 100, 25)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(FileMapping(mapping.cache_file).cache), 100)
+
+
+class TestWorkLeases(unittest.TestCase):
+    """Test cases for lease-based sharding across worker processes."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, 'leases.db')
+        self.files = [{'id': f'f{i}', 'name': f'statement_{i}.pdf'} for i in range(10)]
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.tmp.cleanup()
+    
+    def test_units_are_claimed_once(self):
+        """Test that seeding happens once and each unit goes to one worker."""
+        store_a, store_b = LeaseStore(self.db_path), LeaseStore(self.db_path)
+        self.assertTrue(store_a.seed(self.files, unit_size=4, source_folder_id='src'))
+        self.assertFalse(store_b.seed(self.files, unit_size=4))
+        self.assertEqual(store_b.get_meta('source_folder_id'), 'src')
+        
+        unit_a, files_a = store_a.claim('a')
+        unit_b, files_b = store_b.claim('b')
+        self.assertNotEqual(unit_a, unit_b)
+        self.assertEqual([f['id'] for f in files_a], ['f0', 'f1', 'f2', 'f3'])
+        self.assertEqual(len(files_b), 4)
+        
+        self.assertTrue(store_a.complete(unit_a, 'a'))
+        self.assertFalse(store_a.complete(unit_b, 'a'))
+        unit_c, files_c = store_a.claim('a')
+        self.assertEqual(len(files_c), 2)
+        self.assertIsNone(store_a.claim('a'))
+        
+        progress = store_a.get_progress()
+        self.assertEqual((progress['done'], progress['leased'], progress['total_files']), (1, 2, 10))
+        store_a.close()
+        store_b.close()
+    
+    def test_expired_lease_is_reclaimed(self):
+        """Test that a crashed worker's unit is reclaimed without its finished files."""
+        store = LeaseStore(self.db_path)
+        store.seed(self.files, unit_size=10)
+        unit_id, files = store.claim('crashed', lease_seconds=0.01)
+        store.mark_done(files[0]['id'], 'crashed', 'copied')
+        self.assertIsNone(store.claim('other'))
+        
+        time.sleep(0.02)
+        reclaimed_id, remaining = store.claim('other')
+        self.assertEqual(reclaimed_id, unit_id)
+        self.assertEqual(len(remaining), 9)
+        self.assertFalse(store.renew(unit_id, 'crashed'))
+        self.assertTrue(store.renew(unit_id, 'other'))
+        store.close()
+    
+    def test_workers_drain_units_without_repeats(self):
+        """Test that concurrent sharded organizers process every file exactly once."""
+        processed = []
+        
+        def process(file, dest_folder_id, dry_run, duplicate_handling):
+            processed.append(file['id'])
+            return ['copied', 'processed']
+        
+        # Patching the class from several threads at once can leave it patched
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizers = [GoogleDriveOrganizer() for _ in range(3)]
+        
+        def worker(worker_id, organizer):
+            store = LeaseStore(self.db_path)
+            listing = [DriveFile.from_resource(file) for file in self.files]
+            with patch.object(organizer, 'get_files_in_folder', return_value=listing), \
+                    patch.object(organizer, '_process_file', side_effect=process):
+                organizer.organize_sharded('src', 'dst', store, worker_id, unit_size=3)
+            store.close()
+        
+        threads = [threading.Thread(target=worker, args=(f'w{i}', organizer)) for i, organizer in enumerate(organizers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(sorted(processed), sorted(f['id'] for f in self.files))
+        store = LeaseStore(self.db_path)
+        self.assertEqual(store.get_progress()['done_files'], 10)
+        with self.assertRaises(ValueError):
+            organizer = GoogleDriveOrganizer()
+            organizer.organize_sharded('other-src', 'dst', store, 'w4')
+        store.close()
+
+
+class TestScheduling(unittest.TestCase):
+    """Test cases for file processing orderings."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.files = [
+            {'id': '1', 'name': 'scan_001.pdf', 'size': '900', 'modifiedTime': '2024-01-05T10:00:00.000Z'},
+            {'id': '2', 'name': 'chase_bank_statement.pdf', 'size': '300', 'modifiedTime': '2024-03-01T10:00:00.000Z'},
+            {'id': '3', 'name': 'notes.pdf', 'size': '100'},
+            {'id': '4', 'name': 'scan_002.pdf', 'size': '300', 'modifiedTime': '2024-02-01T10:00:00.000Z'},
+        ]
+    
+    def order(self, names, context=None):
+        return [f['id'] for f in schedule_files(self.files, parse_order(names), context)]
+    
+    def test_single_orderings(self):
+        """Test newest-first and smallest-first, with missing values last."""
+        self.assertEqual(self.order(''), ['1', '2', '3', '4'])
+        self.assertEqual(self.order('newest'), ['2', '4', '1', '3'])
+        self.assertEqual(self.order('smallest'), ['3', '2', '4', '1'])
+    
+    def test_combined_orderings(self):
+        """Test that later orderings break ties of earlier ones."""
+        self.assertEqual(self.order('smallest,newest'), ['3', '2', '4', '1'])
+        self.assertEqual(self.order('smallest'), self.order('smallest,newest'))
+        with self.assertRaises(ValueError):
+            parse_order('newest,biggest')
+    
+    def test_cached_first(self):
+        """Test that cache hits come first, then files classifiable by name."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizer = GoogleDriveOrganizer()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        organizer.file_mapping = FileMapping(os.path.join(tmp.name, 'cache.json'))
+        organizer.file_mapping.set_classification('4', 'scan_002.pdf', 'citi', 'credit card statement', None, '300')
+        
+        self.assertEqual(self.order('cached', organizer), ['4', '2', '1', '3'])
+        self.assertEqual(self.order('cached,smallest', organizer), ['4', '2', '3', '1'])
+
+
+class TestDriveWatcher(unittest.TestCase):
+    """Test cases for watch mode on the Drive change feed."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.state_file = os.path.join(self.tmp.name, 'watch_state.json')
+        self.organizer = Mock()
+        self.organizer.folder_indexes = {}
+        self.organizer.folder_matchers = {}
+        self.organizer.list_child_folders.side_effect = lambda folder_id: (
+            [{'id': 'sub', 'name': 'January'}] if folder_id == 'src' else [])
+        self.organizer.get_start_page_token.return_value = 'token-1'
+        self.processed = []
+        
+        def process_files(files, dest_folder_id, dry_run, duplicate_handling, workers):
+            for file in files:
+                self.processed.append(file['id'])
+                yield file, ['copied', 'processed']
+        
+        self.organizer.process_files.side_effect = process_files
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.tmp.cleanup()
+    
+    def make_watcher(self, dry_run=False):
+        return DriveWatcher(self.organizer, 'src', 'dst', state_file=self.state_file, interval=0, dry_run=dry_run,
+                            log=lambda message: None)
+    
+    def test_run_once_processes_new_files_in_source_tree(self):
+        """Test that only new versions of files below the source folder are processed."""
+        watcher = self.make_watcher()
+        watcher.load_source_folders()
+        watcher.state.update(page_token='token-1', seen={'old': 'md5-old'})
+        folder = 'application/vnd.google-apps.folder'
+        self.organizer.list_changes.return_value = ([
+            {'fileId': 'new-folder', 'file': {'id': 'new-folder', 'mimeType': folder, 'parents': ['sub']}},
+            {'fileId': 'a', 'file': {'id': 'a', 'name': 'a.pdf', 'parents': ['new-folder'], 'md5Checksum': 'md5-a'}},
+            {'fileId': 'b', 'file': {'id': 'b', 'name': 'b.pdf', 'parents': ['elsewhere'], 'md5Checksum': 'md5-b'}},
+            {'fileId': 'c', 'file': {'id': 'c', 'name': 'c.pdf', 'parents': ['src'], 'trashed': True}},
+            {'fileId': 'd', 'removed': True},
+            {'fileId': 'old', 'file': {'id': 'old', 'name': 'old.pdf', 'parents': ['src'], 'md5Checksum': 'md5-old'}},
+        ], 'token-2')
+        
+        self.assertEqual(watcher.run_once(), 1)
+        self.assertEqual(self.processed, ['a'])
+        self.assertEqual(self.organizer.list_changes.call_args[0][0], 'token-1')
+        
+        with open(self.state_file) as f:
+            state = json.load(f)
+        self.assertEqual(state['page_token'], 'token-2')
+        self.assertEqual(state['seen']['a'], 'md5-a')
+        self.assertEqual(watcher.stats['copied'], 1)
+    
+    def test_destination_indexes_follow_changes(self):
+        """Test that new files are added to cached indexes and changed ones invalidate them."""
+        watcher = self.make_watcher()
+        self.organizer.folder_indexes = {
+            'dst-a': FolderContentsIndex([{'id': 'x', 'name': 'x.pdf', 'md5Checksum': '1'}]),
+            'dst-b': FolderContentsIndex([{'id': 'y', 'name': 'y.pdf', 'md5Checksum': '2'}]),
+        }
+        
+        watcher.update_indexes('z', {'id': 'z', 'name': 'z.pdf', 'parents': ['dst-a']})
+        watcher.update_indexes('x', {'id': 'x', 'name': 'x.pdf', 'md5Checksum': '1', 'parents': ['dst-a']})
+        self.assertTrue(self.organizer.folder_indexes['dst-a'].has_name('z.pdf'))
+        
+        watcher.update_indexes('y', {'id': 'y', 'name': 'renamed.pdf', 'md5Checksum': '2', 'parents': ['dst-b']})
+        self.assertEqual(list(self.organizer.folder_indexes), ['dst-a'])
+    
+    def test_first_run_catches_up_and_restart_resumes(self):
+        """Test that the first run organizes everything once and a restart resumes from the saved token."""
+        watcher = self.make_watcher()
+        watcher.stop()
+        watcher.run()
+        self.assertEqual(self.organizer.organize_statements.call_count, 1)
+        
+        restarted = self.make_watcher()
+        self.assertEqual(restarted.state['page_token'], 'token-1')
+        restarted.stop()
+        restarted.run()
+        self.assertEqual(self.organizer.organize_statements.call_count, 1)
+        self.assertEqual(restarted.source_folders, {'src', 'sub'})
+    
+    def test_dry_watch_does_not_hide_files_from_real_watch(self):
+        """Test that a dry watch saves no state, so a real watch catches up and processes the same files."""
+        changes = ([{'fileId': 'a', 'file': {'id': 'a', 'name': 'a.pdf', 'parents': ['src'], 'md5Checksum': 'md5-a'}}],
+                   'token-2')
+        dry = self.make_watcher(dry_run=True)
+        self.organizer.list_changes.side_effect = lambda token: (dry.stop(), changes)[1]
+        dry.run()
+        self.assertEqual(self.processed, ['a'])
+        self.assertFalse(os.path.exists(self.state_file))
+        
+        real = self.make_watcher()
+        self.organizer.list_changes.side_effect = lambda token: (real.stop(), changes)[1]
+        real.run()
+        self.assertEqual(self.organizer.organize_statements.call_count, 2)
+        self.assertEqual(self.processed, ['a', 'a'])
+        self.assertEqual([call[0][2] for call in self.organizer.organize_statements.call_args_list], [True, False])
+        with open(self.state_file) as f:
+            self.assertEqual(json.load(f)['seen'], {'a': 'md5-a'})
+    
+    def test_unfiled_files_are_retried_on_later_polls(self):
+        """Test that deferred, unclassified and failed files are processed again until they are filed."""
+        outcomes = {'a': [['deferred'], ['copied', 'processed']], 'b': [['unclassified'], ['errors'], ['errors']]}
+        
+        def process_files(files, *args):
+            for file in files:
+                self.processed.append(file['id'])
+                yield file, outcomes[file['id']].pop(0)
+        
+        self.organizer.process_files.side_effect = process_files
+        watcher = self.make_watcher()
+        watcher.load_source_folders()
+        watcher.state['page_token'] = 'token-1'
+        self.organizer.list_changes.return_value = ([
+            {'fileId': 'a', 'file': {'id': 'a', 'name': 'a.pdf', 'parents': ['src'], 'md5Checksum': 'md5-a'}},
+            {'fileId': 'b', 'file': {'id': 'b', 'name': 'b.pdf', 'parents': ['sub'], 'md5Checksum': 'md5-b'}},
+        ], 'token-2')
+        watcher.run_once()
+        self.assertEqual(watcher.state['seen'], {})
+        
+        # Later polls bring no changes; the feed has moved on, but the files are retried
+        self.organizer.list_changes.return_value = ([], 'token-3')
+        self.assertEqual(watcher.run_once(), 2)
+        self.assertEqual(watcher.state['seen'], {'a': 'md5-a'})
+        self.assertEqual(watcher.run_once(), 1)
+        self.assertEqual(self.processed, ['a', 'b', 'a', 'b', 'b'])
+        
+        with open(self.state_file) as f:
+            self.assertEqual(list(json.load(f)['retry']), ['b'])
+        restarted = self.make_watcher()
+        self.organizer.list_changes.return_value = ([{'fileId': 'b', 'removed': True}], 'token-4')
+        restarted.load_source_folders()
+        self.assertEqual(restarted.run_once(), 0)
+        self.assertEqual(restarted.state['retry'], {})
+
+
+class TestNegativeCache(unittest.TestCase):
+    """Test cases for the negative cache of failing files."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.tmp.name, 'negative.json')
+        self.cache = NegativeCache(self.cache_file, fingerprint='v1', retry_delays={'unclassified': 100})
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.tmp.cleanup()
+    
+    def test_exponential_backoff(self):
+        """Test that the retry delay doubles with each failure and survives a reload."""
+        first = self.cache.record_failure('id1', 'md5', 'unclassified')
+        second = self.cache.record_failure('id1', 'md5', 'unclassified')
+        self.assertEqual(second['failures'], 2)
+        self.assertAlmostEqual(second['retry_after'] - time.time(), 200, delta=5)
+        self.assertGreater(second['retry_after'], first['retry_after'])
+        
+        reloaded = NegativeCache(self.cache_file, fingerprint='v1')
+        self.assertEqual(reloaded.get_deferral('id1', 'md5')['reason'], 'unclassified')
+        
+        with patch('negative_cache.time.time', return_value=second['retry_after'] + 1):
+            self.assertIsNone(reloaded.get_deferral('id1', 'md5'))
+    
+    def test_invalidation(self):
+        """Test that a new md5, new patterns, a success or --retry-failed end the deferral."""
+        self.cache.record_failure('id1', 'md5', 'unclassified')
+        self.assertIsNotNone(self.cache.get_deferral('id1', 'md5'))
+        self.assertIsNone(self.cache.get_deferral('id1', 'md5-new'))
+        self.assertIsNone(NegativeCache(self.cache_file, fingerprint='v2').get_deferral('id1', 'md5'))
+        self.assertEqual(self.cache.record_failure('id1', 'md5-new', 'unclassified')['failures'], 1)
+        
+        self.cache.retry_all = True
+        self.assertIsNone(self.cache.get_deferral('id1', 'md5-new'))
+        self.cache.retry_all = False
+        
+        self.cache.record_success('id1')
+        self.assertIsNone(self.cache.get_deferral('id1', 'md5-new'))
+    
+    def test_failed_download_is_deferred(self):
+        """Test that an unclassifiable file with a failed download is not downloaded again."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizer = GoogleDriveOrganizer(negative_cache=self.cache)
+        organizer.file_mapping = FileMapping(os.path.join(self.tmp.name, 'cache.json'))
+        file = {'id': 'scan', 'name': 'scan_0001.pdf', 'md5Checksum': 'abc'}
+        
+        with patch.object(organizer, 'download_file', return_value=None) as download:
+            self.assertEqual(organizer._process_file(file, 'dst', True, 'smart'), ['unclassified'])
+            self.assertEqual(self.cache.entries['scan']['reason'], 'download_failed')
+            
+            self.assertEqual(organizer._process_file(file, 'dst', True, 'smart'), ['deferred'])
+            self.assertEqual(download.call_count, 1)
+    
+    def test_failed_files_are_classified_again_when_due(self):
+        """Test that after a failed download and a corrupt PDF, the retry parses the file and files it."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizer = GoogleDriveOrganizer(negative_cache=self.cache,
+                                             file_mapping=FileMapping(os.path.join(self.tmp.name, 'cache.json')))
+        organizer.service = MagicMock()
+        organizer.service.files().list().execute.return_value = {
+            'files': [{'id': 'chase', 'name': 'Chase Checking -7641'}]}
+        file = {'id': 'scan', 'name': 'scan_0001.pdf', 'md5Checksum': 'abc'}
+        
+        def corrupt(content):
+            organizer._thread_state.pdf_error = 'EOF marker not found'
+            return ''
+        
+        attempts = [(None, None), (b'%PDF-broken', corrupt), (b'%PDF', lambda content: 'Chase bank statement\nCard ending 7641')]
+        outcomes = []
+        for content, extract in attempts:
+            with patch.object(organizer, 'download_file', return_value=content), \
+                    patch.object(organizer, 'extract_text_from_pdf', side_effect=extract) as parse, patch('main.console'):
+                outcomes.append((organizer._process_file(file, 'dst', True, 'smart'), parse.call_count))
+            if 'scan' in self.cache.entries:
+                outcomes[-1] += (self.cache.entries['scan']['reason'],)
+                self.cache.entries['scan']['retry_after'] = 0  # The backoff has expired
+        
+        self.assertEqual(outcomes, [(['unclassified'], 0, 'download_failed'), (['unclassified'], 1, 'corrupt_pdf'),
+                                    (['copied', 'processed'], 1)])
+        self.assertNotIn('scan', self.cache.entries)
+        self.assertEqual(organizer.file_mapping.get_classification('scan', 'scan_0001.pdf'),
+                         ('chase', 'bank statement', '7641'))
+
+
+class TestSingleFlightFolders(unittest.TestCase):
+    """Test cases for coalesced folder lookups and creation."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            self.organizer = GoogleDriveOrganizer()
+    
+    def test_concurrent_resolution_creates_one_folder(self):
+        """Test that racing workers share one lookup and one creation."""
+        def slow_lookup(name, parent_id):
+            time.sleep(0.02)
+            return None
+        
+        results = []
+        with patch.object(self.organizer, 'find_folder_by_name', side_effect=slow_lookup) as find, \
+                patch.object(self.organizer, 'create_folder', return_value='chase-id') as create:
+            threads = [threading.Thread(target=lambda: results.append(self.organizer.resolve_folder('chase', 'dst')))
+                       for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(self.organizer.resolve_folder('chase', 'dst'), 'chase-id')
+        
+        self.assertEqual(results, ['chase-id'] * 8)
+        self.assertEqual((find.call_count, create.call_count), (1, 1))
+    
+    def test_failures_are_shared_but_not_memoized(self):
+        """Test that waiting callers see the error and a later call tries again."""
+        flights = SingleFlight()
+        started = threading.Event()
+        errors = []
+        
+        def failing():
+            started.set()
+            time.sleep(0.02)
+            raise RuntimeError('quota')
+        
+        def waiter():
+            started.wait()
+            try:
+                flights.do('key', lambda: 'unused')
+            except RuntimeError as error:
+                errors.append(error)
+        
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        with self.assertRaises(RuntimeError):
+            flights.do('key', failing)
+        thread.join()
+        
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(flights.do('key', lambda: 'ok'), 'ok')
+    
+    def test_dry_run_lookup_is_memoized(self):
+        """Test that a missing folder is looked up once per run without creating it."""
+        with patch.object(self.organizer, 'find_folder_by_name', return_value=None) as find, \
+                patch.object(self.organizer, 'create_folder') as create:
+            self.assertIsNone(self.organizer.resolve_folder('citi', 'dst', create=False))
+            self.assertIsNone(self.organizer.resolve_folder('citi', 'dst', create=False))
+        
+        self.assertEqual(find.call_count, 1)
+        self.assertFalse(create.called)
+
+
+class TestDriveFileRecords(unittest.TestCase):
+    """Test cases for carrying listing metadata through the pipeline."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            self.organizer = GoogleDriveOrganizer()
+        self.organizer.service = MagicMock()
+        self.record = DriveFile.from_resource({
+            'id': 'x', 'name': 'chase_statement.pdf', 'mimeType': 'application/pdf',
+            'size': '10', 'md5Checksum': 'md5a', 'parents': ['src']
+        })
+    
+    def test_listing_builds_records(self):
+        """Test that the paginated listing returns records with API-style access."""
+        self.organizer.service.files().list().execute.side_effect = [
+            {'files': [self.record.to_resource()], 'nextPageToken': 'next'},
+            {'files': [{'id': 'y', 'name': 'other.pdf', 'mimeType': 'application/pdf'}]},
+        ]
+        
+        files = self.organizer.get_files_in_folder('src')
+        
+        self.assertEqual([file.id for file in files], ['x', 'y'])
+        self.assertEqual(files[0]['md5Checksum'], 'md5a')
+        self.assertEqual(files[0].parents, ('src',))
+        self.assertIsNone(files[1].get('md5Checksum'))
+        self.assertEqual(files[1].get('size', '0'), '0')
+        with self.assertRaises(KeyError):
+            files[0]['owners']
+    
+    def test_copy_uses_record_metadata(self):
+        """Test that copying a listed file does not fetch its metadata again."""
+        self.organizer.folder_indexes['dest'] = FolderContentsIndex(
+            [{'id': 'a', 'name': 'old.pdf', 'md5Checksum': 'md5a'}]
+        )
+        self.organizer.service.files().get.reset_mock()
+        
+        self.assertTrue(self.organizer.copy_file('x', 'dest', file=self.record))
+        
+        self.organizer.service.files().get.assert_not_called()
+        self.organizer.service.files().copy.assert_not_called()  # Same content exists, so skipped
+    
+    def test_concurrent_identical_files_are_copied_once(self):
+        """Test that two workers copying the same content into one folder copy it once."""
+        self.organizer.folder_indexes['dest'] = FolderContentsIndex([])
+        twin = DriveFile.from_resource(dict(self.record.to_resource(), id='x2'))
+        copies = []
+        
+        def slow_copy(request):
+            time.sleep(0.02)
+            copies.append(request)
+            return {'id': f'copy-{len(copies)}', 'name': 'chase_statement.pdf', 'size': '10', 'md5Checksum': 'md5a'}
+        
+        results = []
+        with patch.object(self.organizer, '_execute', side_effect=slow_copy), patch('main.console'):
+            threads = [threading.Thread(target=lambda record=record: results.append(
+                           self.organizer.copy_file(record.id, 'dest', file=record)))
+                       for record in (self.record, twin)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        
+        self.assertEqual(results, [True, True])
+        self.assertEqual(len(copies), 1)
+        self.assertEqual(len(self.organizer.folder_indexes['dest'].find_by_md5('md5a')), 1)
+    
+    def test_dry_run_uses_matched_folder_name(self):
+        """Test that a dry run reports the matched folder without fetching it."""
+        self.organizer.service.files().list().execute.return_value = {
+            'files': [{'id': 'folder1', 'name': 'Chase Freedom Card -64649'}]
+        }
+        self.organizer.service.files().get.reset_mock()
+        
+        with patch.object(self.organizer, 'download_file', return_value=b'%PDF'), \
+                patch.object(self.organizer, 'classify_file',
+                             return_value=('Chase', 'credit card statement', '4111111111164649')), \
+                patch('main.console') as mock_console:
+            counters = self.organizer._process_file(self.record, 'dest', True, 'smart')
+        
+        self.assertEqual(counters, ['copied', 'processed'])
+        self.organizer.service.files().get.assert_not_called()
+        printed = ' '.join(str(call.args[0]) for call in mock_console.print.call_args_list)
+        self.assertIn('Chase Freedom Card -64649/', printed)
+
+
+class TestProfiling(unittest.TestCase):
+    """Test cases for the profiling and span tracing hooks."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.prefix = os.path.join(self.tmp.name, 'profile')
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.tmp.cleanup()
+    
+    def test_trace_file_records_file_spans(self):
+        """Test that each stage of a file is written as a span attributed to that file."""
+        trace_path = os.path.join(self.tmp.name, 'trace.jsonl')
+        tracer = SpanTracer(trace_path)
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizer = GoogleDriveOrganizer(tracer=tracer)
+        file = {'id': 'f1', 'name': 'chase_statement.pdf', 'md5Checksum': 'md5a'}
+        
+        with patch.object(organizer, 'download_file', return_value=b'%PDF'), \
+                patch.object(organizer, 'classify_file', return_value=(None, None, None)), \
+                patch.object(organizer.negative_cache, 'record_failure'), \
+                patch('main.console'):
+            counters = organizer._process_file(file, 'dest', True, 'smart')
+        tracer.close()
+        
+        with open(trace_path) as f:
+            spans = [json.loads(line) for line in f]
+        self.assertEqual([span['span'] for span in spans], ['download', 'classify', 'file'])
+        self.assertTrue(all(span['file_id'] == 'f1' and span['duration_ms'] >= 0 for span in spans))
+        self.assertEqual(spans[-1]['outcome'], counters)
+    
+    def test_cpu_profile_covers_worker_threads(self):
+        """Test that CPU profiles include threads started during the run and fold into stacks."""
+        def busy_worker_function():
+            return sum(i * i for i in range(20000))
+        
+        profiler = Profiler('cpu', self.prefix)
+        profiler.start()
+        thread = threading.Thread(target=busy_worker_function)
+        thread.start()
+        thread.join()
+        reports = profiler.stop()
+        
+        self.assertEqual(reports, [f'{self.prefix}.pstats', f'{self.prefix}.collapsed'])
+        
+        self.assertTrue(all(os.path.exists(report) for report in reports))
+        with open(f'{self.prefix}.collapsed') as f:
+            lines = f.read().splitlines()
+        worker_lines = [line for line in lines if 'busy_worker_function' in line]
+        self.assertTrue(worker_lines)
+        self.assertTrue(all(line.rsplit(' ', 1)[1].isdigit() for line in lines))
+    
+    def test_memory_profile_snapshots_stages(self):
+        """Test that memory profiles report every stage boundary and the end of the run."""
+        profiler = Profiler('mem', self.prefix)
+        profiler.start()
+        data = [bytes(1000) for _ in range(100)]
+        profiler.stage('listed')
+        reports = profiler.stop()
+        
+        with open(reports[0]) as f:
+            report = f.read()
+        self.assertIn('== listed:', report)
+        self.assertIn('== end:', report)
+        self.assertIn('Largest changes since the previous stage', report)
+        self.assertEqual(len(data), 100)
+        with self.assertRaises(ValueError):
+            Profiler('disk')
+
+
+class TestBlobCache(unittest.TestCase):
+    """Test cases for the md5-addressed cache of downloaded PDFs."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp.name, 'blobs')
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.tmp.cleanup()
+    
+    def blob(self, content: bytes):
+        return hashlib.md5(content).hexdigest(), content
+    
+    def test_blobs_survive_restart_and_are_verified(self):
+        """Test that stored blobs are found by a new cache and mismatched content is refused."""
+        md5, content = self.blob(b'statement one')
+        cache = BlobCache(self.directory)
+        
+        self.assertTrue(cache.put(md5, content))
+        self.assertFalse(cache.put('0' * 32, content))
+        self.assertIsNone(cache.get(None))
+        
+        mapped = BlobCache(self.directory).get(md5)
+        self.assertEqual(mapped[:], content)
+        mapped.close()
+        self.assertEqual(BlobCache(self.directory, use_mmap=False).get(md5), content)
+        self.assertEqual([name for _, _, names in os.walk(self.directory) for name in names], [md5])
+    
+    def test_least_recently_used_blobs_are_evicted(self):
+        """Test that the cache stays within its budget by removing the least recently used blob."""
+        cache = BlobCache(self.directory, max_bytes=25, use_mmap=False)
+        a, b, c = (self.blob(bytes([i]) * 10) for i in range(3))
+        cache.put(*a)
+        cache.put(*b)
+        cache.get(a[0])
+        cache.put(*c)
+        
+        self.assertIsNone(cache.get(b[0]))
+        self.assertEqual(cache.get(a[0]), a[1])
+        self.assertEqual(cache.get_stats()['total_bytes'], 20)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, b[0][:2], b[0])))
+    
+    def test_organizer_reads_cached_pdfs_in_place(self):
+        """Test that a cached PDF is not downloaded again and is parsed from its memory map."""
+        import PyPDF2
+        writer = PyPDF2.PdfWriter()
+        writer.add_blank_page(100, 100)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        md5, content = self.blob(buffer.getvalue())
+        
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizer = GoogleDriveOrganizer(blob_cache=BlobCache(self.directory))
+        file = {'id': 'f1', 'name': 'statement.pdf', 'md5Checksum': md5}
+        
+        with patch.object(organizer, 'download_file', return_value=content) as download:
+            self.assertEqual(organizer.fetch_file_content(file), content)
+            cached = organizer.fetch_file_content(file)
+        
+        self.assertEqual(download.call_count, 1)
+        self.assertEqual(organizer.extract_text_from_pdf(cached).strip(), '')
+        self.assertIsNone(getattr(organizer._thread_state, 'pdf_error', None))
+        cached.close()
+
+
+class TestReclassify(unittest.TestCase):
+    """Test cases for the extracted-text store and --reclassify."""
+    
+    TEXT = "Chase checking statement\nCard ending 4321"
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mapping_path = os.path.join(self.tmp.name, 'mapping.json')
+        self.store = TextStore(os.path.join(self.tmp.name, 'texts.db'))
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.store.close()
+        self.tmp.cleanup()
+    
+    def test_text_store_keys_by_md5_and_extractor(self):
+        """Test that text is stored compressed per md5 and extractor version."""
+        self.store.put('m1', 'pypdf2-3.0.1', self.TEXT * 100)
+        self.store.put('m1', 'pdfminer-1', 'other text')
+        
+        self.assertEqual(self.store.get('m1', 'pypdf2-3.0.1'), self.TEXT * 100)
+        self.assertIsNone(self.store.get('m1', 'pypdf-4.0'))
+        self.assertIsNone(self.store.get(None))
+        self.assertIn(self.store.get('m1'), (self.TEXT * 100, 'other text'))
+        self.assertLess(self.store.get_stats()['compressed_bytes'], len(self.TEXT) * 10)
+    
+    def test_stored_text_is_not_parsed_again(self):
+        """Test that a PDF whose text is stored is classified without parsing it."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            first = GoogleDriveOrganizer(file_mapping=FileMapping(self.mapping_path), text_store=self.store)
+            second = GoogleDriveOrganizer(file_mapping=FileMapping(os.path.join(self.tmp.name, 'other.json')),
+                                          text_store=self.store)
+        
+        with patch.object(first, 'extract_text_from_pdf', return_value=self.TEXT), patch('main.console'):
+            expected = first.classify_file('scan.pdf', b'%PDF', file_id='f1', file_md5='m1')
+        with patch.object(second, 'extract_text_from_pdf') as extract, patch('main.console'):
+            result = second.classify_file('scan.pdf', b'%PDF', file_id='f1', file_md5='m1')
+        
+        extract.assert_not_called()
+        self.assertEqual(result, expected)
+        self.assertEqual(first.file_mapping.cache[next(iter(first.file_mapping.cache))]['md5'], 'm1')
+    
+    def test_reclassify_updates_only_stale_entries(self):
+        """Test that stale entries are reclassified from stored text and the rest are left alone."""
+        old = FileMapping(self.mapping_path, fingerprint='old-patterns')
+        old.set_classification('f1', 'scan.pdf', None, None, None, file_md5='m1')
+        old.set_classification('f2', 'scan_2.pdf', None, None, None, file_md5='m2')
+        old.set_classification('f3', 'override.pdf', 'citi', 'credit card statement', None)
+        old.cache[old._get_file_key('f3', 'override.pdf')]['manual_override'] = True
+        old._save_cache()
+        self.store.put('m1', 'pypdf2-3.0.1', self.TEXT)
+        
+        mapping = FileMapping(self.mapping_path)
+        preview = reclassify_cache(mapping, self.store, 'pypdf2-3.0.1', dry_run=True)
+        self.assertEqual(len(FileMapping(self.mapping_path).stale_entries()), 2)
+        
+        report = reclassify_cache(mapping, self.store, 'pypdf2-3.0.1')
+        
+        self.assertEqual(preview['changed'], report['changed'])
+        self.assertEqual((report['stale'], report['reclassified'], report['missing_text']), (2, 1, 1))
+        self.assertEqual(report['changed'][0][2][0], 'chase')
+        reloaded = FileMapping(self.mapping_path)
+        self.assertEqual(reloaded.get_classification('f1', 'scan.pdf')[0], 'chase')
+        self.assertEqual([entry['file_name'] for _, entry in reloaded.stale_entries()], ['scan_2.pdf'])
+
+
+class TestFolderMatcher(unittest.TestCase):
+    """Test cases for assigning statements to existing folders."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.folders = [
+            {'id': 'f1', 'name': 'Chase Freedom Card -64649'},
+            {'id': 'f2', 'name': 'Chase Checking -7641'},
+            {'id': 'f3', 'name': 'Personal Checking -624'},
+            {'id': 'f4', 'name': 'Citi Double Cash Personal -80521'},
+            {'id': 'f5', 'name': 'Wells'},
+        ]
+        self.matcher = FolderMatcher(self.folders)
+    
+    def test_scores_and_reasons(self):
+        """Test that company, account, partial account and type points decide the folder."""
+        exact = self.matcher.match('chase', 'credit card statement', '4111111111164649')
+        self.assertEqual((exact.folder_id, exact.score, exact.rule), ('f1', 65, 'score'))
+        self.assertEqual(exact.reasons, ('company:chase', 'account:64649', 'type:card'))
+        
+        partial = self.matcher.match('chase', 'bank statement', '9997641')
+        self.assertEqual(partial.folder_id, 'f2')
+        self.assertEqual(partial.reasons, ('company:chase', 'partial_account:641', 'type:checking'))
+        
+        by_type = self.matcher.match(None, 'bank statement', '000624')
+        self.assertEqual((by_type.folder_id, by_type.score), ('f3', 28))
+        self.assertEqual(by_type.reasons, ('partial_account:624', 'type:checking'))
+    
+    def test_fallbacks_and_low_confidence(self):
+        """Test the company name fallbacks and weak matches that lead to a new folder."""
+        self.assertEqual(self.matcher.match('chase', None, None).rule, 'company_fallback')
+        self.assertEqual(self.matcher.match('wells fargo', 'loan statement', None).rule, 'score')
+        weak = self.matcher.match('sofi', 'bank statement', None)
+        self.assertEqual((weak.folder_id, weak.score, weak.rule), (None, 5, 'low_confidence'))
+        self.assertEqual(self.matcher.match('personal', None, None).rule, 'final_fallback')
+        self.assertIsNone(self.matcher.match('okcoin', None, None))
+        
+        self.matcher.add_folder({'id': 'f6', 'name': 'OkCoin'})
+        self.assertEqual(self.matcher.match('okcoin', None, None).folder_id, 'f6')
+        self.assertEqual([m and m.folder_id for m in self.matcher.assign([('okcoin', None, None), ('x', None, None)])],
+                         ['f6', None])
+    
+    def test_organizer_lists_destination_folders_once(self):
+        """Test that folder matching lists the destination once and sees folders created later."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizer = GoogleDriveOrganizer()
+        organizer.service = MagicMock()
+        organizer.service.files().list().execute.return_value = {'files': self.folders}
+        organizer.service.files().create().execute.return_value = {'id': 'new'}
+        organizer.service.files().list.reset_mock()
+        
+        with patch('main.console'):
+            self.assertEqual(organizer.find_target_folder('dest', 'chase', 'bank statement', '7641'), 'f2')
+            self.assertIsNone(organizer.find_target_folder('dest', 'okcoin', None, None))
+            organizer.create_folder('OkCoin', 'dest')
+            self.assertEqual(organizer.find_target_folder('dest', 'okcoin', None, None), 'new')
+        
+        self.assertEqual(organizer.service.files().list.call_count, 1)
+        self.assertEqual(organizer.folder_names['new'], 'OkCoin')
+
+
+class TestRunEstimate(unittest.TestCase):
+    """Test cases for run metrics and --estimate."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.metrics_file = os.path.join(self.tmp.name, 'metrics.json')
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.tmp.cleanup()
+    
+    def test_metrics_accumulate_across_runs(self):
+        """Test that saved runs add up and unmeasured costs fall back to the defaults."""
+        for _ in range(2):
+            metrics = RunMetrics(self.metrics_file)
+            metrics.record('drive.files.list', 0.2)
+            metrics.record('drive.files.copy', 1.0)
+            metrics.record('download', 2.0, 4000)
+            self.assertEqual(metrics.count('metadata'), 1)
+            metrics.save()
+        
+        history = RunMetrics(self.metrics_file).load_history()
+        self.assertEqual(history['runs'], 2)
+        self.assertEqual(history['operations']['drive.files.copy']['count'], 2)
+        
+        costs = average_costs(history)
+        self.assertAlmostEqual(costs['metadata_seconds'], 0.2)
+        self.assertAlmostEqual(costs['mutation_seconds'], 1.0)
+        self.assertAlmostEqual(costs['download_bytes_per_second'], 2000)
+        self.assertEqual(costs['extract_seconds'], 0.25)
+        self.assertNotIn('extract_seconds', costs['measured'])
+    
+    def test_cost_model_bottlenecks(self):
+        """Test that network time shrinks with workers while parsing and the request budget do not."""
+        costs = {'metadata_seconds': 1.0, 'mutation_seconds': 1.0, 'download_bytes_per_second': 100.0,
+                 'extract_seconds': 5.0}
+        counts = {'listing_calls': 2, 'target_folders': 3, 'new_folders': 1, 'copies': 10,
+                  'download_sizes': [100] * 10, 'parses': 1}
+        
+        serial = estimate_run_costs(counts, costs, workers=1)
+        self.assertEqual((serial['api_calls'], serial['download_bytes']), (27, 1000))
+        self.assertEqual((serial['seconds'], serial['bottleneck']), (27.0, 'network'))
+        
+        self.assertEqual(estimate_run_costs(counts, costs, workers=9)['seconds'], 5.0)
+        self.assertEqual(estimate_run_costs(counts, costs, workers=9)['bottleneck'], 'PDF parsing')
+        budget = estimate_run_costs(counts, costs, workers=9, requests_per_second=1)
+        self.assertEqual((budget['seconds'], budget['bottleneck']), (27.0, 'request budget'))
+    
+    def test_count_run_work_from_caches(self):
+        """Test that cached, name-classifiable, deferred and already copied files are counted apart."""
+        negative_cache = NegativeCache(os.path.join(self.tmp.name, 'negative.json'))
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizer = GoogleDriveOrganizer(file_mapping=FileMapping(os.path.join(self.tmp.name, 'mapping.json')),
+                                             negative_cache=negative_cache,
+                                             metrics=RunMetrics(self.metrics_file))
+        organizer.service = MagicMock()
+        listings = {
+            "'dest' in parents": [{'id': 'chase', 'name': 'Chase Checking -7641'}],
+            # A copy of cached.pdf is already in the Chase folder
+            "'chase' in parents": [{'id': 'copy-2', 'name': 'cached.pdf', 'size': '100', 'md5Checksum': 'a'}],
+        }
+        organizer.service.files().list.side_effect = lambda q, **kwargs: Mock(execute=Mock(return_value={
+            'files': next(files for prefix, files in listings.items() if q.startswith(prefix))}))
+        
+        files = [
+            {'id': '1', 'name': 'notes.txt', 'size': '10'},
+            {'id': '2', 'name': 'cached.pdf', 'size': '100', 'md5Checksum': 'a'},
+            {'id': '3', 'name': 'Chase bank statement account 7641.pdf', 'size': '200', 'md5Checksum': 'b'},
+            {'id': '4', 'name': 'SoFi bank statement account 20516.pdf', 'size': '300', 'md5Checksum': 'c'},
+            {'id': '5', 'name': 'scan.pdf', 'size': '400', 'md5Checksum': 'd'},
+            {'id': '6', 'name': 'broken.pdf', 'size': '500', 'md5Checksum': 'e'},
+        ]
+        organizer.file_mapping.set_classification('2', 'cached.pdf', 'chase', 'bank statement', '7641', '100')
+        negative_cache.record_failure('6', 'e', 'corrupt_pdf')
+        
+        counts = organizer.count_run_work(files, 'dest')
+        
+        self.assertEqual((counts['skipped'], counts['deferred']), (1, 1))
+        self.assertEqual(counts['download_sizes'], [100, 200, 300, 400])
+        self.assertEqual((counts['parses'], counts['copies'], counts['unresolved_copies']), (1, 2, 1))
+        self.assertEqual((counts['already_copied'], counts['new_folders'], counts['target_folders']), (1, 1, 2))
+        self.assertEqual(list(organizer.folder_indexes), ['chase'])
+
+
+class TestAdaptiveConcurrency(unittest.TestCase):
+    """Test cases for the AIMD limits on Drive requests in flight."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.now = 0.0
+        self.clock = lambda: self.now
+    
+    def rate_limit_error(self, status=429, content=b''):
+        return HttpError(Mock(status=status, reason='Too Many Requests'), content)
+    
+    def test_additive_increase_and_one_decrease_per_round(self):
+        """Test that healthy responses raise the limit and a burst of rate limits halves it once."""
+        limit = AdaptiveLimit('metadata', initial=2, maximum=8, window=100, clock=self.clock)
+        for _ in range(6):
+            self.now += 1
+            limit.release(limit.acquire())
+        self.assertEqual(int(limit.limit), 4)
+        
+        round_started = [limit.acquire() for _ in range(3)]
+        self.now += 1
+        for started in round_started:
+            limit.release(started, 'rate_limited')
+        self.assertEqual(int(limit.limit), 2)
+        self.assertEqual(limit.backoffs, {'rate limited': 1})
+        self.assertEqual([value for _, value, _ in limit.timeline], [2, 3, 4, 2])
+    
+    def test_rising_p95_latency_backs_off_and_limit_blocks(self):
+        """Test that a slow window halves the limit and that acquiring beyond the limit waits."""
+        limit = AdaptiveLimit('media', initial=4, maximum=4, window=5, clock=self.clock)
+        for latency in [1, 1, 1, 1, 1, 5, 5, 5, 5, 5]:
+            started = limit.acquire()
+            self.now += latency
+            limit.release(started)
+        self.assertEqual((limit.baseline_p95, int(limit.limit)), (1, 2))
+        self.assertEqual(limit.backoffs, {'p95 latency': 1})
+        
+        held = [limit.acquire(), limit.acquire()]
+        waiter = threading.Thread(target=limit.acquire)
+        waiter.start()
+        waiter.join(0.1)
+        self.assertTrue(waiter.is_alive())
+        limit.release(held[0])
+        waiter.join(1)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(limit.in_flight, 2)
+    
+    def test_organizer_retries_rate_limited_calls(self):
+        """Test that rate-limited Drive calls are retried and reduce the mutation limit."""
+        concurrency = ConcurrencyController(8, initial=4, retries=2)
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizer = GoogleDriveOrganizer(concurrency=concurrency)
+        request = Mock(methodId='drive.files.copy')
+        request.execute.side_effect = [self.rate_limit_error(403, b'{"reason": "userRateLimitExceeded"}'),
+                                       {'id': 'copy'}]
+        
+        with patch('main.time.sleep') as sleep:
+            self.assertEqual(organizer._execute(request), {'id': 'copy'})
+        
+        sleep.assert_called_once()
+        self.assertEqual(int(concurrency.limits['mutation'].limit), 2)
+        self.assertEqual(int(concurrency.limits['metadata'].limit), 4)
+        self.assertIn('1 rate limited', concurrency.report()[2])
+        
+        request.execute.side_effect = self.rate_limit_error(404)
+        with self.assertRaises(HttpError):
+            organizer._execute(request)
+        self.assertEqual(concurrency.limits['mutation'].in_flight, 0)
+    
+    def test_worker_pools_are_sized_to_the_controller_maximum(self):
+        """Test that the limits, not the configured workers, bound the requests of adaptive runs."""
+        import main as main_module
+        from job_manifest import parse_job
+        
+        self.assertEqual(adaptive_maximum(4), 16)
+        self.assertEqual(adaptive_maximum(4, 6), 6)
+        
+        concurrency = ConcurrencyController(adaptive_maximum(2))
+        jobs = [parse_job({'name': 'a', 'source_folder_id': 's', 'dest_folder_id': 'd', 'workers': 2}, 1)]
+        pools = []
+        
+        def organize(organizer, source_folder_id, dest_folder_id, dry_run, duplicate_handling, workers=1, **options):
+            pools.append(workers)
+            return {'total_files': 0}
+        
+        with patch.object(GoogleDriveOrganizer, 'authenticate', autospec=True,
+                          side_effect=lambda organizer: setattr(organizer, 'transport', Mock())), \
+                patch.object(GoogleDriveOrganizer, 'organize_statements', autospec=True, side_effect=organize):
+            main_module.run_jobs(jobs, file_mapping=Mock(), concurrency=concurrency)
+            main_module.run_jobs(jobs, file_mapping=Mock())
+        
+        self.assertEqual(pools, [8, 2])
+
+
+class TestSnapshotDryRun(unittest.TestCase):
+    """Test cases for --snapshot-out and --dry-run --from-snapshot."""
+    
+    FOLDER = 'application/vnd.google-apps.folder'
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.snapshot = os.path.join(self.tmp.name, 'plan.jsonl.gz')
+        self.source = [
+            {'id': 'jan', 'name': '2024-01', 'mimeType': self.FOLDER, 'parents': ['src']},
+            {'id': 'a', 'name': 'chase_statement.pdf', 'mimeType': 'application/pdf', 'parents': ['src'],
+             'size': '100', 'md5Checksum': 'm-a'},
+            {'id': 'b', 'name': 'scan.pdf', 'mimeType': 'application/pdf', 'parents': ['jan'],
+             'size': '200', 'md5Checksum': 'm-b'},
+            {'id': 'c', 'name': 'Chase bank statement account 7641.pdf', 'mimeType': 'application/pdf',
+             'parents': ['jan'], 'size': '300', 'md5Checksum': 'm-c'},
+        ]
+        self.dest = [
+            {'id': 'checking', 'name': 'Chase Checking -7641', 'mimeType': self.FOLDER, 'parents': ['dst']},
+            {'id': 'old', 'name': 'old copy.pdf', 'mimeType': 'application/pdf', 'parents': ['checking'],
+             'size': '300', 'md5Checksum': 'm-c'},
+        ]
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.tmp.cleanup()
+    
+    def offline_organizer(self, **kwargs):
+        return SnapshotOrganizer(self.snapshot, show_progress=False,
+                                 file_mapping=FileMapping(os.path.join(self.tmp.name, 'mapping.json')),
+                                 negative_cache=NegativeCache(os.path.join(self.tmp.name, 'negative.json')), **kwargs)
+    
+    def test_snapshot_out_writes_both_trees(self):
+        """Test that --snapshot-out walks the source and destination into one file."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizer = GoogleDriveOrganizer()
+        organizer.service = MagicMock()
+        organizer.service.files().list().execute.side_effect = [
+            {'files': self.source[:2]}, {'files': self.source[2:]}, {'files': self.dest[:1]}, {'files': self.dest[1:]}]
+        
+        summary = organizer.write_run_snapshot(self.snapshot, 'src', 'dst')
+        
+        self.assertEqual((summary['total_folders'], summary['total_files']), (2, 4))
+        offline = self.offline_organizer()
+        self.assertEqual((offline.source_folder_id, offline.dest_folder_id), ('src', 'dst'))
+        self.assertEqual([f['id'] for f in offline.get_files_in_folder('src')], ['b', 'c', 'a'])
+        self.assertEqual(offline.list_child_folders('dst'), [{'id': 'checking', 'name': 'Chase Checking -7641'}])
+        self.assertEqual(offline.find_folder_by_name('2024-01', 'src'), 'jan')
+        with self.assertRaises(RuntimeError):
+            offline.authenticate()
+    
+    def test_offline_plan_applies_duplicate_checks(self):
+        """Test that the offline plan uses cached classifications and the snapshot's folder contents."""
+        write_snapshot(self.snapshot, self.source + self.dest, 'src', header={'dest_root_id': 'dst'})
+        organizer = self.offline_organizer()
+        organizer.file_mapping.set_classification('a', 'chase_statement.pdf', 'chase', 'bank statement', '7641', '100')
+        
+        with patch('main.console') as console:
+            stats = organizer.organize_statements('src', 'dst', dry_run=True)
+        
+        printed = [str(call.args[0]) for call in console.print.call_args_list if call.args]
+        self.assertTrue(any('Would skip: Chase bank statement account 7641.pdf' in line for line in printed))
+        self.assertTrue(any('Would copy: chase_statement.pdf → Chase Checking -7641/' in line for line in printed))
+        self.assertTrue(any('Could not classify: scan.pdf' in line for line in printed))
+        self.assertEqual((stats['copied'], stats['unclassified']), (2, 1))
+    
+    def test_offline_run_uses_stored_text_and_writes_no_cache(self):
+        """Test that stored PDF text classifies files offline and that no cache is written."""
+        write_snapshot(self.snapshot, self.source + self.dest, 'src', header={'dest_root_id': 'dst'})
+        store = TextStore(os.path.join(self.tmp.name, 'texts.db'))
+        store.put('m-b', 'pypdf2-3.0.1', 'Chase checking statement\nCard ending 7641')
+        organizer = self.offline_organizer(text_store=store)
+        
+        with patch('main.console'):
+            self.assertEqual(organizer.classify_file('scan.pdf', None, 'b', '200', 'm-b'),
+                             ('chase', 'bank statement', '7641'))
+            stats = organizer.organize_statements('src', 'dst', dry_run=True)
+        store.close()
+        
+        self.assertEqual(stats['unclassified'], 0)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'mapping.json')))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, 'negative.json')))
+
+
+class TestCompactRecords(unittest.TestCase):
+    """Test cases for compact file records in listings, snapshots and the duplicate analyzer."""
+    
+    def resources(self):
+        # Parsed separately, as each listing page is, so equal strings are distinct objects
+        return json.loads(json.dumps([
+            {'id': 'a', 'name': 'jan.pdf', 'mimeType': 'application/pdf', 'md5Checksum': 'm1', 'size': '10',
+             'parents': ['folder-1']},
+            {'id': 'b', 'name': 'jan.pdf', 'mimeType': 'application/pdf', 'md5Checksum': 'm1', 'size': '10',
+             'parents': ['folder-1']},
+            {'id': 'c', 'name': 'Chase', 'mimeType': 'application/vnd.google-apps.folder', 'parents': ['root']},
+        ]))
+    
+    def test_repeated_strings_are_shared(self):
+        """Test that MIME types and parent IDs are shared between records."""
+        first, second, folder = [DriveFile.from_resource(r) for r in self.resources()]
+        again = DriveFile.from_resource(self.resources()[0])
+        
+        self.assertIs(first.mime_type, again.mime_type)
+        self.assertIs(first.parents, second.parents)
+        self.assertIs(first.parents, again.parents)
+        self.assertTrue(folder.is_folder)
+        self.assertFalse(first.is_folder)
+        self.assertIs(DriveFile.from_resource(first), first)
+        self.assertFalse(hasattr(first, '__dict__'))
+    
+    def test_snapshots_load_as_records(self):
+        """Test that walked and loaded snapshot entries are records and round-trip unchanged."""
+        service = Mock()
+        service.files().list().execute.side_effect = [{'files': self.resources()}, {'files': []}]
+        walked = list(walk_drive_tree(service, 'root'))
+        self.assertTrue(all(isinstance(record, DriveFile) for record in walked))
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'tree.jsonl.gz')
+            summary = write_snapshot(path, walked, 'root')
+            _, records = read_snapshot(path)
+        
+        self.assertEqual((summary['total_folders'], summary['total_files']), (1, 2))
+        self.assertEqual(records['a'], walked[0])
+        self.assertIs(records['a'].parents, walked[0].parents)
+    
+    def test_analyzer_groups_share_listed_records(self):
+        """Test that duplicate groups hold the listed records instead of copies."""
+        with patch.object(GoogleDriveOrganizer, 'authenticate'):
+            organizer = GoogleDriveOrganizer(show_progress=False)
+        organizer.service = MagicMock()
+        organizer.service.files().get().execute.return_value = {'name': 'Chase'}
+        files = [DriveFile.from_resource(r) for r in self.resources()[:2]]
+        
+        with patch.object(organizer, 'get_files_in_folder', return_value=files), patch('main.console'):
+            report = organizer.analyze_duplicates('dest')
+        
+        self.assertEqual(report['summary']['md5_duplicate_groups'], 1)
+        self.assertIs(report['md5_duplicates'][0]['files'][0], files[0])
+        self.assertIs(report['filename_duplicates'][0]['files'][1], files[1])
+
+
+class InMemorySource(StatementSource):
+    """Statement source over a dict of file names and contents, for the local source tests."""
+    
+    def __init__(self, contents):
+        self.contents = contents
+    
+    def list_files(self):
+        for name, content in self.contents.items():
+            yield DriveFile(f'memory:{name}', name, 'application/pdf', str(len(content or b'')))
+    
+    def read(self, file):
+        return self.contents.get(file.name)
+
+
+class TestLocalSource(unittest.TestCase):
+    """Test cases for classifying statements from a local directory."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmp.name, 'export')
+        self.files = {
+            'Chase bank statement account 7641.pdf': b'%PDF-chase',
+            os.path.join('2024', 'copy of statement.pdf'): b'%PDF-chase',
+            os.path.join('2024', 'scan.pdf'): b'%PDF-broken',
+            os.path.join('2024', 'notes.txt'): b'notes',
+            'empty.pdf': b'',
+        }
+        for path, content in self.files.items():
+            os.makedirs(os.path.dirname(os.path.join(self.root, path)), exist_ok=True)
+            with open(os.path.join(self.root, path), 'wb') as f:
+                f.write(content)
+        self.mapping = FileMapping(os.path.join(self.tmp.name, 'mapping.json'))
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.tmp.cleanup()
+    
+    def test_directory_listing_and_mapped_reads(self):
+        """Test that PDFs are listed depth first in name order and read through mmap."""
+        source = LocalDirectorySource(self.root)
+        files = list(source.list_files())
+        
+        self.assertEqual([f.name for f in files], ['Chase bank statement account 7641.pdf', 'empty.pdf',
+                                                   'copy of statement.pdf', 'scan.pdf'])
+        self.assertEqual((files[0].size, files[0].parents), ('10', (self.root,)))
+        self.assertTrue(files[0].modified_time.endswith('Z'))
+        content = source.read(files[0])
+        self.assertEqual(content[:], b'%PDF-chase')
+        content.close()
+        self.assertEqual(source.read(files[1]), b'')
+    
+    def test_results_are_cached_by_content(self):
+        """Test that a copy of a classified file reuses its classification in a later run."""
+        stats = classify_local_files(LocalDirectorySource(self.root), self.mapping, processes=2)
+        self.assertEqual((stats['files'], stats['classified'], stats['name']), (4, 1, 1))
+        self.assertEqual(stats['errors'], 3)
+        chase_md5 = hashlib.md5(b'%PDF-chase').hexdigest()
+        self.assertEqual(self.mapping.get_classification_by_md5(chase_md5), ('chase', 'bank statement', '7641'))
+        
+        manifest = os.path.join(self.tmp.name, 'manifest.csv')
+        reloaded = FileMapping(self.mapping.cache_file)
+        stats = classify_local_files(LocalDirectorySource(self.root), reloaded, manifest_path=manifest, processes=1)
+        
+        self.assertEqual((stats['cache'], stats['classified']), (2, 2))
+        with open(manifest, newline='') as f:
+            rows = {row['file_name']: row for row in csv.DictReader(f)}
+        self.assertEqual(rows['copy of statement.pdf']['company'], 'chase')
+        self.assertEqual(rows['copy of statement.pdf']['source'], 'cache')
+        self.assertTrue(rows['scan.pdf']['error'].startswith('corrupt_pdf'))
+        self.assertEqual(len(FileMapping(self.mapping.cache_file).cache), len(self.mapping.cache))
+    
+    def test_worker_parses_only_when_the_name_is_not_enough(self):
+        """Test that a worker parses the PDF for files its name does not classify and returns the text."""
+        extractor = Mock(version='test-1')
+        extractor.extract_text.return_value = 'SoFi bank statement\nCard ending 2051'
+        source = LocalDirectorySource(self.root)
+        scan, = [f for f in source.list_files() if f.name == 'scan.pdf']
+        named, = [f for f in source.list_files() if f.name.startswith('Chase')]
+        
+        with patch.object(local_source, '_extractor', extractor):
+            result = classify_local_file(scan, source)
+            self.assertEqual(classify_local_file(named, source).source, 'name')
+        
+        self.assertEqual(extractor.extract_text.call_count, 1)
+        self.assertEqual((result.company, result.account_info, result.source), ('sofi', '2051', 'pdf'))
+        self.assertEqual((result.text, result.extractor), ('SoFi bank statement\nCard ending 2051', 'test-1'))
+    
+    def test_workers_read_through_the_source(self):
+        """Test that any statement source can be classified, and that sources must implement reading."""
+        source = InMemorySource({'Chase bank statement account 7641.pdf': b'%PDF-memory', 'gone.pdf': None})
+        stats = classify_local_files(source, self.mapping, processes=1)
+        
+        self.assertEqual((stats['files'], stats['classified'], stats['errors']), (2, 1, 1))
+        self.assertEqual(self.mapping.get_classification_by_md5(hashlib.md5(b'%PDF-memory').hexdigest()),
+                         ('chase', 'bank statement', '7641'))
+        
+        class ListingOnly(StatementSource):
+            def list_files(self):
+                return iter(())
+        
+        with self.assertRaises(TypeError):
+            ListingOnly()
+
+
+class TestClassificationService(unittest.TestCase):
+    """Test cases for the long-lived classification service."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mapping = FileMapping(os.path.join(self.tmp.name, 'mapping.json'))
+        self.store = TextStore(os.path.join(self.tmp.name, 'text.db'))
+        self.extractor = Mock(version='test-1')
+        self.extractor.extract_text.return_value = 'SoFi bank statement\nCard ending 2051'
+        self.service = ClassificationService(self.mapping, self.store, self.extractor, workers=2,
+                                             path_root=self.tmp.name)
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.service.close()
+        self.store.close()
+        self.tmp.cleanup()
+    
+    def request(self, **request):
+        return self.service.handle(json.dumps(request).encode('utf-8'))
+    
+    def test_pipelined_requests_over_unix_socket(self):
+        """Test that pipelined requests on one connection are answered in order."""
+        path = os.path.join(self.tmp.name, 'Chase bank statement account 7641.pdf')
+        with open(path, 'wb') as f:
+            f.write(b'%PDF-chase')
+        self.mapping.set_classification('drive-1', 'amex.pdf', 'american express', 'credit card statement', '1005',
+                                        file_md5=hashlib.md5(b'%PDF-amex').hexdigest())
+        server = create_server(os.path.join(self.tmp.name, 'classify.sock'), self.service)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.assertEqual(stat.S_IMODE(os.stat(server.server_address).st_mode), 0o600)
+        
+        requests = [{'id': 1, 'path': path},
+                    {'id': 2, 'name': 'renamed.pdf', 'pdf': base64.b64encode(b'%PDF-amex').decode('ascii')},
+                    {'id': 3, 'path': os.path.join(self.tmp.name, 'missing.pdf')}] * 10
+        with socket.socket(socket.AF_UNIX) as client:
+            client.connect(server.server_address)
+            client.sendall(b''.join(json.dumps(request).encode('utf-8') + b'\n' for request in requests))
+            reader = client.makefile('rb')
+            responses = [json.loads(reader.readline()) for _ in requests]
+        shutdown_server(server)
+        
+        self.assertEqual([response['id'] for response in responses], [request['id'] for request in requests])
+        self.assertEqual((responses[0]['company'], responses[0]['account_info'], responses[0]['source']),
+                         ('chase', '7641', 'name'))
+        self.assertEqual((responses[1]['company'], responses[1]['source']), ('american express', 'cache'))
+        self.assertIn('error', responses[2])
+        self.assertIn('total_ms', responses[0]['timings'])
+        self.assertFalse(os.path.exists(server.server_address))
+        self.extractor.extract_text.assert_not_called()
+    
+    def test_parsed_text_is_kept_warm(self):
+        """Test that PDF text is parsed once and served from the text store afterwards."""
+        pdf = base64.b64encode(b'%PDF-sofi').decode('ascii')
+        first = self.request(name='scan.pdf', pdf=pdf)
+        second = self.request(name='scan copy.pdf', pdf=pdf)
+        
+        self.assertEqual(self.extractor.extract_text.call_count, 1)
+        for response in (first, second):
+            self.assertEqual((response['company'], response['statement_type'], response['account_info']),
+                             ('sofi', 'bank statement', '2051'))
+            self.assertEqual(response['source'], 'pdf')
+            self.assertIn('extract_ms', response['timings'])
+        
+        self.extractor.extract_text.side_effect = ValueError('EOF marker not found')
+        broken = self.request(name='Chase bank statement.pdf', pdf=base64.b64encode(b'%PDF-broken').decode('ascii'))
+        self.assertEqual((broken['company'], broken['error']), ('chase', 'corrupt_pdf: EOF marker not found'))
+    
+    def test_paths_are_confined_to_the_served_root(self):
+        """Test that files are only read by path below the root, and not at all without one."""
+        with open(os.path.join(self.tmp.name, 'Chase bank statement account 7641.pdf'), 'wb') as f:
+            f.write(b'%PDF-chase')
+        self.assertEqual(self.request(path='Chase bank statement account 7641.pdf')['company'], 'chase')
+        self.assertEqual(self.request(path='../../etc/passwd')['error'], 'path is outside the served directory')
+        self.assertEqual(self.request(path='/etc/passwd')['error'], 'path is outside the served directory')
+        
+        closed = ClassificationService(self.mapping, self.store, self.extractor, workers=1)
+        self.addCleanup(closed.close)
+        response = closed.handle(json.dumps({'path': os.path.join(self.tmp.name, 'scan.pdf')}).encode('utf-8'))
+        self.assertIn('path requests are disabled', response['error'])
+    
+    def test_invalid_requests_and_addresses(self):
+        """Test error responses for bad requests, the status ops and address parsing."""
+        self.assertTrue(self.service.handle(b'not json')['error'].startswith('invalid request'))
+        self.assertEqual(self.request(id=1, op='compress')['error'], "unknown op 'compress'")
+        self.assertIn('a path or pdf', self.request(id=2)['error'])
+        self.assertIn('base64', self.request(id=3, pdf='!!')['error'])
+        self.assertTrue(self.request(op='ping')['ok'])
+        stats = self.request(op='stats')
+        self.assertEqual((stats['requests'], stats['errors'], stats['workers']), (2, 4, 2))
+        
+        self.assertEqual(parse_address('8765'), ('127.0.0.1', 8765))
+        self.assertEqual(parse_address('localhost:8765'), ('localhost', 8765))
+        for host in ('0.0.0.0', '192.168.1.10', 'example.com'):
+            with self.assertRaises(ValueError):
+                parse_address(f'{host}:8765')
+        with self.assertRaises(ValueError):
+            create_server(('0.0.0.0', 0), self.service)
+        self.assertEqual(parse_address('/run/classify.sock'), '/run/classify.sock')
+    
+    def test_only_stale_sockets_are_replaced(self):
+        """Test that a left-over socket is replaced, but not a live one or another file."""
+        path = os.path.join(self.tmp.name, 'classify.sock')
+        with open(path, 'w') as f:
+            f.write('notes')
+        with self.assertRaisesRegex(ValueError, 'not a socket'):
+            create_server(path, self.service)
+        os.unlink(path)
+        
+        server = create_server(path, self.service)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        with self.assertRaisesRegex(ValueError, 'already listening'):
+            create_server(path, self.service)
+        server.shutdown()
+        server.server_close()  # Leaves the socket file behind, as a crash would
+        self.assertTrue(os.path.exists(path))
+        
+        server = create_server(path, self.service)
+        server.server_close()
+        os.unlink(path)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,78 @@
+"""
+Persistent store of extracted PDF text.
+
+Text is compressed with zlib and keyed by the PDF's md5 and the version of
+the extractor that produced it, so a pattern change can be re-applied with
+--reclassify without downloading or parsing any PDF again.
+"""
+
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS texts (
+    md5 TEXT NOT NULL,
+    extractor TEXT NOT NULL,
+    text BLOB NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (md5, extractor)
+);
+"""
+
+
+class TextStore:
+    """Extracted text of PDFs by md5 and extractor version, in a SQLite database."""
+
+    def __init__(self, path: str = 'text_store.db', timeout: float = 60.0):
+        self.path = path
+        # Shared by worker threads; the lock serializes use of the connection
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def get(self, md5: Optional[str], extractor: Optional[str] = None) -> Optional[str]:
+        """Return the stored text of a PDF. Without an extractor, the most recently stored text is returned."""
+        if not md5:
+            return None
+        with self._lock:
+            if extractor:
+                row = self._db.execute('SELECT text FROM texts WHERE md5 = ? AND extractor = ?',
+                                       (md5, extractor)).fetchone()
+            else:
+                row = self._db.execute('SELECT text FROM texts WHERE md5 = ? ORDER BY stored_at DESC LIMIT 1',
+                                       (md5,)).fetchone()
+        return zlib.decompress(row[0]).decode('utf-8') if row else None
+
+    def has(self, md5: Optional[str], extractor: Optional[str] = None) -> bool:
+        """Check whether text is stored for a PDF, without loading it."""
+        if not md5:
+            return False
+        with self._lock:
+            if extractor:
+                row = self._db.execute('SELECT 1 FROM texts WHERE md5 = ? AND extractor = ?', (md5, extractor)).fetchone()
+            else:
+                row = self._db.execute('SELECT 1 FROM texts WHERE md5 = ?', (md5,)).fetchone()
+        return row is not None
+
+    def put(self, md5: Optional[str], extractor: str, text: str):
+        """Store the text a given extractor produced for a PDF."""
+        if not md5:
+            return
+        compressed = zlib.compress(text.encode('utf-8'))
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO texts (md5, extractor, text, stored_at) VALUES (?, ?, ?, ?)',
+                             (md5, extractor, compressed, time.time()))
+
+    def get_stats(self) -> Dict:
+        """Return the number of stored texts and their total compressed size."""
+        with self._lock:
+            count, compressed = self._db.execute('SELECT COUNT(*), COALESCE(SUM(LENGTH(text)), 0) FROM texts').fetchone()
+        return {'texts': count, 'compressed_bytes': compressed}
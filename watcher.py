@@ -0,0 +1,238 @@
+"""
+Watch mode: process new and changed statements as they arrive.
+
+The watcher follows the Drive change feed instead of walking the source tree
+on every run. It keeps one organizer, with its Drive clients, caches and
+destination indexes, alive between polls and stores its feed position in a
+state file so a restart continues where it stopped. A dry run never writes
+the state file, so a later real run still processes what the dry run saw.
+
+Files that were not filed (deferred, unclassified or failed) are kept in a
+retry set and processed again on every poll; the negative cache keeps that
+cheap until their retry time comes.
+"""
+
+import json
+import os
+import signal
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+from scheduling import schedule_files
+
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
+
+class DriveWatcher:
+    """Processes new and changed files below a source folder from the Drive change feed."""
+
+    def __init__(self, organizer, source_folder_id: str, dest_folder_id: str,
+                 state_file: str = 'watch_state.json', interval: float = 30.0, dry_run: bool = False,
+                 duplicate_handling: str = 'smart', workers: int = 1, order: Sequence[str] = (),
+                 log: Callable[[str], None] = print):
+        self.organizer = organizer
+        self.source_folder_id = source_folder_id
+        self.dest_folder_id = dest_folder_id
+        self.state_file = state_file
+        self.interval = interval
+        self.dry_run = dry_run
+        self.duplicate_handling = duplicate_handling
+        self.workers = workers
+        self.order = order
+        self.log = log
+        self.stop_event = threading.Event()
+        self.state = self._load_state()
+        self.source_folders: Set[str] = set()
+        self.stats = {
+            'polls': 0,
+            'processed': 0,
+            'copied': 0,
+            'skipped': 0,
+            'errors': 0,
+            'unclassified': 0,
+            'deferred': 0
+        }
+
+    def _load_state(self) -> Dict:
+        """Load the saved feed position, ignoring state saved for another folder pair."""
+        state = {}
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r') as f:
+                    state = json.load(f)
+            except (json.JSONDecodeError, IOError):
+                state = {}
+
+        if (state.get('source_folder_id'), state.get('dest_folder_id')) != (self.source_folder_id, self.dest_folder_id):
+            state = {}
+        state.setdefault('source_folder_id', self.source_folder_id)
+        state.setdefault('dest_folder_id', self.dest_folder_id)
+        state.setdefault('seen', {})
+        state.setdefault('retry', {})
+        return state
+
+    def save_state(self):
+        """Write the state file atomically. Dry runs keep their state in memory only."""
+        if self.dry_run:
+            return
+        self.state['saved_at'] = datetime.now().isoformat()
+        temp_file = f'{self.state_file}.tmp'
+        with open(temp_file, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(temp_file, self.state_file)
+
+    def load_source_folders(self):
+        """Find every folder below the source folder, which the change feed does not tell."""
+        folders = {self.source_folder_id}
+        pending = deque([self.source_folder_id])
+        while pending:
+            for folder in self.organizer.list_child_folders(pending.popleft()):
+                if folder['id'] not in folders:
+                    folders.add(folder['id'])
+                    pending.append(folder['id'])
+        self.source_folders = folders
+
+    @staticmethod
+    def _version(file: Dict) -> str:
+        return file.get('md5Checksum') or file.get('modifiedTime') or ''
+
+    def update_indexes(self, file_id: str, file: Optional[Dict]):
+        """
+        Keep cached destination indexes in step with a change. New files are
+        added; an index holding a file that was changed, moved or removed is
+        dropped so it is listed again when next needed.
+        """
+        indexes = self.organizer.folder_indexes
+        for folder_id, index in list(indexes.items()):
+            known = index.by_id.get(file_id)
+            if known is None:
+                continue
+            unchanged = (file is not None and folder_id in file.get('parents', [])
+                         and known.get('name') == file.get('name')
+                         and known.get('md5Checksum') == file.get('md5Checksum'))
+            if not unchanged:
+                indexes.pop(folder_id, None)
+
+        if file is not None:
+            for parent in file.get('parents', []):
+                if parent in indexes:
+                    indexes[parent].add(file)
+
+    def update_matchers(self, folder_id: str, folder: Optional[Dict]):
+        """Drop the folder matchers a folder was added to, renamed in or removed from."""
+        matchers = self.organizer.folder_matchers
+        parents = set(folder.get('parents', [])) if folder is not None else set()
+        for dest_folder_id, matcher in list(matchers.items()):
+            if dest_folder_id in parents or matcher.has_folder(folder_id):
+                matchers.pop(dest_folder_id, None)
+
+    def collect(self, changes: List[Dict]) -> List[Dict]:
+        """
+        Pick the changes that are new versions of files below the source folder.
+        Folder changes extend the known source tree.
+        """
+        files = {}
+        for change in changes:
+            file = change.get('file')
+            if change.get('removed') or not file or file.get('trashed'):
+                self.update_indexes(change.get('fileId'), None)
+                self.update_matchers(change.get('fileId'), None)
+                self.state['retry'].pop(change.get('fileId'), None)
+                continue
+
+            if file.get('mimeType') == FOLDER_MIME_TYPE:
+                self.update_matchers(file['id'], file)
+                if set(file.get('parents', [])) & self.source_folders:
+                    self.source_folders.add(file['id'])
+                continue
+
+            self.update_indexes(file['id'], file)
+            if not set(file.get('parents', [])) & self.source_folders:
+                self.state['retry'].pop(file['id'], None)  # Moved out of the source tree
+                continue
+            if self.state['seen'].get(file['id']) == self._version(file):
+                continue  # Metadata-only change to a version already processed
+            files[file['id']] = file
+
+        return list(files.values())
+
+    def run_once(self) -> int:
+        """
+        Poll the change feed once and process what arrived, together with the
+        files still to retry. Returns the number of files processed.
+        """
+        changes, next_token = self.organizer.list_changes(self.state['page_token'])
+        files = self.collect(changes)
+        self.stats['polls'] += 1
+        changed = {file['id'] for file in files}
+        retry = [file for file_id, file in self.state['retry'].items() if file_id not in changed]
+        if files:
+            self.log(f"[blue]{len(files)} new or changed file(s)[/blue]")
+        files += retry
+
+        if files:
+            files = schedule_files(files, self.order, self.organizer)
+            for file, counters in self.organizer.process_files(files, self.dest_folder_id, self.dry_run,
+                                                               self.duplicate_handling, self.workers):
+                for counter in counters:
+                    self.stats[counter] += 1
+                if self.dry_run:
+                    continue  # Previews are not remembered
+                if 'copied' in counters or 'skipped' in counters:
+                    self.state['seen'][file['id']] = self._version(file)
+                    self.state['retry'].pop(file['id'], None)
+                else:
+                    # Deferred, unclassified or failed: try again on the next poll
+                    self.state['retry'][file['id']] = file
+
+        # Only move the feed position once everything before it is processed
+        self.state['page_token'] = next_token
+        self.save_state()
+        return len(files)
+
+    def stop(self, *args):
+        """Ask the watch loop to finish after the current poll."""
+        self.stop_event.set()
+
+    def run(self, catch_up: bool = True) -> Dict:
+        """
+        Watch until stopped by SIGINT or SIGTERM, then save the state.
+        On the first start the feed position is taken before an optional full
+        organize pass, so files arriving during that pass are not missed; it is
+        saved only once the pass has finished.
+        """
+        handlers = {}
+        try:
+            self.load_source_folders()
+            if not self.state.get('page_token'):
+                page_token = self.organizer.get_start_page_token()
+                if catch_up:
+                    self.organizer.organize_statements(self.source_folder_id, self.dest_folder_id, self.dry_run,
+                                                       self.duplicate_handling, workers=self.workers, order=self.order)
+                self.state['page_token'] = page_token
+                self.save_state()
+
+            # From here on a signal lets the current poll finish before stopping
+            if threading.current_thread() is threading.main_thread():
+                for signum in (signal.SIGINT, signal.SIGTERM):
+                    handlers[signum] = signal.signal(signum, self.stop)
+
+            self.log(f"[green]Watching {len(self.source_folders)} folder(s) every {self.interval:g}s; "
+                     f"press Ctrl+C to stop[/green]")
+            while not self.stop_event.is_set():
+                try:
+                    self.run_once()
+                except Exception as e:
+                    self.log(f"[red]Error polling for changes: {e}[/red]")
+                self.stop_event.wait(self.interval)
+        finally:
+            if self.state.get('page_token'):
+                self.save_state()
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+        self.log("[green]✓ Watch stopped" + (" (dry run, state not saved)" if self.dry_run else ", state saved") + "[/green]")
+        return self.stats
@@ -0,0 +1,178 @@
+"""
+Lease-based work sharing between organizer processes.
+
+The source listing is split into work units stored in a SQLite database.
+Worker processes, on one host or on several hosts sharing the database file,
+claim units through time-limited leases, mark each file done as soon as it is
+processed, and complete the unit at the end. A unit whose lease expires, e.g.
+because its worker crashed, is claimed again by another worker, which only
+processes the files not yet marked done.
+
+SQLite relies on file locks, so the database must be on a filesystem with
+working POSIX locking (local disks and most NFSv4 setups).
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS units (
+    unit_id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS files (
+    file_id TEXT PRIMARY KEY,
+    unit_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    outcome TEXT,
+    worker TEXT
+);
+CREATE INDEX IF NOT EXISTS files_by_unit ON files (unit_id, done);
+"""
+
+
+def default_worker_id() -> str:
+    """Identify this process across hosts."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaseStore:
+    """Work units and their leases in a shared SQLite database."""
+
+    def __init__(self, path: str, timeout: float = 60.0):
+        self.path = path
+        # Autocommit mode; write transactions are opened explicitly with BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _write(self):
+        """Start a transaction holding the database write lock."""
+        self._db.execute('BEGIN IMMEDIATE')
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self._db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def is_seeded(self) -> bool:
+        """Check whether the work units have been created."""
+        return self.get_meta('seeded_at') is not None
+
+    def seed(self, files: Iterable[Dict], unit_size: int = 50, **meta) -> bool:
+        """
+        Split files into units of unit_size, keeping their order.
+        Returns False if another worker seeded the store first.
+        """
+        self._write()
+        try:
+            if self.is_seeded():
+                self._db.execute('ROLLBACK')
+                return False
+
+            unit_id = 0
+            for position, file in enumerate(files):
+                if position % unit_size == 0:
+                    unit_id += 1
+                    self._db.execute('INSERT INTO units (unit_id) VALUES (?)', (unit_id,))
+                self._db.execute(
+                    'INSERT OR IGNORE INTO files (file_id, unit_id, position, record) VALUES (?, ?, ?, ?)',
+                    (file['id'], unit_id, position, json.dumps(file))
+                )
+
+            meta['seeded_at'] = time.time()
+            self._db.executemany('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                                 [(key, str(value)) for key, value in meta.items()])
+            self._db.execute('COMMIT')
+            return True
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+
+    def claim(self, worker_id: str, lease_seconds: float = 300) -> Optional[Tuple[int, List[Dict]]]:
+        """
+        Lease the next pending or expired unit.
+        Returns (unit_id, files not yet done) or None when no unit is available.
+        """
+        now = time.time()
+        self._write()
+        try:
+            row = self._db.execute(
+                "SELECT unit_id FROM units WHERE status = 'pending' "
+                "OR (status = 'leased' AND lease_expires < ?) ORDER BY unit_id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                self._db.execute('COMMIT')
+                return None
+
+            unit_id = row[0]
+            self._db.execute(
+                "UPDATE units SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE unit_id = ?",
+                (worker_id, now + lease_seconds, unit_id)
+            )
+            records = self._db.execute(
+                'SELECT record FROM files WHERE unit_id = ? AND done = 0 ORDER BY position',
+                (unit_id,)
+            ).fetchall()
+            self._db.execute('COMMIT')
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+
+        return unit_id, [json.loads(record) for record, in records]
+
+    def renew(self, unit_id: int, worker_id: str, lease_seconds: float = 300) -> bool:
+        """Extend a lease. Returns False if the lease was lost to another worker."""
+        cursor = self._db.execute(
+            "UPDATE units SET lease_expires = ? WHERE unit_id = ? AND owner = ? AND status = 'leased'",
+            (time.time() + lease_seconds, unit_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def mark_done(self, file_id: str, worker_id: str, outcome: Optional[str] = None):
+        """Record that a file has been processed."""
+        self._db.execute('UPDATE files SET done = 1, outcome = ?, worker = ? WHERE file_id = ?',
+                         (outcome, worker_id, file_id))
+
+    def complete(self, unit_id: int, worker_id: str) -> bool:
+        """Mark a leased unit finished. Returns False if the lease was lost."""
+        cursor = self._db.execute(
+            "UPDATE units SET status = 'done', lease_expires = NULL WHERE unit_id = ? AND owner = ?",
+            (unit_id, worker_id)
+        )
+        return cursor.rowcount == 1
+
+    def release(self, unit_id: int, worker_id: str):
+        """Give a unit back so another worker can claim it right away."""
+        self._db.execute(
+            "UPDATE units SET status = 'pending', owner = NULL, lease_expires = NULL "
+            "WHERE unit_id = ? AND owner = ? AND status = 'leased'",
+            (unit_id, worker_id)
+        )
+
+    def get_progress(self) -> Dict:
+        """Count units by status and files processed."""
+        progress = {'pending': 0, 'leased': 0, 'done': 0}
+        for status, count in self._db.execute('SELECT status, COUNT(*) FROM units GROUP BY status'):
+            progress[status] = count
+        progress['total_files'], progress['done_files'] = self._db.execute(
+            'SELECT COUNT(*), COALESCE(SUM(done), 0) FROM files'
+        ).fetchone()
+        return progress